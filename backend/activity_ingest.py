@@ -0,0 +1,160 @@
+"""
+Enregistrement des événements d'activité (ActivityLog) par lots, à écriture différée.
+
+Chaque clic des applications enfant appelle /log-activity/. Au lieu d'une
+transaction par événement, les événements sont mis en mémoire puis insérés
+par lots (un INSERT multi-lignes par lot) :
+- dès que `batch_size` événements attendent, ou toutes les `flush_interval` secondes ;
+- la mémoire est bornée : au-delà de `max_pending` événements en attente,
+  l'appelant attend qu'un lot soit écrit (contre-pression), puis reçoit
+  IngestQueueFull si la base ne suit pas ;
+- un lot dont l'écriture échoue reste en tête de file et sera réessayé ;
+  les lignes refusées par la base (ex: utilisateur inconnu) sont écartées
+  une à une sans bloquer les autres ;
+- tout ce qui reste est écrit à l'arrêt du serveur.
+Un traitement `on_batch` (ex: agrégats de activity_rollups.py) peut être
+appliqué à chaque lot dans la même transaction que son insertion.
+"""
+import asyncio
+
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+
+import database_models as db_models
+
+
+class IngestQueueFull(Exception):
+    """Trop d'événements en attente d'écriture : réessayer plus tard."""
+
+
+class ActivityIngestor:
+    """Tampon d'événements ActivityLog écrit par lots par une tâche asyncio."""
+
+    def __init__(self, session_factory, batch_size=500, flush_interval=1.0, max_pending=10000, enqueue_timeout=0.5,
+                 on_batch=None):
+        """
+        :param session_factory: fabrique de sessions AsyncSession (voir database.py)
+        :param on_batch: coroutine(db, lignes) exécutée avant le commit de chaque lot
+        """
+        self.session_factory = session_factory
+        self.on_batch = on_batch
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.enqueue_timeout = enqueue_timeout
+        # Lignes prêtes pour insert(ActivityLog) (dicts de colonnes)
+        self._buffer = []
+        self._batch_ready = asyncio.Event()
+        self._drained = asyncio.Event()
+        self._writer = None
+        self._stopping = False
+        self.stats = {"received": 0, "written": 0, "batches": 0, "rejected": 0, "refused": 0}
+
+    async def submit(self, row):
+        """Ajoute un événement ; attend jusqu'à `enqueue_timeout` s'il y a trop d'événements en attente."""
+        if len(self._buffer) >= self.max_pending:
+            self._drained.clear()
+            self._batch_ready.set()
+            try:
+                await asyncio.wait_for(self._drained.wait(), self.enqueue_timeout)
+            except asyncio.TimeoutError:
+                pass
+            if len(self._buffer) >= self.max_pending:
+                self.stats["refused"] += 1
+                raise IngestQueueFull(self.max_pending)
+        self._buffer.append(row)
+        self.stats["received"] += 1
+        if len(self._buffer) >= self.batch_size:
+            self._batch_ready.set()
+
+    # --- Écriture ---
+
+    async def flush(self):
+        """Écrit les événements en attente ; s'arrête au premier lot qui échoue (gardé pour le prochain essai)."""
+        written = 0
+        # Seulement les événements déjà présents : ceux qui arrivent pendant l'écriture forment le lot suivant
+        remaining = len(self._buffer)
+        while remaining > 0:
+            batch = self._buffer[:min(self.batch_size, remaining)]
+            del self._buffer[:len(batch)]
+            remaining -= len(batch)
+            try:
+                written += await self._write(batch)
+            except Exception as e:
+                # `batch` ne contient plus que les événements non écrits (voir _write_rows)
+                self._buffer[:0] = batch
+                print(f"⚠️ Journal d'activité: écriture de {len(batch)} événement(s) reportée ({e})")
+                break
+            self._drained.set()
+        return written
+
+    async def _write(self, batch):
+        try:
+            async with self.session_factory() as db:
+                await db.execute(insert(db_models.ActivityLog), batch)
+                if self.on_batch:
+                    await self.on_batch(db, batch)
+                await db.commit()
+        except IntegrityError:
+            # Au moins une ligne refusée (contrainte) : écrire les lignes une à une pour garder les autres
+            return await self._write_rows(batch)
+        self.stats["written"] += len(batch)
+        self.stats["batches"] += 1
+        return len(batch)
+
+    async def _write_rows(self, batch):
+        """
+        Écrit les lignes une à une. Si l'écriture s'interrompt (ex: base injoignable), les lignes
+        déjà traitées sont retirées de `batch` : seules les autres seront réessayées.
+        """
+        written = 0
+        done = 0
+        try:
+            async with self.session_factory() as db:
+                for row in batch:
+                    try:
+                        await db.execute(insert(db_models.ActivityLog), [row])
+                        if self.on_batch:
+                            await self.on_batch(db, [row])
+                        await db.commit()
+                        written += 1
+                    except IntegrityError as e:
+                        await db.rollback()
+                        self.stats["rejected"] += 1
+                        print(f"⚠️ Journal d'activité: événement écarté ({e.orig})")
+                    done += 1
+        finally:
+            del batch[:done]
+            self.stats["written"] += written
+            self.stats["batches"] += 1
+        return written
+
+    # --- Tâche d'écriture ---
+
+    def start(self):
+        if self._writer is None:
+            self._stopping = False
+            self._writer = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._batch_ready.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._batch_ready.clear()
+            await self.flush()
+
+    async def stop(self):
+        """Arrête la tâche d'écriture après un dernier passage (aucun lot interrompu en cours d'écriture)."""
+        if self._writer is not None:
+            self._stopping = True
+            self._batch_ready.set()
+            await self._writer
+            self._writer = None
+        await self.flush()
+        if self._buffer:
+            print(f"⚠️ Journal d'activité: {len(self._buffer)} événement(s) non écrit(s) à l'arrêt")
+
+    def status(self):
+        return {"pending": len(self._buffer), **self.stats}
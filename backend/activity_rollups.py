@@ -0,0 +1,163 @@
+"""
+Agrégats d'activité pré-calculés pour les tableaux de bord parents.
+
+Les tableaux de bord (ParentHome.jsx) auraient dû parcourir tout le journal
+ActivityLog. À la place, chaque lot inséré par activity_ingest.py met à jour,
+dans la même transaction, la table activity_rollups : une ligne par
+(utilisateur, tranche d'une heure ou d'un jour, page) avec le nombre
+d'événements et la durée cumulée. La mise à jour est un upsert incrémental
+(INSERT ... ON DUPLICATE KEY UPDATE sous MySQL, ON CONFLICT sous SQLite, UPDATE
+puis INSERT des tranches absentes sous les autres bases) : les lectures ne
+dépendent que de la période demandée, pas de l'historique.
+"""
+import json
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import and_, bindparam, func, insert, select, update
+from sqlalchemy.dialects import mysql, sqlite
+
+import database_models as db_models
+
+GRANULARITIES = ("hour", "day")
+# Clé de details contenant la durée d'un événement (secondes)
+DURATION_KEY = "duration"
+
+
+def naive_utc(timestamp):
+    """Date UTC sans fuseau (format des colonnes DateTime) ; une date sans fuseau est supposée déjà en UTC."""
+    if timestamp is None or timestamp.tzinfo is None:
+        return timestamp
+    return timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def bucket_start(timestamp, granularity):
+    """Début de la tranche horaire ou journalière contenant `timestamp`."""
+    if granularity == "hour":
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def event_duration(details):
+    """Durée (s) d'un événement d'après ses détails JSON, 0 si absente ou invalide."""
+    if not details:
+        return 0.0
+    try:
+        value = json.loads(details).get(DURATION_KEY, 0)
+        return max(float(value), 0.0)
+    except (ValueError, TypeError, AttributeError):
+        return 0.0
+
+
+def rollup_deltas(rows):
+    """Lignes ActivityLog (dicts) -> [{user_id, granularity, bucket_start, page, event_count, total_duration}]."""
+    deltas = {}
+    for row in rows:
+        if row.get("user_id") is None:
+            continue
+        duration = event_duration(row.get("details"))
+        for granularity in GRANULARITIES:
+            key = (row["user_id"], granularity, bucket_start(row["timestamp"], granularity), row["page"])
+            delta = deltas.setdefault(key, [0, 0.0])
+            delta[0] += 1
+            delta[1] += duration
+    return [
+        {"user_id": user_id, "granularity": granularity, "bucket_start": start, "page": page,
+         "event_count": count, "total_duration": duration}
+        for (user_id, granularity, start, page), (count, duration) in deltas.items()
+    ]
+
+
+def _upsert(dialect_name):
+    """INSERT ... ON CONFLICT natif du dialecte, ou None s'il n'y en a pas."""
+    rollup = db_models.ActivityRollup.__table__
+    if dialect_name == "mysql":
+        stmt = mysql.insert(rollup)
+        return stmt.on_duplicate_key_update(
+            event_count=rollup.c.event_count + stmt.inserted.event_count,
+            total_duration=rollup.c.total_duration + stmt.inserted.total_duration,
+        )
+    if dialect_name == "sqlite":
+        stmt = sqlite.insert(rollup)
+        return stmt.on_conflict_do_update(
+            index_elements=["user_id", "granularity", "bucket_start", "page"],
+            set_={
+                "event_count": rollup.c.event_count + stmt.excluded.event_count,
+                "total_duration": rollup.c.total_duration + stmt.excluded.total_duration,
+            },
+        )
+    return None
+
+
+async def _update_then_insert(db, deltas):
+    """Upsert portable (autres bases) : incrémente chaque tranche existante, insère les autres."""
+    rollup = db_models.ActivityRollup.__table__
+    stmt = update(rollup).where(and_(
+        rollup.c.user_id == bindparam("b_user_id"),
+        rollup.c.granularity == bindparam("b_granularity"),
+        rollup.c.bucket_start == bindparam("b_bucket_start"),
+        rollup.c.page == bindparam("b_page"),
+    )).values(
+        event_count=rollup.c.event_count + bindparam("b_event_count"),
+        total_duration=rollup.c.total_duration + bindparam("b_total_duration"),
+    )
+    missing = []
+    for delta in deltas:
+        result = await db.execute(stmt, {f"b_{key}": value for key, value in delta.items()})
+        if result.rowcount == 0:
+            missing.append(delta)
+    if missing:
+        await db.execute(insert(rollup), missing)
+
+
+async def apply_rollups(db, rows):
+    """Ajoute les événements `rows` aux agrégats (dans la transaction en cours de `db`)."""
+    deltas = rollup_deltas(rows)
+    if not deltas:
+        return
+    stmt = _upsert(db.bind.dialect.name)
+    if stmt is None:
+        await _update_then_insert(db, deltas)
+    else:
+        await db.execute(stmt, deltas)
+
+
+# --- Lecture ---
+
+async def rollup_series(db, user_id, granularity, since, until, page=None):
+    """Tranches d'activité d'un utilisateur sur [since, until), triées par date puis page."""
+    rollup = db_models.ActivityRollup
+    query = select(rollup.bucket_start, rollup.page, rollup.event_count, rollup.total_duration).where(
+        rollup.user_id == user_id,
+        rollup.granularity == granularity,
+        rollup.bucket_start >= bucket_start(since, granularity),
+        rollup.bucket_start < until,
+    )
+    if page:
+        query = query.where(rollup.page == page)
+    result = await db.execute(query.order_by(rollup.bucket_start, rollup.page))
+    return [
+        {"debut": start, "page": page_name, "evenements": count, "duree": round(duration, 1)}
+        for start, page_name, count, duration in result.all()
+    ]
+
+
+async def rollup_summary(db, user_id, days, now=None):
+    """Totaux par page sur les `days` derniers jours (agrégats journaliers uniquement)."""
+    rollup = db_models.ActivityRollup
+    since = bucket_start((now or datetime.utcnow()) - timedelta(days=days - 1), "day")
+    result = await db.execute(
+        select(rollup.page, func.sum(rollup.event_count), func.sum(rollup.total_duration), func.max(rollup.bucket_start))
+        .where(rollup.user_id == user_id, rollup.granularity == "day", rollup.bucket_start >= since)
+        .group_by(rollup.page)
+        .order_by(func.sum(rollup.event_count).desc())
+    )
+    pages = [
+        {"page": page, "evenements": int(count or 0), "duree": round(float(duration or 0), 1), "dernier_jour": last_day}
+        for page, count, duration, last_day in result.all()
+    ]
+    return {
+        "depuis": since,
+        "evenements": sum(p["evenements"] for p in pages),
+        "duree": round(sum(p["duree"] for p in pages), 1),
+        "pages": pages,
+    }
@@ -0,0 +1,111 @@
+"""
+Benchmark de l'extraction de couleur dominante.
+
+Compare l'ancienne méthode (cv2.kmeans sur chaque découpe en pleine résolution)
+au nouvel extracteur vectorisé de color_analysis.py :
+- temps total par image (toutes les découpes)
+- parité : distance RGB entre les deux couleurs dominantes de chaque découpe
+  et proportion de découpes qui reçoivent le même nom de couleur
+
+Utilisation:
+python benchmark_colors.py                       # scènes synthétiques + dessins de uploads/drawings
+python benchmark_colors.py --images "photos/*.jpg" --boxes 12
+"""
+
+import argparse
+import glob
+import random
+import time
+
+import cv2
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter
+
+from color_analysis import dominant_colors, dominant_color_kmeans
+from color_names import color_names
+
+
+def synthetic_scene(width, height, n_objects, rng):
+    """Photo synthétique : fond dégradé bruité + jouets colorés avec ombre et texture."""
+    gradient = np.linspace(120, 220, width, dtype=np.float32)[None, :, None]
+    background = np.repeat(np.repeat(gradient, height, axis=0), 3, axis=2)
+    background += rng.normal(0, 8, background.shape)
+    img = Image.fromarray(np.clip(background, 0, 255).astype(np.uint8))
+    draw = ImageDraw.Draw(img)
+    boxes = []
+    for _ in range(n_objects):
+        w = rng.integers(width // 12, width // 4)
+        h = rng.integers(height // 12, height // 4)
+        x = rng.integers(0, width - w)
+        y = rng.integers(0, height - h)
+        color = tuple(int(c) for c in rng.integers(0, 256, 3))
+        shadow = tuple(max(0, c - 60) for c in color)
+        draw.ellipse([x, y, x + w, y + h], fill=color, outline=shadow, width=max(2, w // 15))
+        draw.rectangle([x + w // 3, y + h // 3, x + w // 2, y + h // 2], fill=shadow)
+        boxes.append([int(x), int(y), int(x + w), int(y + h)])
+    return img.filter(ImageFilter.GaussianBlur(1)), boxes
+
+
+def random_boxes(width, height, n_boxes, rng):
+    boxes = []
+    for _ in range(n_boxes):
+        w = rng.integers(width // 10, width // 2)
+        h = rng.integers(height // 10, height // 2)
+        x = rng.integers(0, width - w)
+        y = rng.integers(0, height - h)
+        boxes.append([int(x), int(y), int(x + w), int(y + h)])
+    return boxes
+
+
+def run_benchmark(samples):
+    legacy_time = 0.0
+    fast_time = 0.0
+    distances = []
+    same_name = []
+
+    for img, boxes in samples:
+        rgb = img.convert('RGB')
+
+        start = time.perf_counter()
+        legacy = [dominant_color_kmeans(rgb.crop(box)) for box in boxes]
+        legacy_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        fast = dominant_colors(rgb, boxes)
+        fast_time += time.perf_counter() - start
+
+        same_name.extend(a == b for a, b in zip(color_names(legacy), color_names(fast)))
+        distances.extend(np.linalg.norm(np.array(legacy, dtype=np.float32) - np.array(fast, dtype=np.float32), axis=1))
+
+    distances = np.array(distances)
+    n_crops = len(distances)
+    print(f"Images: {len(samples)} - découpes: {n_crops}")
+    print(f"cv2.kmeans (ancien) : {legacy_time * 1000:.1f} ms au total, {legacy_time * 1000 / n_crops:.2f} ms/découpe")
+    print(f"Histogramme + k-means vectorisé : {fast_time * 1000:.1f} ms au total, {fast_time * 1000 / n_crops:.2f} ms/découpe")
+    print(f"Accélération: x{legacy_time / max(fast_time, 1e-9):.1f}")
+    print(f"Distance RGB ancien/nouveau - moyenne: {distances.mean():.1f}, médiane: {np.median(distances):.1f}, p95: {np.percentile(distances, 95):.1f}")
+    print(f"Découpes à moins de 25 unités RGB de l'ancienne couleur: {100 * np.mean(distances < 25):.1f}%")
+    print(f"Découpes avec le même nom de couleur: {100 * np.mean(same_name):.1f}%")
+    return distances
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark de la couleur dominante (cv2.kmeans vs histogramme vectorisé)')
+    parser.add_argument('--images', type=str, default='uploads/drawings/*', help='motif glob d\'images réelles à inclure')
+    parser.add_argument('--boxes', type=int, default=8, help='nombre de boîtes aléatoires par image réelle')
+    parser.add_argument('--synthetic', type=int, default=10, help='nombre de scènes synthétiques')
+    parser.add_argument('--size', type=str, default='4032x3024', help='résolution des scènes synthétiques (photo de téléphone)')
+    parser.add_argument('--seed', type=int, default=0)
+
+    args = parser.parse_args()
+    rng = np.random.default_rng(args.seed)
+    random.seed(args.seed)
+    cv2.setRNGSeed(args.seed)
+
+    width, height = [int(v) for v in args.size.split('x')]
+    samples = [synthetic_scene(width, height, 10, rng) for _ in range(args.synthetic)]
+    for path in sorted(glob.glob(args.images)):
+        img = Image.open(path)
+        samples.append((img, random_boxes(img.width, img.height, args.boxes, rng)))
+
+    run_benchmark(samples)
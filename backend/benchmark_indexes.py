@@ -0,0 +1,160 @@
+"""
+Benchmark des index composites de la migration 0003 (voir migrations/versions/).
+
+Remplit une base avec des données synthétiques à la révision 0002 (sans les
+index), puis mesure les requêtes des accès fréquents avant et après la montée
+à 0003 :
+- plan d'exécution (EXPLAIN QUERY PLAN sous SQLite, EXPLAIN sous MySQL) :
+  parcours de table ou de l'index de clé étrangère + tri, contre parcours
+  direct de l'index composite dans l'ordre demandé
+- temps médian par requête
+
+Utilisation:
+python benchmark_indexes.py                                   # base SQLite temporaire
+python benchmark_indexes.py --users 2000 --rows 100
+python benchmark_indexes.py --url mysql+pymysql://root:@localhost/toy_helper_bench   # base MySQL vide dédiée
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import create_engine, insert, select, text
+
+import database_models as db_models
+import gallery
+from migration import migrate
+
+INDEXED_REVISION = "0003"
+PREVIOUS_REVISION = "0002"
+
+
+def populate(conn, n_users, rows_per_user, rng):
+    """Utilisateurs avec leurs dessins, progressions, événements d'activité ; niveaux de memory avec leurs cartes."""
+    start = datetime(2025, 1, 1)
+    conn.execute(insert(db_models.Utilisateur), [{"id": u, "nom": f"enfant{u}"} for u in range(1, n_users + 1)])
+    conn.execute(insert(db_models.LegoStage), [{"id": s, "niveau": s} for s in range(1, 51)])
+    n_levels = max(n_users // 10, 1)
+    conn.execute(insert(db_models.MemoryLevel), [{"id": lv, "niveau": lv} for lv in range(1, n_levels + 1)])
+
+    dessins, progressions, events = [], [], []
+    for u in range(1, n_users + 1):
+        for _ in range(rows_per_user):
+            when = start + timedelta(minutes=int(rng.integers(0, 365 * 24 * 60)))
+            dessins.append({"user_id": u, "image_path": f"{u}.png", "date_creation": when})
+            events.append({"user_id": u, "action": "click", "page": "memory", "timestamp": when})
+        for s in rng.choice(50, size=min(rows_per_user, 50), replace=False):
+            progressions.append({"user_id": u, "stage_id": int(s) + 1, "score": int(rng.integers(0, 100))})
+    # Insertion dans un ordre aléatoire, comme des écritures de plusieurs utilisateurs entrelacées
+    for rows in (dessins, progressions, events):
+        rng.shuffle(rows)
+    cards = [{"level_id": lv, "image_path": f"{p}.png", "paire_id": p}
+             for lv in range(1, n_levels + 1) for p in range(12) for _ in range(2)]
+    rng.shuffle(cards)
+
+    conn.execute(insert(db_models.Dessin), dessins)
+    conn.execute(insert(db_models.Progression), progressions)
+    conn.execute(insert(db_models.ActivityLog), events)
+    conn.execute(insert(db_models.MemoryCard), cards)
+    return n_levels
+
+
+def hot_queries(user_id, level_id):
+    """Requêtes des accès fréquents : (nom, requête SQLAlchemy)."""
+    since = datetime(2025, 6, 1)
+    log = db_models.ActivityLog
+    return [
+        ("galerie (dessins user_id, date_creation)", gallery.page_query(user_id, gallery.DEFAULT_PAGE_SIZE)),
+        ("progressions (user_id, stage_id)",
+         select(db_models.Progression).where(db_models.Progression.user_id == user_id)
+         .order_by(db_models.Progression.stage_id)),
+        ("journal (activity_logs user_id, timestamp)",
+         select(log).where(log.user_id == user_id, log.timestamp >= since, log.timestamp < since + timedelta(days=7))
+         .order_by(log.timestamp)),
+        ("memory (memory_cards level_id, paire_id)",
+         select(db_models.MemoryCard).where(db_models.MemoryCard.level_id == level_id)
+         .order_by(db_models.MemoryCard.paire_id)),
+    ]
+
+
+def explain(conn, query):
+    sql = str(query.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True}))
+    if conn.dialect.name == "sqlite":
+        return [row[-1] for row in conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"))]
+    result = conn.execute(text(f"EXPLAIN {sql}"))
+    keys = list(result.keys())
+    return [f"{row[keys.index('table')]}: type={row[keys.index('type')]} key={row[keys.index('key')]} "
+            f"rows={row[keys.index('rows')]} extra={row[keys.index('Extra')]}" for row in result]
+
+
+def measure(conn, n_users, n_levels, repeats, rng):
+    """{nom: (plan, temps médian en ms)} sur `repeats` utilisateurs / niveaux tirés au hasard."""
+    samples = [(int(rng.integers(1, n_users + 1)), int(rng.integers(1, n_levels + 1))) for _ in range(repeats)]
+    plans = {name: explain(conn, query) for name, query in hot_queries(*samples[0])}
+    timings = {name: [] for name in plans}
+    for user_id, level_id in samples:
+        for name, query in hot_queries(user_id, level_id):
+            start = time.perf_counter()
+            conn.execute(query).all()
+            timings[name].append(time.perf_counter() - start)
+    return {name: (plans[name], statistics.median(timings[name]) * 1000) for name in plans}
+
+
+def analyze(conn):
+    """Met à jour les statistiques de l'optimiseur."""
+    if conn.dialect.name == "sqlite":
+        conn.execute(text("ANALYZE"))
+    else:
+        conn.execute(text("ANALYZE TABLE dessins, progressions, activity_logs, memory_cards"))
+
+
+def run_benchmark(url, n_users, rows_per_user, repeats, seed):
+    rng = np.random.default_rng(seed)
+    engine = create_engine(url)
+    with engine.begin() as conn:
+        migrate(conn, PREVIOUS_REVISION)
+        start = time.perf_counter()
+        n_levels = populate(conn, n_users, rows_per_user, rng)
+        print(f"Données: {n_users} utilisateurs x {rows_per_user} lignes ({time.perf_counter() - start:.1f} s)")
+
+    results = {}
+    for revision in (PREVIOUS_REVISION, INDEXED_REVISION):
+        with engine.begin() as conn:
+            migrate(conn, revision)
+            analyze(conn)
+        with engine.connect() as conn:
+            results[revision] = measure(conn, n_users, n_levels, repeats, np.random.default_rng(seed))
+    engine.dispose()
+
+    for name in results[PREVIOUS_REVISION]:
+        before_plan, before_ms = results[PREVIOUS_REVISION][name]
+        after_plan, after_ms = results[INDEXED_REVISION][name]
+        print(f"\n{name}")
+        print(f"  sans index composite : {before_ms:.3f} ms")
+        for line in before_plan:
+            print(f"    {line}")
+        print(f"  avec index composite : {after_ms:.3f} ms (x{before_ms / max(after_ms, 1e-9):.1f})")
+        for line in after_plan:
+            print(f"    {line}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark des index composites (plans et temps avant/après la migration 0003)')
+    parser.add_argument('--url', type=str, default=None, help='URL SQLAlchemy d\'une base vide (défaut: fichier SQLite temporaire)')
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--rows', type=int, default=50, help='dessins et événements par utilisateur')
+    parser.add_argument('--repeats', type=int, default=200, help='requêtes mesurées par accès')
+    parser.add_argument('--seed', type=int, default=0)
+
+    args = parser.parse_args()
+
+    if args.url:
+        run_benchmark(args.url, args.users, args.rows, args.repeats, args.seed)
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            run_benchmark(f"sqlite:///{os.path.join(tmp, 'bench.db')}", args.users, args.rows, args.repeats, args.seed)
@@ -0,0 +1,136 @@
+"""
+Nommage des couleurs en français par table de correspondance précalculée.
+
+La palette est projetée une fois pour toutes sur une grille RGB quantifiée
+(32 x 32 x 32 cases) : chaque case contient l'indice du nom de couleur le plus
+proche au sens de la distance pondérée (0.3 R, 0.59 V, 0.11 B). Nommer une
+couleur revient ensuite à une simple lecture de tableau, vectorisable sur
+autant de couleurs que l'on veut.
+"""
+import re
+
+import numpy as np
+
+# Définition des couleurs de base et leurs nuances (format RGB)
+PALETTE = {
+    # Couleurs de base
+    "rouge": (255, 0, 0),
+    "vert": (0, 255, 0),
+    "bleu": (0, 0, 255),
+    "jaune": (255, 255, 0),
+    "cyan": (0, 255, 255),
+    "magenta": (255, 0, 255),
+    "blanc": (255, 255, 255),
+    "noir": (0, 0, 0),
+    "gris": (128, 128, 128),
+
+    # Nuances
+    "rouge foncé": (139, 0, 0),
+    "rouge clair": (255, 102, 102),
+    "vert foncé": (0, 100, 0),
+    "vert clair": (144, 238, 144),
+    "bleu foncé": (0, 0, 139),
+    "bleu clair": (135, 206, 235),
+    "jaune clair": (255, 255, 224),
+    "orange": (255, 165, 0),
+    "orange foncé": (255, 140, 0),
+    "rose": (255, 192, 203),
+    "rose foncé": (255, 20, 147),
+    "violet": (138, 43, 226),
+    "violet clair": (216, 191, 216),
+    "marron": (139, 69, 19),
+    "marron clair": (160, 82, 45),
+    "beige": (245, 245, 220),
+    "turquoise": (64, 224, 208),
+    "or": (255, 215, 0),
+    "argent": (192, 192, 192)
+}
+
+# La perception humaine est plus sensible au vert, moins au bleu
+CHANNEL_WEIGHTS = np.array([0.3, 0.59, 0.11], dtype=np.float32)
+# Bits par canal de la table (5 -> 32 x 32 x 32 cases)
+LUT_BITS = 5
+
+
+def build_lookup_table(palette_rgb, bits=LUT_BITS):
+    """Indice du nom le plus proche pour le centre de chaque case de la grille RGB."""
+    levels = 1 << bits
+    step = 256 // levels
+    centers = np.arange(levels, dtype=np.float32) * step + (step - 1) / 2
+    r, g, b = np.meshgrid(centers, centers, centers, indexing="ij")
+    grid = np.stack([r, g, b], axis=-1).reshape(-1, 1, 3)
+    distances = np.sum(CHANNEL_WEIGHTS * (grid - palette_rgb[None, :, :]) ** 2, axis=2)
+    return np.argmin(distances, axis=1).astype(np.uint16).reshape(levels, levels, levels)
+
+
+# (palette, noms, table) remplacés ensemble pour que les lectures concurrentes restent cohérentes
+_table = ({}, [], None)
+
+
+def set_palette(palette):
+    """Remplace la palette et recalcule la table (coût payé une seule fois)."""
+    global _table
+    names = list(palette.keys())
+    palette_rgb = np.array([palette[name] for name in names], dtype=np.float32)
+    _table = (dict(palette), names, build_lookup_table(palette_rgb))
+
+
+def color_names(rgb_colors):
+    """Noms français d'un ensemble de couleurs RGB (tableau (N, 3) ou liste de tuples)."""
+    rgb = np.asarray(rgb_colors, dtype=np.int64).reshape(-1, 3)
+    if len(rgb) == 0:
+        return []
+    _, names, lut = _table
+    cells = np.clip(rgb, 0, 255) >> (8 - LUT_BITS)
+    indices = lut[cells[:, 0], cells[:, 1], cells[:, 2]]
+    return [names[i] for i in indices]
+
+
+def color_name(rgb_color):
+    """Nom français d'une seule couleur RGB."""
+    return color_names([rgb_color])[0]
+
+
+# Formats acceptés pour une couleur avec sa valeur : "bleu ciel=#87CEEB" ou "bleu ciel(135, 206, 235)"
+_HEX_COLOR = re.compile(r"^\s*(?P<name>[^=#(]+?)\s*=\s*#(?P<hex>[0-9a-fA-F]{6})\s*$")
+_RGB_COLOR = re.compile(r"^\s*(?P<name>[^=#(]+?)\s*\(\s*(?P<r>\d{1,3})\s*,\s*(?P<g>\d{1,3})\s*,\s*(?P<b>\d{1,3})\s*\)\s*$")
+
+
+def parse_default_colors(text):
+    """
+    Extrait les couleurs avec valeur RGB d'un champ `Objects.default_colors`.
+    Les noms seuls (ex: "rouge") sont ignorés : ils sont déjà dans la palette
+    ou n'ont pas de valeur utilisable.
+    """
+    colors = {}
+    # Découper sur les virgules qui ne sont pas dans des parenthèses
+    for token in re.split(r",(?![^(]*\))", text or ""):
+        match = _HEX_COLOR.match(token)
+        if match:
+            value = match.group("hex")
+            colors[match.group("name").lower()] = tuple(int(value[i:i + 2], 16) for i in (0, 2, 4))
+            continue
+        match = _RGB_COLOR.match(token)
+        if match:
+            colors[match.group("name").lower()] = tuple(min(255, int(match.group(c))) for c in "rgb")
+    return colors
+
+
+def extend_palette_from_objects(default_colors_values):
+    """
+    Ajoute à la palette les couleurs définies dans les lignes `Objects.default_colors`,
+    puis recalcule la table une seule fois. Renvoie le nombre de couleurs ajoutées ou modifiées.
+    """
+    palette = dict(_table[0])
+    changed = 0
+    for text in default_colors_values:
+        for name, rgb in parse_default_colors(text).items():
+            if palette.get(name) != rgb:
+                palette[name] = rgb
+                changed += 1
+    if changed:
+        set_palette(palette)
+    return changed
+
+
+set_palette(PALETTE)
@@ -1,6 +1,6 @@
 import mysql.connector
-from sqlalchemy import create_engine
-from models import Base
+
+from migration import apply_migration
 
 # Paramètres de connexion MySQL
 DB_USER = "root"
@@ -26,14 +26,12 @@ def create_database():
     cursor.close()
     conn.close()
 
-# Créer les tables à partir des modèles SQLAlchemy
+# Créer les tables par les migrations Alembic (voir migration.py) : la base est versionnée dès sa création
 def create_tables():
     # URL de connexion SQLAlchemy
     DATABASE_URL = f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}/{DB_NAME}"
-    
-    # Créer l'engine et les tables
-    engine = create_engine(DATABASE_URL)
-    Base.metadata.create_all(bind=engine)
+
+    apply_migration(DATABASE_URL)
     print("Tables créées avec succès.")
 
 if __name__ == "__main__":
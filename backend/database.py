@@ -0,0 +1,77 @@
+"""
+Couche base de données asynchrone (SQLAlchemy asyncio).
+
+Les endpoints attendent la base sans bloquer la boucle asyncio : pendant un
+aller-retour MySQL, le serveur continue de traiter les autres requêtes.
+
+Pilotes : aiomysql pour MySQL, aiosqlite pour une base SQLite locale.
+Les URL synchrones existantes (mysql+pymysql://, sqlite://) sont converties
+automatiquement vers le pilote asynchrone correspondant.
+
+Dépendances:
+pip install "sqlalchemy[asyncio]" aiomysql aiosqlite
+"""
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from migration import migrate
+
+# Pilote synchrone -> pilote asynchrone
+ASYNC_DRIVERS = {
+    "mysql": "mysql+aiomysql",
+    "mysql+pymysql": "mysql+aiomysql",
+    "mysql+mysqlconnector": "mysql+aiomysql",
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+}
+
+
+def async_url(url):
+    """URL SQLAlchemy avec un pilote asynchrone (inchangée si elle en a déjà un)."""
+    url = make_url(url)
+    return url.set(drivername=ASYNC_DRIVERS.get(url.drivername, url.drivername))
+
+
+def create_database(url, pool_size=10, max_overflow=20, pool_timeout=30, pool_recycle=1800, pool_pre_ping=True, echo=False):
+    """
+    Moteur asynchrone + fabrique de sessions.
+    :param pool_size: connexions gardées ouvertes en permanence
+    :param max_overflow: connexions supplémentaires autorisées lors des pics
+    :param pool_timeout: attente maximale (s) d'une connexion libre avant erreur
+    :param pool_recycle: durée de vie maximale (s) d'une connexion, à garder sous wait_timeout de MySQL
+    :param pool_pre_ping: vérifie la connexion avant usage (connexions coupées par le serveur)
+    :return: (moteur, fabrique de sessions AsyncSession)
+    """
+    url = async_url(url)
+    if url.get_backend_name() == "sqlite":
+        if url.database in (None, "", ":memory:"):
+            # Base en mémoire : une seule connexion partagée, sinon chaque connexion verrait une base vide
+            engine = create_async_engine(url, echo=echo, poolclass=StaticPool)
+        else:
+            engine = create_async_engine(url, echo=echo, pool_pre_ping=pool_pre_ping)
+    else:
+        engine = create_async_engine(
+            url,
+            echo=echo,
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_timeout=pool_timeout,
+            pool_recycle=pool_recycle,
+            pool_pre_ping=pool_pre_ping,
+        )
+    # expire_on_commit=False : les objets restent lisibles après commit sans nouvelle requête implicite
+    session_factory = async_sessionmaker(engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+    return engine, session_factory
+
+
+async def create_tables(engine, metadata):
+    """Crée les tables manquantes (bases locales SQLite, tests)."""
+    async with engine.begin() as conn:
+        await conn.run_sync(metadata.create_all)
+
+
+async def upgrade_database(engine, revision="head"):
+    """Met le schéma à jour par les migrations Alembic (voir migration.py) : la base est versionnée dès sa création."""
+    async with engine.begin() as conn:
+        await conn.run_sync(migrate, revision)
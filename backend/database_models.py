@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, Boolean, Float, DateTime, func
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, Boolean, Float, DateTime, Index, UniqueConstraint, func
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -33,10 +33,16 @@ class Dessin(Base):
     date_creation = Column(DateTime, default=datetime.utcnow)
     description = Column(Text, nullable=True)
     objet_detecte = Column(String(100), nullable=True)  # Type d'objet détecté dans le dessin
+    content_hash = Column(String(64), nullable=True, index=True)  # SHA-256 du fichier (nom du fichier dans uploads/)
 
     # Relations
     utilisateur = relationship("Utilisateur", back_populates="dessins")
 
+    __table_args__ = (
+        # Galerie d'un utilisateur, du plus récent au plus ancien (voir gallery.py)
+        Index("ix_dessins_user_date", "user_id", "date_creation"),
+    )
+
 
 class Chambre(Base):
     __tablename__ = "chambres"
@@ -47,6 +53,7 @@ class Chambre(Base):
     objets_reference = Column(Text, nullable=True)  # Storing detected objects as JSON string
     date_creation = Column(DateTime, default=datetime.utcnow)
     completed_tasks = Column(Integer, default=0)  # Nombre de tâches complétées
+    content_hash = Column(String(64), nullable=True)  # SHA-256 de l'image de référence
 
     # Relation
     utilisateur = relationship("Utilisateur", back_populates="chambre")
@@ -79,6 +86,11 @@ class Progression(Base):
     utilisateur = relationship("Utilisateur", back_populates="progressions")
     stage = relationship("LegoStage", back_populates="progressions")
 
+    __table_args__ = (
+        # Progression d'un utilisateur, étape par étape
+        Index("ix_progressions_user_stage", "user_id", "stage_id"),
+    )
+
 
 class MemoryLevel(Base):
     __tablename__ = "memory_levels"
@@ -104,6 +116,11 @@ class MemoryCard(Base):
     # Relations
     level = relationship("MemoryLevel", back_populates="cards")
 
+    __table_args__ = (
+        # Cartes d'un niveau regroupées par paire
+        Index("ix_memory_cards_level_paire", "level_id", "paire_id"),
+    )
+
 
 class Objects(Base):
     """
@@ -136,3 +153,53 @@ class ActivityLog(Base):
     page = Column(String(100), nullable=False)
     timestamp = Column(DateTime, default=datetime.utcnow)
     details = Column(Text, nullable=True)  # Stocke les détails JSON sous forme de texte
+
+    __table_args__ = (
+        # Historique d'un utilisateur sur une période
+        Index("ix_activity_logs_user_timestamp", "user_id", "timestamp"),
+    )
+
+
+class ActivityRollup(Base):
+    """
+    Agrégats d'activité maintenus à l'écriture du journal (voir activity_rollups.py) :
+    nombre d'événements et durée cumulée par utilisateur, page et tranche horaire ou journalière
+    """
+    __tablename__ = "activity_rollups"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("utilisateurs.id"), nullable=False)
+    granularity = Column(String(10), nullable=False)  # "hour" ou "day"
+    bucket_start = Column(DateTime, nullable=False)  # Début de l'heure ou du jour (UTC)
+    page = Column(String(100), nullable=False)
+    event_count = Column(Integer, nullable=False, default=0)
+    total_duration = Column(Float, nullable=False, default=0.0)  # Secondes (details["duration"] des événements)
+
+    __table_args__ = (
+        # Une ligne par tranche ; sert aussi aux lectures par utilisateur et période
+        UniqueConstraint("user_id", "granularity", "bucket_start", "page", name="uq_activity_rollups_bucket"),
+    )
+
+
+class AnalysisJob(Base):
+    """
+    Travaux exécutés en arrière-plan par la file de job_queue.py
+    (ex: kind="dessin", target_id=<id du dessin> pour la détection d'objets d'un dessin)
+    """
+    __tablename__ = "analysis_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String(50), nullable=False)
+    target_id = Column(Integer, nullable=False)
+    status = Column(String(20), nullable=False, default="pending")  # pending, running, done, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text, nullable=True)
+    available_at = Column(DateTime, nullable=False, default=datetime.utcnow)  # Prochain essai possible
+    date_creation = Column(DateTime, default=datetime.utcnow)
+    date_maj = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        # Prise du prochain travail disponible, et statut d'une cible
+        Index("ix_analysis_jobs_status_available", "status", "available_at"),
+        Index("ix_analysis_jobs_kind_target", "kind", "target_id"),
+    )
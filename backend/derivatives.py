@@ -0,0 +1,119 @@
+"""
+Dérivés d'images (miniatures WebP de tailles fixes) générés en arrière-plan.
+
+Après /dessins/upload/ et /chambre/upload_reference/, l'original est enregistré
+tel quel puis une tâche de fond produit, à côté de lui, une version WebP pour
+chaque taille de DERIVATIVE_SIZES :
+    uploads/drawings/dessin_user1_20250101.png
+    uploads/drawings/dessin_user1_20250101.128.webp
+    uploads/drawings/dessin_user1_20250101.512.webp
+L'original n'est décodé qu'une fois (en mode draft pour les JPEG), les tailles
+étant produites de la plus grande à la plus petite. Les clients affichent les
+grilles avec ces dérivés au lieu de télécharger les originaux.
+"""
+import asyncio
+import io
+import os
+import threading
+
+from PIL import Image
+
+from image_decode import decode_image
+
+# Qualité d'encodage WebP des dérivés
+WEBP_QUALITY = 80
+
+
+def derivative_path(original_path, size):
+    """Chemin du dérivé `size` px d'un original (même dossier)."""
+    root, _ = os.path.splitext(original_path)
+    return f"{root}.{size}.webp"
+
+
+def is_fresh(original_path, size):
+    """Le dérivé existe et n'est pas plus ancien que l'original."""
+    try:
+        return os.path.getmtime(derivative_path(original_path, size)) >= os.path.getmtime(original_path)
+    except OSError:
+        return False
+
+
+def generate_derivatives(original_path, sizes, quality=WEBP_QUALITY):
+    """
+    Écrit les dérivés manquants ou périmés d'un original (appel bloquant).
+    :return: dict taille -> chemin du dérivé
+    """
+    missing = sorted((size for size in sizes if not is_fresh(original_path, size)), reverse=True)
+    if missing:
+        with open(original_path, "rb") as f:
+            img = decode_image(f.read(), max_side=missing[0]).image
+        for size in missing:
+            # Réduction successive depuis la taille précédente (déjà plus petite que l'original)
+            img.thumbnail((size, size), Image.LANCZOS)
+            out = io.BytesIO()
+            img.save(out, "WEBP", quality=quality)
+            path = derivative_path(original_path, size)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(out.getvalue())
+            os.replace(tmp_path, path)  # Écriture atomique : jamais de dérivé partiel servi
+    return {size: derivative_path(original_path, size) for size in sizes}
+
+
+class DerivativeGenerator:
+    """Planifie la génération des dérivés dans un WorkerPool et permet d'attendre un dérivé précis."""
+
+    def __init__(self, pool, sizes=(128, 512), quality=WEBP_QUALITY):
+        self.pool = pool
+        self.sizes = tuple(sorted(sizes))
+        self.quality = quality
+        # original -> tâche de génération en cours
+        self._tasks = {}
+        self.stats = {"generated": 0, "on_demand": 0, "errors": 0}
+
+    def schedule(self, original_path):
+        """Lance la génération en arrière-plan (sans attendre) et renvoie la tâche."""
+        task = self._tasks.get(original_path)
+        if task is None:
+            task = asyncio.create_task(self._generate(original_path))
+            self._tasks[original_path] = task
+            task.add_done_callback(lambda _: self._tasks.pop(original_path, None))
+        return task
+
+    async def _generate(self, original_path):
+        try:
+            paths = await self.pool.run(generate_derivatives, original_path, self.sizes, self.quality)
+            self.stats["generated"] += 1
+            return paths
+        except Exception as e:
+            self.stats["errors"] += 1
+            print(f"⚠️ Dérivés d'image: échec pour {original_path} ({e})")
+            return None
+
+    def closest_size(self, size):
+        """Plus petite taille disponible >= `size` (ou la plus grande)."""
+        return next((s for s in self.sizes if s >= size), self.sizes[-1])
+
+    async def get(self, original_path, size):
+        """
+        Chemin du dérivé demandé ; généré à la demande s'il manque (anciennes images,
+        génération pas encore terminée). None si l'original est introuvable ou illisible.
+        """
+        if is_fresh(original_path, size):
+            return derivative_path(original_path, size)
+        if not os.path.exists(original_path):
+            return None
+        if original_path not in self._tasks:
+            self.stats["on_demand"] += 1
+        # Tâche partagée avec les autres requêtes et la génération lancée à l'upload : l'annulation de
+        # cette requête ne doit pas l'interrompre
+        paths = await asyncio.shield(self.schedule(original_path))
+        return paths.get(size) if paths else None
+
+    async def drain(self):
+        """Attend les générations en cours (arrêt du serveur)."""
+        if self._tasks:
+            await asyncio.gather(*list(self._tasks.values()), return_exceptions=True)
+
+    def status(self):
+        return {"sizes": list(self.sizes), "pending": len(self._tasks), **self.stats}
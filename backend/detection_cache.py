@@ -0,0 +1,131 @@
+"""
+Cache des résultats de détection adressé par le contenu des images.
+
+Les enfants renvoient souvent la même photo (nouvel essai, même dessin ouvert deux
+fois, images de caméra identiques envoyées à /describe_object/). La clé combine
+l'empreinte SHA-256 des octets de l'image, l'empreinte du modèle et les seuils
+utilisés : une même image n'est donc jamais servie avec le résultat d'un autre modèle.
+
+Deux niveaux :
+- mémoire : LRU borné (OrderedDict) ;
+- disque (optionnel) : un fichier .npz par résultat, conservé entre les redémarrages.
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from detections import DetectionResult
+
+
+def content_digest(data):
+    """Empreinte SHA-256 des octets d'une image."""
+    return hashlib.sha256(data).hexdigest()
+
+
+class DetectionCache:
+    """LRU en mémoire + niveau disque optionnel, utilisable depuis plusieurs threads."""
+
+    def __init__(self, max_entries=256, disk_dir=None, max_disk_entries=10000):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.max_disk_entries = max_disk_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_count = None
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0}
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    @staticmethod
+    def key(digest, model_fingerprint, *params):
+        """Clé de cache : contenu de l'image + modèle + paramètres (seuils, taille de travail)."""
+        return hashlib.sha256("|".join([digest, model_fingerprint, *map(str, params)]).encode()).hexdigest()
+
+    def get(self, key):
+        """Résultat en cache ou None (mémoire d'abord, puis disque)."""
+        with self._lock:
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return result
+        result = self._load(key) if self.disk_dir else None
+        with self._lock:
+            if result is None:
+                self.stats["misses"] += 1
+                return None
+            self.stats["disk_hits"] += 1
+            self._remember(key, result)
+        return result
+
+    def put(self, key, result):
+        with self._lock:
+            self._remember(key, result)
+        if self.disk_dir:
+            self._save(key, result)
+
+    def status(self):
+        return {"entries": len(self._entries), "max_entries": self.max_entries, "disk": bool(self.disk_dir), **self.stats}
+
+    def _remember(self, key, result):
+        self._entries[key] = result
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    # --- Niveau disque ---
+
+    def _path(self, key):
+        return os.path.join(self.disk_dir, key[:2], f"{key}.npz")
+
+    def _disk_files(self):
+        for folder in os.listdir(self.disk_dir):
+            folder_path = os.path.join(self.disk_dir, folder)
+            if os.path.isdir(folder_path):
+                for name in os.listdir(folder_path):
+                    yield os.path.join(folder_path, name)
+
+    def _load(self, key):
+        try:
+            with np.load(self._path(key)) as data:
+                names = {int(k): v for k, v in json.loads(str(data["names"])).items()}
+                return DetectionResult(data["boxes"], data["scores"], data["class_ids"], names)
+        except (OSError, KeyError, ValueError):
+            return None
+
+    def _save(self, key, result):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                np.savez(f, boxes=result.boxes, scores=result.scores, class_ids=result.class_ids,
+                         names=json.dumps(result.names))
+            os.replace(tmp_path, path)  # Écriture atomique : un lecteur ne voit jamais de fichier partiel
+        except OSError as e:
+            print(f"⚠️ Cache de détection: écriture impossible ({e})")
+            return
+        self._trim_disk()
+
+    def _trim_disk(self):
+        """Supprime les résultats les plus anciens quand le niveau disque dépasse sa taille maximale."""
+        with self._lock:
+            if self._disk_count is None:
+                self._disk_count = sum(1 for _ in self._disk_files())
+            else:
+                self._disk_count += 1
+            if self._disk_count <= self.max_disk_entries:
+                return
+            files = sorted(self._disk_files(), key=lambda p: os.path.getmtime(p) if os.path.exists(p) else 0)
+            # Marge de 10 % pour ne pas rescanner le dossier à chaque écriture
+            excess = len(files) - int(self.max_disk_entries * 0.9)
+            for path in files[:excess]:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            self._disk_count = len(files) - max(0, excess)
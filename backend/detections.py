@@ -0,0 +1,78 @@
+"""
+Résultat de détection compact, basé sur des tableaux NumPy.
+
+Remplace `results.pandas().xyxy[0]` + `iterrows()` dans les endpoints :
+les boîtes, scores et classes sont extraits directement du tenseur de sortie
+YOLOv5 (colonnes x1, y1, x2, y2, confiance, classe), sans passer par pandas.
+"""
+import numpy as np
+
+
+class DetectionResult:
+    """Détections d'une image : boîtes (N, 4), scores (N,), ids de classe (N,)."""
+
+    __slots__ = ("boxes", "scores", "class_ids", "names")
+
+    def __init__(self, boxes, scores, class_ids, names):
+        self.boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        self.scores = np.asarray(scores, dtype=np.float32).reshape(-1)
+        self.class_ids = np.asarray(class_ids, dtype=np.int64).reshape(-1)
+        # Table id de classe -> nom (dict YOLOv5 ou liste)
+        self.names = names if isinstance(names, dict) else dict(enumerate(names))
+
+    @classmethod
+    def from_tensor(cls, pred, names):
+        """Construit le résultat à partir d'une ligne de `results.xyxy` (tenseur N x 6)."""
+        if hasattr(pred, "detach"):
+            pred = pred.detach().cpu().numpy()
+        pred = np.asarray(pred, dtype=np.float32).reshape(-1, 6)
+        return cls(pred[:, :4], pred[:, 4], pred[:, 5].astype(np.int64), names)
+
+    @classmethod
+    def empty(cls, names=None):
+        return cls(np.zeros((0, 4)), np.zeros(0), np.zeros(0), names or {})
+
+    def __len__(self):
+        return len(self.scores)
+
+    def __iter__(self):
+        """Itère sur (nom, confiance, boîte en pixels entiers)."""
+        return iter(zip(self.labels, self.scores.tolist(), self.int_boxes()))
+
+    @property
+    def labels(self):
+        return [self.names.get(int(c), str(int(c))) for c in self.class_ids]
+
+    def label(self, index):
+        return self.names.get(int(self.class_ids[index]), str(int(self.class_ids[index])))
+
+    def int_boxes(self):
+        """Boîtes sous forme de listes [xmin, ymin, xmax, ymax] d'entiers (format JSON des endpoints)."""
+        return self.boxes.astype(np.int64).tolist()
+
+    def select(self, mask_or_indices):
+        """Sous-ensemble des détections (masque booléen ou indices)."""
+        return DetectionResult(
+            self.boxes[mask_or_indices],
+            self.scores[mask_or_indices],
+            self.class_ids[mask_or_indices],
+            self.names
+        )
+
+    def above(self, min_score):
+        return self.select(self.scores >= min_score)
+
+    def with_names(self, wanted):
+        """Garde uniquement les détections dont le nom de classe est dans `wanted`."""
+        wanted_ids = [class_id for class_id, name in self.names.items() if name in set(wanted)]
+        return self.select(np.isin(self.class_ids, wanted_ids))
+
+    def sorted_by_score(self):
+        return self.select(np.argsort(-self.scores, kind="stable"))
+
+    def scaled(self, scale_x, scale_y):
+        """Boîtes multipliées par (scale_x, scale_y), ex: retour aux coordonnées de l'image d'origine."""
+        if scale_x == 1 and scale_y == 1:
+            return self
+        factors = np.array([scale_x, scale_y, scale_x, scale_y], dtype=np.float32)
+        return DetectionResult(self.boxes * factors, self.scores, self.class_ids, self.names)
@@ -0,0 +1,108 @@
+"""
+Script pour exporter les modèles YOLOv5 (par défaut et personnalisé) en TorchScript et ONNX,
+pour une inférence CPU plus rapide qu'avec PyTorch en mode eager.
+
+Les exports sont écrits à côté des poids .pt (même nom, suffixe .torchscript / .onnx)
+et sont utilisés par le serveur quand INFERENCE_BACKEND vaut "torchscript" ou "onnx"
+dans main.py. L'export ONNX a une taille de lot dynamique (micro-batching).
+
+Utilisation:
+python export_models.py                            # yolov5s.pt + models/custom_yolov5_toys.pt
+python export_models.py --weights models/custom_yolov5_toys.pt --include onnx
+python export_models.py --check --images "uploads/drawings/*"   # compare détections et latences
+
+Dépendances:
+pip install onnx onnxruntime
+"""
+
+import argparse
+import glob
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+from detections import DetectionResult
+from model_loader import DEFAULT_WEIGHTS, INFERENCE_BACKENDS, load_yolov5, resolve_weights, yolov5_code_dir
+
+EXPORT_FORMATS = ["torchscript", "onnx"]
+
+
+def export_model(weights, models_dir, version, formats, img_size=640):
+    """Lance export.py du code YOLOv5 en cache sur un fichier de poids."""
+    code_dir = yolov5_code_dir(models_dir, version)
+    weights_path = resolve_weights(models_dir, version, weights)
+    cmd = [sys.executable, "export.py", "--weights", weights_path, "--include", *formats,
+           "--imgsz", str(img_size), "--device", "cpu"]
+    if "onnx" in formats:
+        cmd.append("--dynamic")  # Lots de taille variable pour le moteur d'inférence
+    print(f"Export de {weights_path} en {', '.join(formats)}")
+    subprocess.run(cmd, cwd=code_dir, check=True)
+
+
+def detection_dicts(result):
+    """Même format que les réponses de /simple_detect_objects/."""
+    return [{"label": name, "confidence": float(score), "box": box} for name, score, box in result]
+
+
+def same_detections(reference, other, tolerance=2):
+    """Proportion des détections de référence retrouvées (même classe, boîte à `tolerance` px près)."""
+    if not reference:
+        return 1.0 if not other else 0.0
+    found = 0
+    for det in reference:
+        if any(o["label"] == det["label"] and max(abs(a - b) for a, b in zip(o["box"], det["box"])) <= tolerance
+               for o in other):
+            found += 1
+    return found / len(reference)
+
+
+def compare_backends(weights, models_dir, version, images, threads=None, runs=3):
+    """Latence moyenne et concordance des détections de chaque moteur par rapport à PyTorch."""
+    reference = None
+    for backend in INFERENCE_BACKENDS:
+        model, load_time, model_path = load_yolov5(models_dir, version, weights, backend=backend, threads=threads)
+        model(images[:1])  # Préchauffage
+        start = time.perf_counter()
+        for _ in range(runs):
+            results = model(images)
+        latency = (time.perf_counter() - start) / (runs * len(images))
+        dicts = [detection_dicts(DetectionResult.from_tensor(pred, results.names)) for pred in results.xyxy]
+        if reference is None:
+            reference = dicts
+        agreement = np.mean([same_detections(ref, d) for ref, d in zip(reference, dicts)])
+        print(f"{backend:12s} {os.path.basename(model_path):28s} chargement {load_time:.2f}s - "
+              f"{latency * 1000:.1f} ms/image - détections identiques: {100 * agreement:.1f}%")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Exporter les modèles YOLOv5 en TorchScript / ONNX')
+    parser.add_argument('--models_dir', type=str, default='models', help='dossier des modèles')
+    parser.add_argument('--version', type=str, default='v7.0', help='tag YOLOv5 du cache local')
+    parser.add_argument('--weights', type=str, nargs='+', default=None, help='poids .pt à exporter (défaut: modèle par défaut + personnalisé)')
+    parser.add_argument('--include', type=str, nargs='+', default=EXPORT_FORMATS, choices=EXPORT_FORMATS, help='formats d\'export')
+    parser.add_argument('--img_size', type=int, default=640, help='taille des images')
+    parser.add_argument('--check', action='store_true', help='comparer les moteurs après export')
+    parser.add_argument('--images', type=str, default='uploads/drawings/*', help='motif glob d\'images pour --check')
+    parser.add_argument('--threads', type=int, default=None, help='threads intra-op pour --check')
+
+    args = parser.parse_args()
+    weights_list = args.weights or [DEFAULT_WEIGHTS]
+    custom_path = os.path.join(args.models_dir, "custom_yolov5_toys.pt")
+    if args.weights is None and os.path.exists(custom_path):
+        weights_list.append(custom_path)
+
+    for weights in weights_list:
+        export_model(weights, args.models_dir, args.version, args.include, args.img_size)
+
+    if args.check:
+        images = [Image.open(path).convert('RGB') for path in sorted(glob.glob(args.images))[:8]]
+        if not images:
+            rng = np.random.default_rng(0)
+            images = [Image.fromarray(rng.integers(0, 256, (480, 640, 3), dtype=np.uint8)) for _ in range(4)]
+        for weights in weights_list:
+            print(f"\nComparaison des moteurs pour {weights} ({len(images)} images)")
+            compare_backends(weights, args.models_dir, args.version, images, args.threads)
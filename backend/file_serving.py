@@ -0,0 +1,84 @@
+"""
+Service des fichiers d'uploads (dessins, photos de chambre, miniatures).
+
+Les images sont envoyées telles quelles par FileResponse (lecture par blocs,
+sendfile via l'extension ASGI « pathsend » quand le serveur la propose, gestion
+des en-têtes Range / If-Range) au lieu d'être encodées en base64 dans du JSON.
+En plus :
+- ETag fort : l'empreinte SHA-256 du contenu pour les fichiers adressés par leur
+  contenu (nom = empreinte), sinon une empreinte de (inode, taille, mtime) ;
+- If-None-Match : un client qui a déjà le fichier reçoit un 304 sans corps ;
+- Cache-Control : un an + immutable quand l'URL elle-même contient l'empreinte
+  (/uploads/{dossier}/{empreinte}.ext, choisi par la route), durée courte avec
+  revalidation pour les URL stables (par id ou par utilisateur) dont le fichier
+  servi peut changer.
+"""
+import hashlib
+import os
+import re
+import stat
+
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, Response
+
+# Nom de fichier dont la racine est une empreinte SHA-256 (éventuellement suivie d'un suffixe de taille)
+_CONTENT_ADDRESSED = re.compile(r"^([0-9a-f]{64})(\.\d+)?\.[A-Za-z0-9]+$")
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+
+def content_address(path):
+    """Empreinte contenue dans le nom du fichier, ou None si le fichier n'est pas adressé par son contenu."""
+    match = _CONTENT_ADDRESSED.match(os.path.basename(path))
+    return match.group(0) if match else None
+
+
+def strong_etag(path, stat_result):
+    """ETag fort (entre guillemets) d'un fichier."""
+    address = content_address(path)
+    if address:
+        return f'"{address}"'
+    base = f"{stat_result.st_ino}-{stat_result.st_size}-{stat_result.st_mtime_ns}"
+    return f'"{hashlib.sha256(base.encode()).hexdigest()[:32]}"'
+
+
+def etag_matches(if_none_match, etag):
+    """Comparaison faible de If-None-Match (RFC 9110) avec l'ETag courant."""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in (tag[2:] if tag.startswith("W/") else tag for tag in candidates)
+
+
+def safe_path(directory, filename):
+    """Chemin de `filename` dans `directory`, ou None s'il sort du dossier ou n'est pas un fichier servi."""
+    if not filename or filename != os.path.basename(filename) or filename.startswith(".") or filename.endswith(".tmp"):
+        return None
+    root = os.path.realpath(directory)
+    path = os.path.realpath(os.path.join(root, filename))
+    return path if os.path.dirname(path) == root else None
+
+
+async def serve_file(request, path, max_age, media_type=None, immutable=False):
+    """
+    Réponse fichier avec ETag fort, 304 sur If-None-Match et Range.
+    :param max_age: durée de cache (s) avant revalidation
+    :param immutable: l'URL demandée contient l'empreinte du contenu ; un fichier adressé
+        par son contenu est alors mis en cache un an sans revalidation
+    :return: None si le fichier n'existe pas
+    """
+    try:
+        stat_result = await run_in_threadpool(os.stat, path)
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+    if not stat.S_ISREG(stat_result.st_mode):
+        return None
+    etag = strong_etag(path, stat_result)
+    if immutable and content_address(path):
+        cache_control = f"public, max-age={IMMUTABLE_MAX_AGE}, immutable"
+    else:
+        cache_control = f"private, max-age={max_age}, must-revalidate"
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(path, media_type=media_type, headers=headers, stat_result=stat_result)
@@ -0,0 +1,70 @@
+"""
+Galerie de dessins paginée par clé (keyset pagination).
+
+L'ancienne route /dessins/utilisateur/{user_id} renvoie tous les dessins avec leur
+image complète en base64 : la réponse grossit avec la galerie. Ici une page ne
+contient que des métadonnées et des URL (miniature, image complète) et la page
+suivante est désignée par un curseur opaque (date_creation, id) du dernier dessin :
+    WHERE (date_creation, id) < (curseur) ORDER BY date_creation DESC, id DESC LIMIT n
+Le coût d'une page reste constant quelle que soit sa position dans la galerie,
+contrairement à un OFFSET qui relit toutes les lignes précédentes.
+"""
+import base64
+from datetime import datetime
+
+from sqlalchemy import and_, or_, select
+
+import database_models as db_models
+
+# Taille de page par défaut et maximale
+DEFAULT_PAGE_SIZE = 24
+MAX_PAGE_SIZE = 100
+
+
+class InvalidCursor(ValueError):
+    """Curseur de pagination illisible (modifié ou d'une autre version)."""
+
+
+def encode_cursor(dessin):
+    """Curseur opaque désignant la position juste après `dessin`."""
+    raw = f"{dessin.date_creation.isoformat()}|{dessin.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Curseur -> (date_creation, id)."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        date_str, dessin_id = raw.split("|")
+        return datetime.fromisoformat(date_str), int(dessin_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise InvalidCursor(cursor) from e
+
+
+def page_query(user_id, limit, cursor=None):
+    """
+    Requête d'une page de dessins, du plus récent au plus ancien.
+    Une ligne de plus que `limit` est demandée pour savoir s'il reste une page suivante.
+    """
+    dessin = db_models.Dessin
+    query = select(dessin).where(dessin.user_id == user_id)
+    if cursor:
+        date_creation, dessin_id = decode_cursor(cursor)
+        query = query.where(or_(
+            dessin.date_creation < date_creation,
+            and_(dessin.date_creation == date_creation, dessin.id < dessin_id)
+        ))
+    return query.order_by(dessin.date_creation.desc(), dessin.id.desc()).limit(limit + 1)
+
+
+def split_page(rows, limit):
+    """(dessins de la page, curseur de la page suivante ou None)."""
+    rows = list(rows)
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1])
+
+
+def clamp_page_size(limit):
+    return max(1, min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE))
@@ -0,0 +1,61 @@
+"""
+Décodage d'image à mémoire bornée, partagé par les endpoints.
+
+Une photo de téléphone de 12 MP occupe ~36 Mo une fois décodée en RGB, alors que
+YOLOv5 la réduit de toute façon à 640 px. Ici :
+- les JPEG sont décodés directement à taille réduite (mode « draft » de libjpeg,
+  réduction 1/2, 1/4 ou 1/8 pendant la décompression) ;
+- l'orientation EXIF est appliquée une seule fois ;
+- la résolution de travail est plafonnée à `max_side` pixels ;
+- le facteur d'échelle est conservé pour rendre les boîtes dans les
+  coordonnées de l'image d'origine.
+"""
+import io
+import math
+
+from PIL import Image, ImageOps
+
+# Orientations EXIF qui échangent largeur et hauteur (rotations de 90°)
+_TRANSPOSED_ORIENTATIONS = (5, 6, 7, 8)
+_EXIF_ORIENTATION = 0x0112
+
+
+class DecodedImage:
+    """Image RGB à la résolution de travail + taille et échelle de l'image d'origine."""
+
+    __slots__ = ("image", "original_size", "scale")
+
+    def __init__(self, image, original_size):
+        self.image = image
+        self.original_size = original_size
+        # Facteurs (x, y) pour passer des coordonnées de travail à celles d'origine
+        self.scale = (original_size[0] / image.width, original_size[1] / image.height)
+
+    def to_original(self, detections):
+        """Détections exprimées dans les coordonnées de l'image d'origine."""
+        return detections.scaled(*self.scale)
+
+
+def decode_image(data, max_side=1280):
+    """
+    Décode une image (octets ou chemin de fichier) en RGB, orientée selon l'EXIF, plus grand côté <= max_side.
+    :raises PIL.UnidentifiedImageError: si les données ne sont pas une image
+    """
+    img = Image.open(io.BytesIO(data) if isinstance(data, (bytes, bytearray)) else data)
+    width, height = img.size
+    if img.getexif().get(_EXIF_ORIENTATION) in _TRANSPOSED_ORIENTATIONS:
+        width, height = height, width
+
+    ratio = max_side / max(width, height)
+    if ratio < 1 and img.format == "JPEG":
+        # Taille demandée dans le sens du fichier (avant rotation EXIF) ; draft garde au moins cette taille
+        img.draft('RGB', (math.ceil(img.width * ratio), math.ceil(img.height * ratio)))
+
+    img = ImageOps.exif_transpose(img)
+    if max(img.size) > max_side:
+        img.thumbnail((max_side, max_side), Image.BILINEAR)
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    img.load()  # Image lue entièrement ici : un fichier ouvert par chemin est refermé
+    return DecodedImage(img, (width, height))
+
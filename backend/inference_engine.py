@@ -0,0 +1,130 @@
+"""
+Moteur d'inférence partagé avec micro-batching dynamique.
+
+Les endpoints de détection déposent leurs images dans une file d'attente commune.
+Le moteur regroupe les images arrivées dans une courte fenêtre d'attente
+(quelques millisecondes) en un seul lot, lance UNE passe YOLOv5 sur ce lot
+puis renvoie à chaque requête le résultat qui la concerne.
+"""
+import asyncio
+
+from detections import DetectionResult
+
+
+class InferenceEngine:
+    """File d'attente + boucle de batching autour d'un modèle YOLOv5 (AutoShape)."""
+
+    def __init__(self, model, max_batch_size=8, max_wait_ms=10, executor=None):
+        self.model = model
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, max_wait_ms / 1000.0)
+        self.executor = executor
+        self._queue = None
+        self._worker = None
+        # Arrêté définitivement (arrêt du serveur, modèle remplacé) : plus de redémarrage
+        self._closed = False
+        self.stats = {"batches": 0, "images": 0, "largest_batch": 0}
+
+    @property
+    def running(self):
+        return self._worker is not None and not self._worker.done()
+
+    def start(self):
+        """Démarre la boucle de batching dans la boucle asyncio courante."""
+        if self._closed:
+            raise RuntimeError("Moteur d'inférence arrêté")
+        if not self.running:
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Arrête la boucle pour de bon et fait échouer les requêtes encore en attente."""
+        self._closed = True
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        if self._queue is not None:
+            while not self._queue.empty():
+                _, future = self._queue.get_nowait()
+                if not future.done():
+                    future.set_exception(RuntimeError("Moteur d'inférence arrêté"))
+
+    async def drain(self):
+        """Laisse finir les requêtes déjà en file puis arrête le moteur (modèle remplacé)."""
+        if self.running:
+            await self._queue.join()
+        await self.stop()
+
+    async def detect(self, image):
+        """Soumet une image PIL et attend le `DetectionResult` de cette image seule."""
+        if self.model is None:
+            raise RuntimeError("Aucun modèle chargé dans le moteur d'inférence")
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((image, future))
+        return await future
+
+    async def _collect_batch(self):
+        """Attend une première image puis complète le lot jusqu'à la fin de la fenêtre."""
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            # Vider d'abord ce qui est déjà en file sans attendre
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect_batch()
+            try:
+                # Les requêtes abandonnées (client déconnecté) ne coûtent pas d'inférence
+                await self._process([(image, future) for image, future in batch if not future.cancelled()])
+            except asyncio.CancelledError:
+                # Arrêt pendant le lot : ses requêtes ne recevront jamais de résultat
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(RuntimeError("Moteur d'inférence arrêté"))
+                raise
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _process(self, batch):
+        if not batch:
+            return
+        images = [image for image, _ in batch]
+        try:
+            results = await asyncio.get_running_loop().run_in_executor(self.executor, self._forward, images)
+        except Exception as e:
+            print(f"Erreur d'inférence sur un lot de {len(images)} image(s): {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.stats["batches"] += 1
+        self.stats["images"] += len(images)
+        self.stats["largest_batch"] = max(self.stats["largest_batch"], len(images))
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    def _forward(self, images):
+        """Une seule passe YOLOv5 sur tout le lot, découpée ensuite par image."""
+        results = self.model(images)
+        return [DetectionResult.from_tensor(pred, results.names) for pred in results.xyxy]
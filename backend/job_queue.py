@@ -0,0 +1,203 @@
+"""
+File de travaux persistante, exécutée en arrière-plan dans le processus du serveur.
+
+/dessins/upload/ faisait une passe YOLOv5 avant de répondre : l'enfant attendait
+la détection juste pour enregistrer son dessin. Désormais l'endpoint enregistre le
+dessin et une ligne AnalysisJob dans la même transaction, puis répond ; les
+workers de la file prennent les travaux en attente et écrivent le résultat.
+
+- persistance : la table analysis_jobs survit aux redémarrages ; les travaux
+  restés « running » après un arrêt brutal sont remis en attente au démarrage ;
+- prise atomique : UPDATE ... WHERE status = 'pending' (un seul worker gagne) ;
+- reprises : en cas d'erreur, nouvel essai après retry_delay * 2^(essais - 1)
+  secondes, puis statut « failed » après max_attempts essais ;
+- réveil immédiat à chaque enqueue, scrutation de la table toutes les
+  poll_interval secondes pour les reprises programmées.
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update
+
+import database_models as db_models
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class RetryLater(Exception):
+    """Le travail ne peut pas encore être fait (ex: modèle pas encore chargé) ; reporté sans compter d'essai."""
+
+
+class JobQueue:
+    """Workers asyncio qui exécutent les travaux de la table analysis_jobs."""
+
+    def __init__(self, session_factory, handlers, workers=1, poll_interval=1.0, max_attempts=3, retry_delay=2.0):
+        """
+        :param session_factory: fabrique de sessions AsyncSession (voir database.py)
+        :param handlers: dict type de travail -> coroutine(db, target_id) qui applique le résultat dans `db`
+        """
+        self.session_factory = session_factory
+        self.handlers = handlers
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self._wakeup = None
+        self._tasks = []
+        self.stats = {"done": 0, "retried": 0, "failed": 0}
+
+    # --- Côté endpoints ---
+
+    def enqueue(self, db, kind, target_id):
+        """Ajoute un travail à la session `db` (écrit au prochain commit de l'appelant, avec ses données)."""
+        job = db_models.AnalysisJob(kind=kind, target_id=target_id, status=PENDING, attempts=0,
+                                    available_at=datetime.utcnow())
+        db.add(job)
+        return job
+
+    def notify(self):
+        """Réveille les workers après le commit d'un nouveau travail."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def latest(self, db, kind, target_id):
+        """Dernier travail d'un type pour une cible (None si aucun)."""
+        job = db_models.AnalysisJob
+        result = await db.execute(
+            select(job).where(job.kind == kind, job.target_id == target_id).order_by(job.id.desc()).limit(1)
+        )
+        return result.scalars().first()
+
+    # --- Workers ---
+
+    async def start(self):
+        """Remet en attente les travaux interrompus puis lance les workers."""
+        self._wakeup = asyncio.Event()
+        job = db_models.AnalysisJob
+        async with self.session_factory() as db:
+            result = await db.execute(update(job).where(job.status == RUNNING).values(status=PENDING))
+            await db.commit()
+        if result.rowcount:
+            print(f"🔁 File d'analyse: {result.rowcount} travail(aux) interrompu(s) remis en attente")
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """Arrête les workers ; un travail interrompu reste en base et sera repris au prochain démarrage."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _worker(self):
+        while True:
+            try:
+                job_id = await self._claim()
+            except Exception as e:
+                print(f"⚠️ File d'analyse: lecture des travaux impossible ({e})")
+                job_id = None
+            if job_id is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            try:
+                await self._run(job_id)
+            except Exception as e:
+                # Statut non écrit (ex: erreur de base en écrivant le résultat) : reprise ou échec comme une erreur du travail
+                print(f"⚠️ File d'analyse: travail {job_id} interrompu ({e})")
+                await self._fail(job_id, e)
+
+    async def _claim(self):
+        """Réserve le plus ancien travail disponible ; None s'il n'y en a pas."""
+        job = db_models.AnalysisJob
+        async with self.session_factory() as db:
+            while True:
+                job_id = (await db.execute(
+                    select(job.id)
+                    .where(job.status == PENDING, job.available_at <= datetime.utcnow())
+                    .order_by(job.available_at, job.id)
+                    .limit(1)
+                )).scalar()
+                if job_id is None:
+                    return None
+                claimed = await db.execute(
+                    update(job).where(job.id == job_id, job.status == PENDING)
+                    .values(status=RUNNING, attempts=job.attempts + 1)
+                )
+                await db.commit()
+                if claimed.rowcount == 1:
+                    return job_id
+                # Pris par un autre worker entre le SELECT et l'UPDATE : essayer le suivant
+
+    async def _run(self, job_id):
+        async with self.session_factory() as db:
+            job = await db.get(db_models.AnalysisJob, job_id)
+            handler = self.handlers.get(job.kind)
+            try:
+                if handler is None:
+                    raise ValueError(f"type de travail inconnu: {job.kind}")
+                await handler(db, job.target_id)
+                job.status = DONE
+                job.last_error = None
+            except asyncio.CancelledError:
+                await db.rollback()
+                await self._release(job_id)
+                raise
+            except RetryLater:
+                await db.rollback()
+                job = await db.get(db_models.AnalysisJob, job_id, populate_existing=True)
+                job.status = PENDING
+                job.attempts -= 1
+                job.available_at = datetime.utcnow() + timedelta(seconds=self.retry_delay)
+            except Exception as e:
+                await db.rollback()
+                job = await db.get(db_models.AnalysisJob, job_id, populate_existing=True)
+                self._record_failure(job, e)
+            await db.commit()
+            if job.status == DONE:
+                self.stats["done"] += 1
+
+    def _record_failure(self, job, error):
+        """Nouvel essai différé (2^(essais - 1) * retry_delay) ou statut « failed » après max_attempts essais."""
+        job.last_error = str(error)[:1000]
+        if job.attempts >= self.max_attempts:
+            job.status = FAILED
+            self.stats["failed"] += 1
+            print(f"❌ File d'analyse: travail {job.id} ({job.kind} {job.target_id}) abandonné: {error}")
+        else:
+            job.status = PENDING
+            job.available_at = datetime.utcnow() + timedelta(seconds=self.retry_delay * 2 ** (job.attempts - 1))
+            self.stats["retried"] += 1
+
+    async def _fail(self, job_id, error):
+        """Enregistre l'échec d'un travail dont _run n'a pas pu écrire le statut (nouvelle session)."""
+        try:
+            async with self.session_factory() as db:
+                job = await db.get(db_models.AnalysisJob, job_id)
+                if job is None or job.status != RUNNING:
+                    return
+                self._record_failure(job, error)
+                await db.commit()
+        except Exception as e:
+            print(f"⚠️ File d'analyse: statut du travail {job_id} non écrit ({e}), repris au prochain démarrage")
+
+    async def _release(self, job_id):
+        """Remet en attente un travail interrompu par l'arrêt du serveur (sans compter l'essai)."""
+        job = db_models.AnalysisJob
+        try:
+            async with self.session_factory() as db:
+                await db.execute(
+                    update(job).where(job.id == job_id, job.status == RUNNING)
+                    .values(status=PENDING, attempts=job.attempts - 1)
+                )
+                await db.commit()
+        except Exception as e:
+            print(f"⚠️ File d'analyse: travail {job_id} non libéré ({e}), repris au prochain démarrage")
+
+    def status(self):
+        return {"workers": len(self._tasks), **self.stats}
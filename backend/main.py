@@ -1,8 +1,11 @@
-from fastapi import FastAPI, File, UploadFile, Form, Request, Body, Depends, HTTPException
+from fastapi import FastAPI, File, UploadFile, Form, Request, Body, Depends, HTTPException, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
+from fastapi.concurrency import run_in_threadpool
+from starlette.websockets import WebSocketState
 import os
 import shutil
+import asyncio
 import torch
 from PIL import Image
 import io
@@ -15,15 +18,35 @@ from sklearn.cluster import KMeans
 import speech_recognition as sr
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
-from datetime import datetime
-from sqlalchemy import create_engine, Column, Integer, String, Text, ForeignKey, Boolean, Float, DateTime, func
+from datetime import datetime, timedelta
+from sqlalchemy import select, Column, Integer, String, Text, ForeignKey, Boolean, Float, DateTime, func
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship, Session
+from sqlalchemy.orm import relationship
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.sql import text
 
 # Import des modèles SQLAlchemy
 # Renommer l'import pour éviter le conflit avec le module 'models' de YOLOv5
 import database_models as db_models
+from inference_engine import InferenceEngine
+from model_registry import ModelRegistry
+from workers import WorkerPool
+from model_loader import DEFAULT_WEIGHTS, load_yolov5
+from color_analysis import dominant_colors
+from color_names import color_name, color_names, extend_palette_from_objects
+from image_decode import decode_image
+from detection_cache import DetectionCache, content_digest
+from reference_index import ReferenceIndex, ReferenceRoom
+from task_counters import ChambreNotFound, TaskCounters
+from database import create_database, upgrade_database
+import gallery
+from derivatives import DerivativeGenerator
+from file_serving import etag_matches, safe_path, serve_file
+import upload_store
+from job_queue import JobQueue, RetryLater
+from activity_ingest import ActivityIngestor, IngestQueueFull
+import activity_rollups
+from memory_decks import MemoryDecks, load_level, load_levels
 
 # Récupérer le dossier actuel et l'ajouter au PATH pour éviter les conflits d'importation
 import sys
@@ -40,6 +63,7 @@ class HandGestureRequest(BaseModel):
 class ActivityLogRequest(BaseModel):
     user_id: int
     activity_type: str
+    page: Optional[str] = None
     details: Optional[Dict[str, Any]] = None
     timestamp: Optional[datetime] = None
 
@@ -47,73 +71,176 @@ class ChatRequest(BaseModel):
     message: str
     context: Optional[str] = "enfant"
 
-# Configuration de la base de données
+# Configuration de la base de données (pilote asynchrone choisi automatiquement : aiomysql pour MySQL,
+# aiosqlite pour une base locale "sqlite:///toy_helper.db", dont les tables sont créées au démarrage)
 DATABASE_URL = "mysql+pymysql://root:@localhost/toy_helper_db"
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Pool de connexions : connexions permanentes, supplémentaires en pic, attente max (s), recyclage (s)
+DB_POOL_SIZE = 10
+DB_MAX_OVERFLOW = 20
+DB_POOL_TIMEOUT = 30
+DB_POOL_RECYCLE = 1800  # Sous le wait_timeout de MySQL : pas de connexion coupée côté serveur
+DB_POOL_PRE_PING = True
+engine, AsyncSessionLocal = create_database(
+    DATABASE_URL,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_pre_ping=DB_POOL_PRE_PING,
+)
 
 DEFAULT_USER_ID = 1 # Utilisateur par défaut pour le mode mono-utilisateur
 USE_CUSTOM_MODEL = False # Si True, utilisera le modèle personnalisé au lieu du modèle par défaut
 CUSTOM_MODEL_PATH = "models/custom_yolov5_toys.pt" # Chemin vers le modèle personnalisé
+YOLOV5_VERSION = "v7.0" # Version du code et des poids YOLOv5 dans le cache local (models/yolov5/<version>)
 # Mode test pour éviter les erreurs d'importation YOLOv5
 TEST_MODE = False  # Mettre à False pour utiliser le vrai modèle YOLOv5
-
-# Dépendance pour obtenir une session de base de données
-def get_db():
-    db = SessionLocal()
-    try:
+# Micro-batching de l'inférence : taille maximale d'un lot et fenêtre d'attente (ms)
+INFERENCE_MAX_BATCH_SIZE = 8
+INFERENCE_MAX_WAIT_MS = 10
+# Threads dédiés : passes YOLOv5 d'un côté, post-traitement d'image de l'autre
+INFERENCE_WORKERS = 1
+POSTPROCESS_WORKERS = 2
+# Moteur d'inférence CPU : "pytorch", "torchscript" ou "onnx" (exports générés par export_models.py,
+# retour automatique à PyTorch si l'export est absent ou plus ancien que le .pt)
+INFERENCE_BACKEND = "pytorch"
+# Modèles servis en INT8 (export ONNX quantifié généré par quantize_model.py), ex: {"custom"}
+QUANTIZED_MODELS = set()
+# Plus grand côté (px) des images décodées : YOLOv5 travaille en 640, inutile de décoder 12 MP
+MAX_IMAGE_SIDE = 1280
+# Cache des détections : nombre de résultats en mémoire, dossier du niveau disque (None = désactivé)
+DETECTION_CACHE_SIZE = 256
+DETECTION_CACHE_DIR = None  # ex: "cache/detections" pour garder les résultats entre redémarrages
+# File d'analyse des dessins en arrière-plan : workers, essais avant abandon, délai avant nouvel essai (s)
+ANALYSIS_WORKERS = 1
+ANALYSIS_MAX_ATTEMPTS = 3
+ANALYSIS_RETRY_SECONDS = 2.0
+# Journal d'activité : événements insérés par lots (taille max d'un lot, intervalle d'écriture en s),
+# nombre max d'événements en attente et attente max (s) d'un appelant quand le tampon est plein
+ACTIVITY_BATCH_SIZE = 500
+ACTIVITY_FLUSH_SECONDS = 1.0
+ACTIVITY_MAX_PENDING = 10000
+ACTIVITY_ENQUEUE_TIMEOUT = 0.5
+# Tableaux de bord parents : période max (jours) d'une série d'agrégats, selon la granularité
+ACTIVITY_MAX_RANGE_DAYS = {"hour": 31, "day": 366}
+# Taille maximale d'un fichier uploadé (dessin, photo de chambre)
+MAX_UPLOAD_BYTES = 20 * 1024 * 1024
+# Taille maximale d'une image reçue par le mode caméra en direct (/ws/describe_object)
+LIVE_MAX_FRAME_BYTES = 4 * 1024 * 1024
+# Compteurs de tâches : clics cumulés en mémoire puis écrits toutes les N secondes (False = écriture immédiate)
+TASK_COUNTER_COALESCE = True
+TASK_COUNTER_FLUSH_SECONDS = 2.0
+# Miniatures WebP générées en arrière-plan après chaque upload (plus grand côté en px)
+DERIVATIVE_SIZES = (128, 512)
+# Durée de cache navigateur (s) des fichiers d'uploads non adressés par leur contenu (revalidés ensuite par ETag)
+UPLOADS_MAX_AGE = 3600
+# Niveaux du jeu de memory gardés en mémoire (s) avant relecture, et paquets mélangés préparés par niveau
+MEMORY_LEVEL_TTL = 300
+MEMORY_DECK_POOL_SIZE = 32
+# Threads intra-op du moteur d'inférence (les cœurs restants vont au post-traitement)
+INFERENCE_THREADS = max(1, (os.cpu_count() or 1) - POSTPROCESS_WORKERS)
+
+# Dépendance pour obtenir une session de base de données (asynchrone, rendue au pool en fin de requête)
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 app = FastAPI()
 
+# Pools de workers : le travail lourd ne bloque jamais la boucle asyncio
+inference_pool = WorkerPool("inference", max_workers=INFERENCE_WORKERS)
+postprocess_pool = WorkerPool("postprocess", max_workers=POSTPROCESS_WORKERS)
+detection_cache = DetectionCache(DETECTION_CACHE_SIZE, DETECTION_CACHE_DIR)
+derivatives = DerivativeGenerator(postprocess_pool, DERIVATIVE_SIZES)
+
+def create_inference_engine(model):
+    """Moteur d'inférence (micro-batching) propre à chaque modèle chargé."""
+    return InferenceEngine(
+        model,
+        max_batch_size=INFERENCE_MAX_BATCH_SIZE,
+        max_wait_ms=INFERENCE_MAX_WAIT_MS,
+        executor=inference_pool.executor
+    )
+
+def load_weights(name, weights):
+    backend = "onnx-int8" if name in QUANTIZED_MODELS else INFERENCE_BACKEND
+    return load_yolov5(MODELS_DIR, YOLOV5_VERSION, weights, backend=backend, threads=INFERENCE_THREADS)
+
 # --- Model Loading ---
-# Load YOLOv5 model - this might take a moment on first run as it downloads weights
-    # Fonction améliorée pour charger le modèle (par défaut ou personnalisé)
+# Les modèles sont chargés une seule fois par processus, au démarrage, depuis le cache local
+# MODELS_DIR/yolov5/<YOLOV5_VERSION> (voir model_loader.py) : aucun accès réseau au lancement.
+# Le registre garde le modèle par défaut ET le modèle personnalisé chargés et préchauffés :
+# /switch_model ne fait que changer le modèle actif, et chaque endpoint peut en épingler un (?model=custom).
+# La reconnaissance de lettres (placeholder) utilise le modèle actif et filtre les objets ressemblant à des mains.
+model_registry = ModelRegistry(load_weights, create_inference_engine)
+
+# État de préparation du modèle, exposé par /health
+model_status = {"ready": False, "error": None}
+
 def load_model():
-    global object_model
-    try:
-        if USE_CUSTOM_MODEL and os.path.exists(CUSTOM_MODEL_PATH):
-            print(f"Chargement du modèle personnalisé depuis {CUSTOM_MODEL_PATH}")
-            object_model = torch.hub.load('ultralytics/yolov5', 'custom', path=CUSTOM_MODEL_PATH)
-            print(f"Modèle personnalisé chargé avec succès. Classes disponibles: {object_model.names}")
-        else:
-            print("Chargement du modèle YOLOv5s par défaut")
-            object_model = torch.hub.load('ultralytics/yolov5', 'yolov5s', pretrained=True)
-            print(f"Modèle par défaut chargé. Classes disponibles: {object_model.names}")
-        
-        # Configurer le modèle pour une meilleure détection
-        object_model.conf = 0.4  # Seuil de confiance (40%)
-        object_model.iou = 0.45  # Seuil IoU pour NMS
-        print("Modèle configuré pour la détection d'objets")
-        
-    except Exception as e:
-        print(f"Erreur lors du chargement du modèle: {e}")
-        print("Tentative de chargement du modèle par défaut comme solution de repli")
+    """Charge les modèles par défaut et personnalisé (si présent) dans le registre, une seule fois par processus."""
+    if model_status["ready"]:
+        return model_registry.get()
+
+    candidates = [("default", DEFAULT_WEIGHTS)]
+    if os.path.exists(CUSTOM_MODEL_PATH):
+        candidates.append(("custom", CUSTOM_MODEL_PATH))
+
+    errors = []
+    for name, weights in candidates:
+        print(f"Chargement du modèle '{name}' ({weights}, YOLOv5 {YOLOV5_VERSION}, moteur {INFERENCE_BACKEND})")
         try:
-            object_model = torch.hub.load('ultralytics/yolov5', 'yolov5s', pretrained=True)
-            object_model.conf = 0.4
-            object_model.iou = 0.45
-            print("Modèle de repli chargé avec succès")
-        except Exception as e2:
-            print(f"Impossible de charger le modèle de repli: {e2}")
-            object_model = None
-
-# Chargement initial du modèle
-try:
-    # Charger le modèle de détection d'objets approprié
-    load_model()
-    
-    # Custom model for letter recognition (placeholder - would be trained separately)
-    # For now, we'll use the same model and filter by hand-like objects
-    letter_model = object_model
-    
-    print("YOLOv5 models loaded successfully.")
-except Exception as e:
-    print(f"Error loading YOLOv5 models: {e}")
-    object_model = None
-    letter_model = None
+            entry = model_registry.load(name, weights)
+        except Exception as e:
+            print(f"Erreur lors du chargement du modèle '{name}': {e}")
+            errors.append(str(e))
+            continue
+        model_registry.install(entry)
+        print(f"Modèle '{name}' chargé en {entry.load_time:.2f}s, préchauffé en {entry.warm_time:.3f}s. Classes disponibles: {entry.model.names}")
+
+    if USE_CUSTOM_MODEL and "custom" in model_registry:
+        model_registry.activate("custom")
+    elif "default" in model_registry:
+        model_registry.activate("default")
+
+    model_status.update(ready=model_registry.ready, error=" | ".join(errors) or None)
+    return model_registry.get() if model_registry.ready else None
+
+def require_model(name=None):
+    """
+    Renvoie l'entrée du modèle demandé (ou du modèle actif).
+    Refuse immédiatement la requête si le modèle n'est pas prêt (503) ou inconnu (404).
+    """
+    if not model_status["ready"]:
+        raise HTTPException(
+            status_code=503,
+            detail=f"Le modèle n'est pas prêt: {model_status['error'] or 'chargement en cours'}"
+        )
+    try:
+        return model_registry.get(name)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Modèle '{name}' non chargé")
+
+def prepare_image(image_bytes):
+    """Décodage à taille de travail bornée + empreinte du contenu (à lancer dans le pool de post-traitement)."""
+    return decode_image(image_bytes, MAX_IMAGE_SIDE), content_digest(image_bytes)
+
+def prepare_file_image(file_path, digest=None):
+    """Comme prepare_image, pour une image déjà enregistrée (décodée depuis le disque ; empreinte calculée si inconnue)."""
+    if digest is None:
+        with open(file_path, "rb") as f:
+            digest = content_digest(f.read())
+    return decode_image(file_path, MAX_IMAGE_SIDE), digest
+
+async def detect_image(entry, img, digest):
+    """Détection YOLOv5 en passant par le cache (clé : contenu de l'image + poids du modèle + seuils)."""
+    key = DetectionCache.key(digest, entry.fingerprint, entry.model.conf, entry.model.iou, MAX_IMAGE_SIDE)
+    detections = await run_in_threadpool(detection_cache.get, key)
+    if detections is None:
+        detections = await entry.engine.detect(img)
+        await run_in_threadpool(detection_cache.put, key, detections)
+    return detections
+
 # Initialize speech recognizer
 try:
     recognizer = sr.Recognizer()
@@ -146,6 +273,11 @@ if not os.path.exists(DRAWINGS_DIR):
 ROOMS_DIR = os.path.join(UPLOADS_DIR, "rooms")
 if not os.path.exists(ROOMS_DIR):
     os.makedirs(ROOMS_DIR)
+
+# Répertoire des images des cartes du jeu de memory
+MEMORY_DIR = os.path.join(UPLOADS_DIR, "memory")
+if not os.path.exists(MEMORY_DIR):
+    os.makedirs(MEMORY_DIR)
 # Répertoire pour stocker les modèles personnalisés
 MODELS_DIR = "models"
 if not os.path.exists(MODELS_DIR):
@@ -159,55 +291,75 @@ app.add_middleware(
     allow_headers=["*"],  # Allows all headers
 )
 
+@app.get("/health")
+async def health():
+    """État de préparation du serveur (modèles chargés, durées de chargement, erreur éventuelle)."""
+    return {
+        "status": "ok" if model_status["ready"] or TEST_MODE else "degraded",
+        "model": {**model_status, **model_registry.status()},
+        "detection_cache": detection_cache.status(),
+        "derivatives": derivatives.status(),
+        "analysis_queue": analysis_queue.status(),
+        "activity_log": activity_ingestor.status(),
+        "memory": memory_decks.status(),
+        "test_mode": TEST_MODE
+    }
+
 @app.get("/available_classes")
-async def get_available_classes():
-    """Retourne la liste des classes que le modèle actuel peut détecter."""
-    if not object_model:
-        raise HTTPException(status_code=500, detail="Le modèle n'est pas chargé.")
+async def get_available_classes(model: Optional[str] = None):
+    """Retourne la liste des classes que le modèle actuel (ou le modèle demandé) peut détecter."""
+    entry = require_model(model)
     
     return {
-        "classes": object_model.names,
-        "custom_model": USE_CUSTOM_MODEL,
-        "model_path": CUSTOM_MODEL_PATH if USE_CUSTOM_MODEL else "yolov5s (default)",
-        "total_classes": len(object_model.names)
+        "classes": entry.model.names,
+        "custom_model": entry.name == "custom",
+        "model_path": entry.weights_path,
+        "total_classes": len(entry.model.names)
     }
 
 @app.post("/switch_model")
 async def switch_detection_model(use_custom: bool = Body(...)):
-    """Permet de basculer entre le modèle par défaut et le modèle personnalisé."""
-    global USE_CUSTOM_MODEL, object_model, letter_model
+    """
+    Permet de basculer entre le modèle par défaut et le modèle personnalisé.
+    Les deux modèles sont déjà chargés et préchauffés : la bascule est instantanée et
+    les requêtes en cours terminent sur le modèle qu'elles utilisaient.
+    """
+    global USE_CUSTOM_MODEL
     
-    if use_custom == USE_CUSTOM_MODEL:
+    name = "custom" if use_custom else "default"
+    if model_registry.active_name == name:
         return {"message": f"Le modèle {'personnalisé' if use_custom else 'par défaut'} est déjà actif."}
     
+    if name not in model_registry:
+        if not use_custom:
+            require_model("default")
+        if not os.path.exists(CUSTOM_MODEL_PATH):
+            raise HTTPException(
+                status_code=400, 
+                detail=f"Modèle personnalisé non trouvé à l'emplacement {CUSTOM_MODEL_PATH}"
+            )
+        # Premier usage du modèle personnalisé : chargement hors boucle asyncio
+        try:
+            model_registry.install(await run_in_threadpool(model_registry.load, name, CUSTOM_MODEL_PATH))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Erreur lors du changement de modèle: {str(e)}")
+    
+    entry = model_registry.activate(name)
     USE_CUSTOM_MODEL = use_custom
+    # Cache de détections conservé : sa clé contient l'empreinte des poids de chaque modèle
     
-    # Recharger le modèle
-    try:
-        if USE_CUSTOM_MODEL:
-            if not os.path.exists(CUSTOM_MODEL_PATH):
-                raise HTTPException(
-                    status_code=400, 
-                    detail=f"Modèle personnalisé non trouvé à l'emplacement {CUSTOM_MODEL_PATH}"
-                )
-            object_model = torch.hub.load('ultralytics/yolov5', 'custom', path=CUSTOM_MODEL_PATH)
-        else:
-            object_model = torch.hub.load('ultralytics/yolov5', 'yolov5s', pretrained=True)
-        
-        # Mettre à jour le modèle de lettres également
-        letter_model = object_model
-        
-        return {
-            "message": f"Modèle basculé vers {'personnalisé' if USE_CUSTOM_MODEL else 'par défaut'}",
-            "classes": object_model.names,
-            "total_classes": len(object_model.names)
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erreur lors du changement de modèle: {str(e)}")
+    return {
+        "message": f"Modèle basculé vers {'personnalisé' if USE_CUSTOM_MODEL else 'par défaut'}",
+        "classes": entry.model.names,
+        "total_classes": len(entry.model.names)
+    }
 
 @app.post("/upload_custom_model")
 async def upload_custom_model(file: UploadFile = File(...)):
-    """Permet de télécharger un modèle personnalisé"""
+    """
+    Permet de télécharger un modèle personnalisé.
+    Le nouveau modèle est chargé et préchauffé en arrière-plan puis remplace l'ancien d'un coup.
+    """
     global CUSTOM_MODEL_PATH
     
     if not file.filename.endswith('.pt'):
@@ -220,39 +372,34 @@ async def upload_custom_model(file: UploadFile = File(...)):
     
     CUSTOM_MODEL_PATH = file_path
     
+    try:
+        entry = await run_in_threadpool(model_registry.load, "custom", file_path)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Le modèle personnalisé ne peut pas être chargé: {str(e)}")
+    # Nouveaux poids = nouvelle empreinte : les détections en cache de l'ancien modèle ne sont plus jamais lues
+    previous = model_registry.install(entry)
+    if previous:
+        # L'ancien modèle termine les requêtes déjà en file avant d'être libéré
+        asyncio.create_task(previous.engine.drain())
+    
     return {
         "message": "Modèle personnalisé téléchargé avec succès",
         "path": file_path,
+        "classes": entry.model.names,
+        "active": model_registry.active_name == "custom",
         "note": "Utilisez l'endpoint /switch_model avec {\"use_custom\": true} pour activer ce modèle"
     }
 
 def get_dominant_color(image_crop, k=3):
     """
-    Finds the dominant color in an image crop using K-Means clustering.
+    Finds the dominant color in an image crop (histogramme quantifié + k-means pondéré, voir color_analysis).
     :param image_crop: A PIL Image object of the cropped item.
     :param k: The number of clusters to form.
     :return: A tuple (R, G, B) of the dominant color.
     """
     try:
-        # Convert PIL image to a NumPy array that OpenCV can use
-        # Ensure it's in RGB format
-        open_cv_image = np.array(image_crop.convert('RGB')) 
-        # Convert RGB to BGR for OpenCV processing if needed, but for color analysis RGB is fine
-        # open_cv_image = open_cv_image[:, :, ::-1].copy()
-
-        # Reshape the image to be a list of pixels
-        pixels = open_cv_image.reshape((-1, 3))
-        pixels = np.float32(pixels)
-
-        # Apply K-Means
-        criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 100, 0.2)
-        _, labels, centers = cv2.kmeans(pixels, k, None, criteria, 10, cv2.KMEANS_RANDOM_CENTERS)
-
-        # `centers` are the dominant colors. Find the most frequent one.
-        _, counts = np.unique(labels, return_counts=True)
-        dominant_color = centers[np.argmax(counts)]
-
-        return tuple(int(c) for c in dominant_color)
+        width, height = image_crop.size
+        return dominant_colors(image_crop, [(0, 0, width, height)], k=k)[0]
     except Exception as e:
         print(f"Color detection error: {e}")
         return (0, 0, 0) # Return black in case of an error
@@ -274,58 +421,17 @@ def get_object_size(box, image_width, image_height):
         return "petit"
 
 def get_color_name(rgb_color):
-    """Convertit une valeur RGB en un nom de couleur en français, avec nuances."""
-    r, g, b = rgb_color
-    
-    # Définition des couleurs de base et leurs nuances (format RGB)
-    colors = {
-        # Couleurs de base
-        "rouge": (255, 0, 0),
-        "vert": (0, 255, 0),
-        "bleu": (0, 0, 255),
-        "jaune": (255, 255, 0),
-        "cyan": (0, 255, 255),
-        "magenta": (255, 0, 255),
-        "blanc": (255, 255, 255),
-        "noir": (0, 0, 0),
-        "gris": (128, 128, 128),
-        
-        # Nuances
-        "rouge foncé": (139, 0, 0),
-        "rouge clair": (255, 102, 102),
-        "vert foncé": (0, 100, 0),
-        "vert clair": (144, 238, 144),
-        "bleu foncé": (0, 0, 139),
-        "bleu clair": (135, 206, 235),
-        "jaune clair": (255, 255, 224),
-        "orange": (255, 165, 0),
-        "orange foncé": (255, 140, 0),
-        "rose": (255, 192, 203),
-        "rose foncé": (255, 20, 147),
-        "violet": (138, 43, 226),
-        "violet clair": (216, 191, 216),
-        "marron": (139, 69, 19),
-        "marron clair": (160, 82, 45),
-        "beige": (245, 245, 220),
-        "turquoise": (64, 224, 208),
-        "or": (255, 215, 0),
-        "argent": (192, 192, 192)
-    }
-    
-    # Trouver la couleur la plus proche
-    min_distance = float('inf')
-    closest_color = "inconnu"
-    
-    for name, color in colors.items():
-        # Distance euclidienne pondérée dans l'espace RGB 
-        # La perception humaine est plus sensible au vert, moins au bleu
-        distance = (0.3 * (r - color[0])**2) + (0.59 * (g - color[1])**2) + (0.11 * (b - color[2])**2)
-        
-        if distance < min_distance:
-            min_distance = distance
-            closest_color = name
-    
-    return closest_color
+    """Convertit une valeur RGB en un nom de couleur en français, avec nuances (table précalculée, voir color_names)."""
+    return color_name(rgb_color)
+
+async def load_color_palette():
+    """Étend la palette de couleurs avec les valeurs de Objects.default_colors (appelé une fois au démarrage)."""
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(db_models.Objects.default_colors).where(db_models.Objects.default_colors.isnot(None))
+        )
+        values = result.scalars().all()
+    return extend_palette_from_objects(values)
 
 def get_object_size(box, image_width, image_height):
     """Estime la taille d'un objet en fonction de sa boîte englobante et des dimensions de l'image."""
@@ -367,62 +473,78 @@ def get_position_description(box, img_width, img_height):
     
     return f"{v_pos} {h_pos}"
 
+def extract_object_colors(img, boxes):
+    """
+    Calcule la couleur dominante (RGB, nom) de chaque boîte détectée, toutes les découpes
+    en un seul appel vectorisé. Fonction synchrone destinée au pool de post-traitement.
+    """
+    try:
+        rgb_colors = dominant_colors(img, boxes)
+    except Exception as e:
+        print(f"Color extraction error: {e}")
+        return [([128, 128, 128], "coloré") for _ in boxes]
+    return list(zip(rgb_colors, color_names(rgb_colors)))
+
 @app.get("/")
 async def read_root():
     return {"message": "Bonjour! Welcome to the Toy Helper Backend!"}
 
+async def load_reference_room(user_id):
+    """Lecture en base et préparation de la chambre de référence d'un utilisateur."""
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(select(db_models.Chambre).where(db_models.Chambre.user_id == user_id))
+        chambre = result.scalars().first()
+    # Lecture éventuelle de l'en-tête de l'image (anciennes références) hors de la boucle asyncio
+    return await run_in_threadpool(ReferenceRoom.from_chambre, chambre, get_position_description)
+
+# Chambres de référence préparées, par utilisateur : reconstruites uniquement par /chambre/upload_reference/
+reference_index = ReferenceIndex(load_reference_room)
+
+# Compteurs de tâches complétées : incréments atomiques en SQL, cumulés en mémoire entre deux écritures
+task_counters = TaskCounters(AsyncSessionLocal, flush_interval=TASK_COUNTER_FLUSH_SECONDS, coalesce=TASK_COUNTER_COALESCE)
+
 @app.post("/detect_objects/")
-async def detect_objects_endpoint(file: UploadFile = File(...), db: Session = Depends(get_db)):
+async def detect_objects_endpoint(file: UploadFile = File(...), model: Optional[str] = None):
     print(f"\n--- Received new detection request for default user_id: {DEFAULT_USER_ID} ---")
-    if not object_model:
-        raise HTTPException(status_code=500, detail="Model is not loaded. Please check server logs.")
+    entry = require_model(model)
 
-    # 1. Récupérer la chambre de référence pour l'utilisateur par défaut
-    chambre_ref = db.query(db_models.Chambre).filter(db_models.Chambre.user_id == DEFAULT_USER_ID).first()
-    if not chambre_ref or not chambre_ref.objets_reference:
+    # 1. Récupérer la chambre de référence préparée (index en mémoire, base lue au premier accès seulement)
+    room = await reference_index.get(DEFAULT_USER_ID)
+    if room is None:
         return {
             "message": "Demande à maman de prendre une photo de ta chambre bien rangée d'abord!",
             "tasks": []
         }
     
-    reference_objects_data = json.loads(chambre_ref.objets_reference)
     # Obtenir l'image de référence pour l'affichage côté client
-    reference_image_path = chambre_ref.image_path
-    reference_image_filename = os.path.basename(reference_image_path)
-    
-    # Convertir les boîtes de référence en un format plus facile à utiliser
-    reference_objects_map = {}
-    for i, ref_obj in enumerate(reference_objects_data):
-        if ref_obj['name'] not in reference_objects_map:
-            reference_objects_map[ref_obj['name']] = []
-        reference_objects_map[ref_obj['name']].append({
-            'box': ref_obj['box'],
-            'position': get_position_description(ref_obj['box'], 1.0, 1.0)  # Normalisation approximative
-        })
+    reference_image_filename = os.path.basename(room.image_path)
 
     # 2. Lire l'image uploadée (la chambre en désordre)
     image_bytes = await file.read()
 
     try:
-        # 3. Effectuer l'inférence sur la nouvelle image
-        img = Image.open(io.BytesIO(image_bytes))
-        img_width, img_height = img.size
-        results = object_model(img)
-        detections = results.pandas().xyxy[0]
+        # 3. Effectuer l'inférence sur la nouvelle image (décodée à taille réduite)
+        decoded, digest = await postprocess_pool.run(prepare_image, image_bytes)
+        img = decoded.image
+        img_width, img_height = decoded.original_size
+        # Trier par confiance une seule fois : les tâches sont créées dans cet ordre
+        detections = (await detect_image(entry, img, digest)).sorted_by_score()
         print(f"YOLOv5 found {len(detections)} potential objects in the messy room.")
 
         # 4. Traiter les détections pour créer des tâches de rangement
         tasks = []
-        unmatched_reference_indices = {name: list(range(len(boxes))) for name, boxes in reference_objects_map.items()}
+        working_boxes = detections.int_boxes()
+        # Boîtes rendues dans les coordonnées de l'image d'origine
+        detections = decoded.to_original(detections)
 
-        for index, row in detections.iterrows():
-            object_name = row['name']
-            box = [int(b) for b in [row['xmin'], row['ymin'], row['xmax'], row['ymax']]]
-            
-            # Extraire la couleur dominante
-            cropped_img = img.crop(box)
-            dominant_color_rgb = get_dominant_color(cropped_img)
-            color_name = get_color_name(dominant_color_rgb)
+        # Appariement optimal détection -> place de référence (par classe, selon la géométrie)
+        targets = room.match(detections.labels, detections.boxes, (img_width, img_height))
+
+        # Extraire les couleurs dominantes de tous les objets dans le pool de post-traitement
+        # (sur l'image de travail, donc avec les boîtes à son échelle)
+        colors = await postprocess_pool.run(extract_object_colors, img, working_boxes)
+
+        for (object_name, confidence, box), (dominant_color_rgb, color_name), ref_idx in zip(detections, colors, targets):
             
             # Estimer la taille
             size_name = get_object_size(box, img_width, img_height)
@@ -445,12 +567,9 @@ async def detect_objects_endpoint(file: UploadFile = File(...), db: Session = De
             target_box = None
             target_position = ""
             
-            # Essayer de faire correspondre cet objet à un objet de référence du même type
-            if object_name in reference_objects_map and unmatched_reference_indices[object_name]:
-                ref_idx_to_use = unmatched_reference_indices[object_name].pop(0)  # Prendre le premier non-matché
-                target_ref = reference_objects_map[object_name][ref_idx_to_use]
-                target_box = target_ref['box']
-                target_position = target_ref['position']
+            # Place de référence attribuée à cet objet par l'appariement
+            if ref_idx >= 0:
+                target_box, target_position = room.target(ref_idx, (img_width, img_height), get_position_description)
 
             if target_box:
                 # Formulation plus naturelle pour l'assistant vocal
@@ -501,14 +620,10 @@ async def detect_objects_endpoint(file: UploadFile = File(...), db: Session = De
                 "reference_image": reference_image_filename
             }
 
-        # Choisir l'objet le plus confiant pour mettre en premier
-        if tasks:
-            tasks.sort(key=lambda x: detections[detections['name'] == x['detected_object_name']]['confidence'].iloc[0], reverse=True)
-
         final_message = f"J'ai trouvé {len(tasks)} objets à ranger!" if tasks else "On dirait que tout est en ordre!"
         
         # Récupérer le nombre de tâches complétées précédemment
-        completed_tasks = chambre_ref.completed_tasks or 0
+        completed_tasks = await task_counters.value(DEFAULT_USER_ID)
         
         # Générer un message de progression
         progress_message = get_progress_feedback(completed_tasks, len(tasks))
@@ -528,52 +643,40 @@ async def detect_objects_endpoint(file: UploadFile = File(...), db: Session = De
         raise HTTPException(status_code=500, detail=f"An error occurred during detection: {str(e)}")
 
 @app.post("/simple_detect_objects/")
-async def simple_detect_objects(file: UploadFile = File(...)):
+async def simple_detect_objects(file: UploadFile = File(...), model: Optional[str] = None):
     """
     Détection simple d'objets pour l'assistant enfant
     Retourne juste la liste des objets détectés avec nom, couleur et taille
     Pas besoin d'image de référence ni de base de données
     """
     try:
-        if not object_model:
-            raise HTTPException(status_code=500, detail="Model is not loaded. Please check server logs.")
+        entry = require_model(model)
         
-        # Lire l'image
+        # Lire et décoder l'image (taille de travail bornée)
         image_bytes = await file.read()
-        img = Image.open(io.BytesIO(image_bytes))
-        img_width, img_height = img.size
+        decoded, digest = await postprocess_pool.run(prepare_image, image_bytes)
+        img = decoded.image
+        img_width, img_height = decoded.original_size
         
-        print(f"📸 Processing image of size {img_width}x{img_height}")
+        print(f"📸 Processing image of size {img_width}x{img_height} (travail en {img.width}x{img.height})")
         
         # Détecter les objets avec YOLOv5
-        results = object_model(img)
-        detections = results.pandas().xyxy[0]
+        detections = await detect_image(entry, img, digest)
         
         print(f"🔍 YOLOv5 found {len(detections)} objects")
         
+        # Filtrer les détections de faible confiance
+        detections = detections.above(0.3)
+        boxes = detections.int_boxes()
+        
+        # Extraire les couleurs dominantes dans le pool de post-traitement
+        colors = await postprocess_pool.run(extract_object_colors, img, boxes)
+        
         detected_objects = []
         
-        for index, row in detections.iterrows():
-            # Extraire les informations de base
-            object_name = row['name']
-            confidence = float(row['confidence'])
-            box = [int(row['xmin']), int(row['ymin']), int(row['xmax']), int(row['ymax'])]
-            
-            # Filtrer les détections de faible confiance
-            if confidence < 0.3:
-                continue
-                
+        for (object_name, confidence, box), (dominant_color_rgb, color_name) in zip(decoded.to_original(detections), colors):
             print(f"  - {object_name} (conf: {confidence:.2f})")
             
-            # Extraire la couleur dominante de l'objet détecté
-            try:
-                cropped_img = img.crop(box)
-                dominant_color_rgb = get_dominant_color(cropped_img)
-                color_name = get_color_name(dominant_color_rgb)
-            except:
-                color_name = "coloré"
-                dominant_color_rgb = [128, 128, 128]
-            
             # Estimer la taille relative de l'objet
             size_name = get_object_size(box, img_width, img_height)
             
@@ -752,24 +855,21 @@ def process_speech_for_letter_learning(text):
 
 @app.post("/recognize_hand_gesture/")
 async def recognize_hand_gesture(request: HandGestureRequest):
-    if not letter_model:
+    if not model_registry.ready:
         return JSONResponse(status_code=500, content={"error": "Letter recognition model not initialized"})
     
     try:
         # Decode the base64 image
         image_data = base64.b64decode(request.image.split(',')[1] if ',' in request.image else request.image)
-        image = Image.open(io.BytesIO(image_data))
-        
-        # Use YOLOv5 to detect hands and gestures
-        results = letter_model(image)
+        decoded, digest = await postprocess_pool.run(prepare_image, image_data)
         
-        # Convert results to a readable format
-        detections = results.pandas().xyxy[0]
+        # Use YOLOv5 to detect hands and gestures (modèle actif du registre)
+        detections = await detect_image(model_registry.get(), decoded.image, digest)
         
         print(f"Gesture recognition found {len(detections)} potential objects")
         
         # Look for hand or person in detections
-        hands = detections[detections['name'].isin(['person', 'hand'])]
+        hands = detections.with_names(['person', 'hand'])
         
         # If no hands detected, return early
         if len(hands) == 0:
@@ -805,121 +905,240 @@ async def recognize_hand_gesture(request: HandGestureRequest):
         print(f"Hand gesture recognition error: {e}")
         return {"error": str(e)}
 
+# Journal d'activité : événements mis en tampon puis insérés par lots (voir activity_ingest.py)
+activity_ingestor = ActivityIngestor(
+    AsyncSessionLocal,
+    batch_size=ACTIVITY_BATCH_SIZE,
+    flush_interval=ACTIVITY_FLUSH_SECONDS,
+    max_pending=ACTIVITY_MAX_PENDING,
+    enqueue_timeout=ACTIVITY_ENQUEUE_TIMEOUT,
+    # Agrégats par heure/jour et par page mis à jour dans la transaction de chaque lot
+    on_batch=activity_rollups.apply_rollups
+)
+
 @app.post("/log-activity/")
 async def log_activity(activity: ActivityLogRequest):
+    """Enregistre un événement d'activité (écrit en base avec le prochain lot, en général sous une seconde)."""
     try:
-        # Log the activity
-        print(f"Logging activity: {activity}")
-        
-        # Save the activity to a file or database
-        # For this example, we'll just print it
-        print(f"Activity logged: {activity}")
-        
+        await activity_ingestor.submit({
+            "user_id": activity.user_id,
+            "action": activity.activity_type,
+            "page": activity.page or "inconnue",
+            # Horodatage de réception si le client n'en fournit pas (pas celui de l'écriture du lot)
+            # Date avec fuseau ramenée en UTC : l'événement tombe dans la bonne heure / le bon jour des agrégats
+            "timestamp": activity_rollups.naive_utc(activity.timestamp) or datetime.utcnow(),
+            "details": json.dumps(activity.details) if activity.details is not None else None
+        })
         return {"message": "Activité enregistrée avec succès"}
+    except IngestQueueFull:
+        return JSONResponse(
+            status_code=503,
+            content={"error": "Trop d'activités en attente d'enregistrement, réessayer plus tard"},
+            headers={"Retry-After": "1"}
+        )
     except Exception as e:
         print(f"Error logging activity: {e}")
         return {"error": str(e)}
 
+@app.get("/activite/utilisateur/{user_id}")
+async def get_activite_utilisateur(
+    user_id: int,
+    granularite: str = "day",
+    depuis: Optional[datetime] = None,
+    jusqu_a: Optional[datetime] = None,
+    page: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Série d'activité d'un enfant pour le tableau de bord parent, lue dans les agrégats
+    (granularite = "hour" ou "day" ; par défaut les 48 dernières heures ou les 7 derniers jours).
+    """
+    if granularite not in activity_rollups.GRANULARITIES:
+        return JSONResponse(status_code=400, content={"status": "error", "message": "granularite doit valoir 'hour' ou 'day'"})
+    try:
+        # Bornes avec fuseau (ex: ...T00:00:00Z) ramenées en UTC sans fuseau, comme les agrégats
+        jusqu_a = activity_rollups.naive_utc(jusqu_a) or datetime.utcnow()
+        depuis = activity_rollups.naive_utc(depuis) or jusqu_a - (timedelta(hours=48) if granularite == "hour" else timedelta(days=7))
+        if depuis >= jusqu_a or jusqu_a - depuis > timedelta(days=ACTIVITY_MAX_RANGE_DAYS[granularite]):
+            return JSONResponse(
+                status_code=400,
+                content={"status": "error", "message": f"Période invalide (maximum {ACTIVITY_MAX_RANGE_DAYS[granularite]} jours)"}
+            )
+        return {
+            "user_id": user_id,
+            "granularite": granularite,
+            "depuis": depuis,
+            "jusqu_a": jusqu_a,
+            "tranches": await activity_rollups.rollup_series(db, user_id, granularite, depuis, jusqu_a, page)
+        }
+    except Exception as e:
+        print(f"Erreur lors de la lecture de l'activité: {e}")
+        return JSONResponse(status_code=500, content={"status": "error", "message": str(e)})
+
+@app.get("/activite/utilisateur/{user_id}/resume")
+async def get_resume_activite(user_id: int, jours: int = 7, db: AsyncSession = Depends(get_db)):
+    """Totaux d'activité par page sur les derniers jours (tableau de bord parent)."""
+    jours = max(1, min(jours, ACTIVITY_MAX_RANGE_DAYS["day"]))
+    try:
+        return {"user_id": user_id, "jours": jours, **await activity_rollups.rollup_summary(db, user_id, jours)}
+    except Exception as e:
+        print(f"Erreur lors de la lecture du résumé d'activité: {e}")
+        return JSONResponse(status_code=500, content={"status": "error", "message": str(e)})
+
+async def analyse_dessin(db: AsyncSession, dessin_id: int):
+    """Travail de la file d'analyse : objet le plus probable d'un dessin, écrit dans Dessin.objet_detecte."""
+    dessin = await db.get(db_models.Dessin, dessin_id)
+    if dessin is None or TEST_MODE:
+        return  # Dessin supprimé entre-temps, ou pas de modèle en mode test
+    if not model_registry.ready:
+        if model_status["error"]:
+            raise RuntimeError(f"modèle indisponible: {model_status['error']}")
+        raise RetryLater("modèle en cours de chargement")
+
+    decoded, digest = await postprocess_pool.run(prepare_file_image, dessin.image_path, dessin.content_hash)
+    detections = await detect_image(model_registry.get(), decoded.image, digest)
+    # Si des objets sont détectés, prendre celui avec la plus haute confiance
+    if len(detections) > 0:
+        dessin.objet_detecte = detections.sorted_by_score().label(0)
+        print(f"Objet détecté dans le dessin {dessin_id} : {dessin.objet_detecte}")
+
+# File d'analyse persistante (table analysis_jobs) : la détection des dessins ne bloque plus l'upload
+analysis_queue = JobQueue(
+    AsyncSessionLocal,
+    {"dessin": analyse_dessin},
+    workers=ANALYSIS_WORKERS,
+    max_attempts=ANALYSIS_MAX_ATTEMPTS,
+    retry_delay=ANALYSIS_RETRY_SECONDS
+)
+
+async def ensure_utilisateur(db: AsyncSession, user_id: int, **champs):
+    """Crée l'utilisateur `user_id` s'il n'existe pas encore."""
+    utilisateur = await db.get(db_models.Utilisateur, user_id)
+    if not utilisateur:
+        print(f"===> Utilisateur {user_id} non trouvé! Création...")
+        utilisateur = db_models.Utilisateur(id=user_id, **champs)
+        db.add(utilisateur)
+        try:
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+        print(f"===> Utilisateur créé avec ID {user_id}")
+    return utilisateur
+
+def read_file_base64(file_path):
+    """Contenu d'un fichier encodé en base64 (FileNotFoundError si absent)."""
+    with open(file_path, "rb") as f:
+        return base64.b64encode(f.read()).decode('utf-8')
+
+async def save_dessin(db: AsyncSession, **champs):
+    """Enregistre un dessin et son travail d'analyse en base, et renvoie la ligne rafraîchie."""
+    db_dessin = db_models.Dessin(**champs)
+    db.add(db_dessin)
+    try:
+        await db.flush()  # Attribue l'id du dessin
+        analysis_queue.enqueue(db, "dessin", db_dessin.id)
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+    await db.refresh(db_dessin)
+    return db_dessin
+
 @app.post("/dessins/upload/")
 async def upload_dessin(
     file: UploadFile = File(...),
     user_id: Optional[int] = Form(None),
     description: Optional[str] = Form(None),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Endpoint pour uploader et enregistrer un dessin d'enfant"""
+    stored = None
     try:
         print(f"===> Upload dessin - user_id: {user_id}, description: {description}")
         
-        # Vérifier si l'utilisateur existe si un ID est fourni
+        # Vérifier si l'utilisateur existe si un ID est fourni (créé si nécessaire pour tester)
         if user_id:
             print(f"===> Vérification utilisateur {user_id}")
-            utilisateur = db.query(db_models.Utilisateur).filter(db_models.Utilisateur.id == user_id).first()
-            if not utilisateur:
-                print(f"===> Utilisateur {user_id} non trouvé!")
-                # Créer l'utilisateur si nécessaire pour tester
-                print(f"===> Création d'un utilisateur de test avec ID {user_id}")
-                nouveau_utilisateur = db_models.Utilisateur(id=user_id, nom="Test", prenom="User", email=f"test{user_id}@example.com", mot_de_passe="password")
-                db.add(nouveau_utilisateur)
-                db.commit()
-                print(f"===> Utilisateur créé avec ID {user_id}")
-        
-        # Générer un nom de fichier unique pour éviter les écrasements
-        file_extension = os.path.splitext(file.filename)[1]
-        timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-        new_filename = f"dessin_{timestamp}{file_extension}" if user_id is None else f"dessin_user{user_id}_{timestamp}{file_extension}"
-        
-        # Chemin complet du fichier
-        file_path = os.path.join(DRAWINGS_DIR, new_filename)
-        print(f"===> Chemin de sauvegarde: {file_path}")
-        
-        # Lire et enregistrer le fichier
-        content = await file.read()
-        with open(file_path, "wb") as f:
-            f.write(content)
-        print(f"===> Fichier sauvegardé sur disque: {os.path.exists(file_path)}")
+            await ensure_utilisateur(
+                db, user_id,
+                nom="Test", prenom="User", email=f"test{user_id}@example.com", mot_de_passe="password"
+            )
         
-        # Utiliser le modèle de détection d'objets si disponible
-        detected_object = None
-        try:
-            if object_model:
-                # Ouvrir l'image avec PIL
-                img = Image.open(io.BytesIO(content))
-                # Utiliser le modèle YOLOv5 pour détecter des objets
-                results = object_model(img)
-                detections = results.pandas().xyxy[0]
-                
-                # Si des objets sont détectés, prendre celui avec la plus haute confiance
-                if len(detections) > 0:
-                    # Trier par confiance (décroissant)
-                    sorted_detections = detections.sort_values('confidence', ascending=False)
-                    detected_object = sorted_detections.iloc[0]['name']
-                    print(f"Objet détecté dans le dessin : {detected_object}")
-        except Exception as e:
-            print(f"Erreur lors de la détection d'objets : {e}")
+        # Enregistrer le fichier par blocs sous son empreinte SHA-256 (un dessin identique n'est stocké qu'une fois)
+        stored = await upload_store.store_upload(file, DRAWINGS_DIR, max_bytes=MAX_UPLOAD_BYTES)
+        file_path = stored.path
+        print(f"===> Fichier sauvegardé sur disque: {file_path} ({stored.size} octets{', déjà présent' if stored.deduplicated else ''})")
+        # Miniatures pour la galerie, générées en arrière-plan
+        derivatives.schedule(file_path)
         
-        # Enregistrer les informations du dessin dans la base de données
+        # Enregistrer le dessin et son travail d'analyse dans la même transaction ;
+        # la détection d'objets est faite ensuite par la file d'analyse (objet_detecte rempli plus tard)
         print(f"===> Tentative d'enregistrement en base de données")
         try:
-            db_dessin = db_models.Dessin(
+            db_dessin = await save_dessin(
+                db,
                 user_id=user_id,
                 image_path=file_path,
                 description=description,
-                objet_detecte=detected_object
+                content_hash=stored.digest
             )
-            print(f"===> Objet dessin créé: {db_dessin}")
-            db.add(db_dessin)
-            print(f"===> Dessin ajouté à la session")
-            db.commit()
-            print(f"===> Commit réussi!")
-            db.refresh(db_dessin)
             print(f"===> Dessin enregistré avec ID: {db_dessin.id}")
+            analysis_queue.notify()
             
             return {
                 "status": "success",
                 "message": "Dessin enregistré avec succès",
                 "dessin_id": db_dessin.id,
-                "objet_detecte": detected_object,
+                "objet_detecte": None,
+                "analyse_status": "pending",
+                "analyse_url": f"/dessins/{db_dessin.id}/analyse",
                 "image_path": file_path
             }
         except Exception as e:
             print(f"===> ERREUR lors de l'enregistrement en base: {str(e)}")
-            db.rollback()
             raise e
     
+    except upload_store.UploadTooLarge:
+        return JSONResponse(
+            status_code=413,
+            content={"status": "error", "message": f"Fichier trop volumineux (maximum {MAX_UPLOAD_BYTES} octets)"}
+        )
     except Exception as e:
         print(f"Erreur lors de l'upload du dessin: {e}")
-        db.rollback()
+        await db.rollback()
         return JSONResponse(
             status_code=500,
             content={"status": "error", "message": str(e)}
         )
+    finally:
+        # Fin du traitement : le fichier enregistré n'est plus réservé par cette requête
+        await run_in_threadpool(upload_store.release, stored)
+
+@app.get("/dessins/{dessin_id}/analyse")
+async def get_dessin_analyse(dessin_id: int, db: AsyncSession = Depends(get_db)):
+    """
+    Statut de l'analyse d'un dessin, à interroger après /dessins/upload/ :
+    pending / running / done / failed, avec l'objet détecté une fois l'analyse terminée.
+    """
+    dessin = await db.get(db_models.Dessin, dessin_id)
+    if not dessin:
+        return JSONResponse(status_code=404, content={"status": "error", "message": "Dessin non trouvé"})
+    job = await analysis_queue.latest(db, "dessin", dessin_id)
+    return {
+        "dessin_id": dessin_id,
+        # Dessins enregistrés avant la file d'analyse : pas de travail, résultat déjà en base
+        "analyse_status": job.status if job else "done",
+        "attempts": job.attempts if job else 0,
+        "error": job.last_error if job and job.status == "failed" else None,
+        "objet_detecte": dessin.objet_detecte
+    }
 
 @app.get("/dessins/{dessin_id}")
-async def get_dessin(dessin_id: int, db: Session = Depends(get_db)):
+async def get_dessin(dessin_id: int, db: AsyncSession = Depends(get_db)):
     """Récupérer un dessin spécifique par son ID"""
     try:
-        dessin = db.query(db_models.Dessin).filter(db_models.Dessin.id == dessin_id).first()
+        dessin = await db.get(db_models.Dessin, dessin_id)
         if not dessin:
             return JSONResponse(
                 status_code=404,
@@ -928,8 +1147,7 @@ async def get_dessin(dessin_id: int, db: Session = Depends(get_db)):
             
         # Lire l'image et la convertir en base64
         try:
-            with open(dessin.image_path, "rb") as img_file:
-                img_data = base64.b64encode(img_file.read()).decode('utf-8')
+            img_data = await run_in_threadpool(read_file_base64, dessin.image_path)
                 
             return {
                 "id": dessin.id,
@@ -952,11 +1170,14 @@ async def get_dessin(dessin_id: int, db: Session = Depends(get_db)):
         )
 
 @app.get("/dessins/utilisateur/{user_id}")
-async def get_dessins_utilisateur(user_id: int, db: Session = Depends(get_db)):
-    """Récupérer tous les dessins d'un utilisateur (galerie personnelle)"""
+async def get_dessins_utilisateur(user_id: int, db: AsyncSession = Depends(get_db)):
+    """
+    Récupérer tous les dessins d'un utilisateur avec leurs images en base64 (galerie personnelle).
+    Réponse proportionnelle à la taille de la galerie : préférer /dessins/utilisateur/{user_id}/galerie.
+    """
     try:
         # Vérifier si l'utilisateur existe
-        utilisateur = db.query(db_models.Utilisateur).filter(db_models.Utilisateur.id == user_id).first()
+        utilisateur = await db.get(db_models.Utilisateur, user_id)
         if not utilisateur:
             return JSONResponse(
                 status_code=404,
@@ -964,14 +1185,15 @@ async def get_dessins_utilisateur(user_id: int, db: Session = Depends(get_db)):
             )
             
         # Récupérer tous les dessins de l'utilisateur
-        dessins = db.query(db_models.Dessin).filter(db_models.Dessin.user_id == user_id).order_by(db_models.Dessin.date_creation.desc()).all()
+        dessins = (await db.execute(
+            select(db_models.Dessin).where(db_models.Dessin.user_id == user_id).order_by(db_models.Dessin.date_creation.desc())
+        )).scalars().all()
         
         result = []
         for dessin in dessins:
             # Essayer de lire l'image
             try:
-                with open(dessin.image_path, "rb") as img_file:
-                    img_data = base64.b64encode(img_file.read()).decode('utf-8')
+                img_data = await run_in_threadpool(read_file_base64, dessin.image_path)
                     
                 result.append({
                     "id": dessin.id,
@@ -999,54 +1221,164 @@ async def get_dessins_utilisateur(user_id: int, db: Session = Depends(get_db)):
             content={"status": "error", "message": str(e)}
         )
 
+def upload_url(file_path):
+    """URL publique (/uploads/{dossier}/{nom}) d'un fichier enregistré dans uploads/."""
+    return "/" + os.path.relpath(file_path).replace(os.sep, "/")
+
+def miniature_urls(base_url):
+    """URL des miniatures de chaque taille, ex: {"128": "/dessins/3/miniature?taille=128", ...}."""
+    return {str(size): f"{base_url}?taille={size}" for size in derivatives.sizes}
+
+def dessin_urls(dessin_id):
+    """URL des miniatures et de l'image complète d'un dessin."""
+    return {
+        "miniature_url": f"/dessins/{dessin_id}/miniature",
+        "miniatures": miniature_urls(f"/dessins/{dessin_id}/miniature"),
+        "image_url": f"/dessins/{dessin_id}/image"
+    }
+
+async def derivative_response(request: Request, original_path, taille):
+    """Réponse fichier du dérivé le plus proche de `taille` (généré à la demande s'il manque)."""
+    path = await derivatives.get(original_path, derivatives.closest_size(taille))
+    response = await serve_file(request, path, UPLOADS_MAX_AGE, media_type="image/webp") if path else None
+    if response is None:
+        return JSONResponse(status_code=404, content={"status": "error", "message": "Miniature indisponible"})
+    return response
+
+@app.get("/dessins/utilisateur/{user_id}/galerie")
+async def get_galerie_utilisateur(
+    user_id: int,
+    limit: int = gallery.DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Galerie paginée d'un utilisateur : métadonnées + URL des images, sans contenu d'image.
+    Passer `next_cursor` de la réponse dans `cursor` pour obtenir la page suivante.
+    """
+    try:
+        if not await db.get(db_models.Utilisateur, user_id):
+            return JSONResponse(
+                status_code=404,
+                content={"status": "error", "message": "Utilisateur non trouvé"}
+            )
+
+        limit = gallery.clamp_page_size(limit)
+        rows = (await db.execute(gallery.page_query(user_id, limit, cursor))).scalars().all()
+        dessins, next_cursor = gallery.split_page(rows, limit)
+
+        return {
+            "dessins": [
+                {
+                    "id": dessin.id,
+                    "date_creation": dessin.date_creation,
+                    "description": dessin.description,
+                    "objet_detecte": dessin.objet_detecte,
+                    **dessin_urls(dessin.id)
+                }
+                for dessin in dessins
+            ],
+            "next_cursor": next_cursor
+        }
+    except gallery.InvalidCursor:
+        return JSONResponse(
+            status_code=400,
+            content={"status": "error", "message": "Curseur de pagination invalide"}
+        )
+    except Exception as e:
+        print(f"Erreur lors de la récupération de la galerie: {e}")
+        return JSONResponse(
+            status_code=500,
+            content={"status": "error", "message": str(e)}
+        )
+
+async def find_dessin_file(db: AsyncSession, dessin_id: int):
+    """Chemin du fichier d'un dessin, ou None si le dessin ou son fichier n'existe pas."""
+    dessin = await db.get(db_models.Dessin, dessin_id)
+    if not dessin or not os.path.exists(dessin.image_path):
+        return None
+    return dessin.image_path
+
+@app.get("/dessins/{dessin_id}/image")
+async def get_dessin_image(request: Request, dessin_id: int, db: AsyncSession = Depends(get_db)):
+    """Image complète d'un dessin (fichier brut, à charger à la demande)."""
+    file_path = await find_dessin_file(db, dessin_id)
+    response = await serve_file(request, file_path, UPLOADS_MAX_AGE) if file_path else None
+    if response is None:
+        return JSONResponse(status_code=404, content={"status": "error", "message": "Dessin non trouvé"})
+    return response
+
+@app.get("/dessins/{dessin_id}/miniature")
+async def get_dessin_miniature(request: Request, dessin_id: int, taille: int = DERIVATIVE_SIZES[0], db: AsyncSession = Depends(get_db)):
+    """Miniature WebP d'un dessin (taille de DERIVATIVE_SIZES la plus proche de `taille`)."""
+    file_path = await find_dessin_file(db, dessin_id)
+    if not file_path:
+        return JSONResponse(status_code=404, content={"status": "error", "message": "Dessin non trouvé"})
+    return await derivative_response(request, file_path, taille)
+
+async def save_chambre_reference(db: AsyncSession, user_id: int, image_path: str, objets_json: str, content_hash: Optional[str] = None):
+    """Crée ou met à jour la chambre de référence d'un utilisateur."""
+    result = await db.execute(select(db_models.Chambre).where(db_models.Chambre.user_id == user_id))
+    chambre = result.scalars().first()
+    if chambre:
+        print("🏠 [DB] Chambre trouvée - mise à jour...")
+        chambre.image_path = image_path
+        chambre.objets_reference = objets_json
+        chambre.content_hash = content_hash
+    else:
+        print("🏠 [DB] Création nouvelle chambre...")
+        chambre = db_models.Chambre(
+            user_id=user_id,
+            image_path=image_path,
+            objets_reference=objets_json,
+            content_hash=content_hash,
+            completed_tasks=0
+        )
+        db.add(chambre)
+    await db.commit()
+    return chambre
+
+async def content_referenced(db: AsyncSession, model, digest):
+    """Une ligne de `model` (Dessin, Chambre) pointe-t-elle vers le fichier d'empreinte `digest` ?"""
+    result = await db.execute(select(func.count(model.id)).where(model.content_hash == digest))
+    return result.scalar() > 0
+
 @app.post("/chambre/upload_reference/")
 async def upload_reference_image(
     file: UploadFile = File(...),
-    db: Session = Depends(get_db)
+    model: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
 ):
     """Endpoint pour uploader l'image de référence d'une chambre bien rangée pour l'utilisateur par défaut."""
+    stored = None
     try:
         print(f"📸 [UPLOAD] Début de l'upload - fichier: {file.filename}")
         
         # Vérifier si l'utilisateur par défaut existe, sinon le créer
+        # (commit immédiat pour que la FK de Chambre soit valide)
         print(f"👤 [DB] Recherche utilisateur {DEFAULT_USER_ID}")
-        utilisateur = db.query(db_models.Utilisateur).filter(db_models.Utilisateur.id == DEFAULT_USER_ID).first()
-        if not utilisateur:
-            print(f"👤 [DB] Utilisateur par défaut {DEFAULT_USER_ID} non trouvé. Création...")
-            utilisateur = db_models.Utilisateur(
-                id=DEFAULT_USER_ID, 
-                nom="Default User", 
-                prenom="App", 
-                email=f"default{DEFAULT_USER_ID}@example.com", 
-                mot_de_passe="default"
-            )
-            db.add(utilisateur)
-            # Commiter la création de l'utilisateur ici pour que la FK de Chambre soit valide
-            try:
-                db.commit()
-                db.refresh(utilisateur)
-                print(f"✅ [DB] Utilisateur par défaut {DEFAULT_USER_ID} créé.")
-            except Exception as e:
-                print(f"❌ [DB] Erreur création utilisateur: {e}")
-                db.rollback()
-                raise e
-        else:
-            print(f"✅ [DB] Utilisateur {DEFAULT_USER_ID} trouvé.")
+        await ensure_utilisateur(
+            db, DEFAULT_USER_ID,
+            nom="Default User", prenom="App", email=f"default{DEFAULT_USER_ID}@example.com", mot_de_passe="default"
+        )
+        print(f"✅ [DB] Utilisateur {DEFAULT_USER_ID} disponible.")
 
-        # Lire le contenu de l'image
-        print("📖 [IMAGE] Lecture du contenu de l'image...")
-        image_bytes = await file.read()
-        print(f"📖 [IMAGE] Image lue: {len(image_bytes)} bytes")
+        # Enregistrer l'image par blocs sous son empreinte SHA-256 (photo identique stockée une seule fois)
+        print("💾 [FILE] Sauvegarde de l'image...")
+        stored = await upload_store.store_upload(file, ROOMS_DIR, max_bytes=MAX_UPLOAD_BYTES)
+        file_path = stored.path
+        print(f"✅ [FILE] Image sauvegardée: {file_path} ({stored.size} bytes{', déjà présente' if stored.deduplicated else ''})")
         
-        img = Image.open(io.BytesIO(image_bytes))
-        img_width, img_height = img.size
-        print(f"📖 [IMAGE] Dimensions: {img_width}x{img_height}")
+        decoded, digest = await postprocess_pool.run(prepare_file_image, stored.path, stored.digest)
+        img = decoded.image
+        img_width, img_height = decoded.original_size
+        print(f"📖 [IMAGE] Dimensions: {img_width}x{img_height} (travail en {img.width}x{img.height})")
         
         # Convertir les détections en un format plus facile à utiliser
         objets_reference = []
         
         # Vérifier si le modèle est disponible (mode TEST ou modèle chargé)
-        if object_model is None or TEST_MODE:
+        if not model_registry.ready or TEST_MODE:
             print("🧪 [TEST] Mode TEST activé - génération d'objets de démonstration")
             # Données de démonstration pour le mode TEST
             objets_reference = [
@@ -1075,17 +1407,13 @@ async def upload_reference_image(
         else:
             print("🤖 [AI] Utilisation du modèle YOLOv5 pour détecter des objets")
             # Utiliser le modèle YOLOv5 pour détecter des objets
-            results = object_model(img)
-            detections = results.pandas().xyxy[0]
+            detections = await detect_image(require_model(model), img, digest)
             
-            for index, row in detections.iterrows():
-                objet_name = row['name']
-                objet_confidence = row['confidence']
-                objet_box = [int(b) for b in [row['xmin'], row['ymin'], row['xmax'], row['ymax']]]
-                
-                # Extraire la couleur dominante
-                cropped_img = img.crop(objet_box)
-                dominant_color = get_dominant_color(cropped_img)
+            # Extraire les couleurs dominantes dans le pool de post-traitement
+            colors = await postprocess_pool.run(extract_object_colors, img, detections.int_boxes())
+            
+            # Boîtes enregistrées dans les coordonnées de l'image d'origine
+            for (objet_name, objet_confidence, objet_box), (dominant_color, _) in zip(decoded.to_original(detections), colors):
                 # Convertir la couleur en nom (simplifié, pourrait être amélioré)
                 # Pour une démo, nous pouvons juste retourner le tuple RGB.
                 # Dans une vraie app, vous auriez une fonction pour mapper RGB à des noms de couleur.
@@ -1099,51 +1427,28 @@ async def upload_reference_image(
                     "confidence": objet_confidence,
                     "box": objet_box,
                     "color": color_name,
-                    "size": size_name
+                    "size": size_name,
+                    # Taille de l'image de référence : permet de comparer les positions entre photos
+                    "image_size": [img_width, img_height]
                 })
         
         print(f"🔍 [DETECTION] {len(objets_reference)} objets détectés")
         
-        # Générer un nom de fichier unique
-        print("💾 [FILE] Génération du nom de fichier...")
-        timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-        file_extension = os.path.splitext(file.filename)[1]
-        new_filename = f"chambre_{DEFAULT_USER_ID}_{timestamp}{file_extension}"
-        file_path = os.path.join(ROOMS_DIR, new_filename)
-        print(f"💾 [FILE] Chemin: {file_path}")
-
-        # Enregistrer l'image sur le disque
-        print("💾 [FILE] Sauvegarde de l'image...")
-        with open(file_path, "wb") as f:
-            f.write(image_bytes)
-        print("✅ [FILE] Image sauvegardée")
+        derivatives.schedule(file_path)
         
         objets_json = json.dumps(objets_reference)
         print("📊 [JSON] Objets sérialisés")
 
-        # Vérifier s'il existe déjà une chambre pour cet utilisateur par défaut
-        print("🏠 [DB] Recherche chambre existante...")
-        chambre = db.query(db_models.Chambre).filter(db_models.Chambre.user_id == DEFAULT_USER_ID).first()
-        if chambre:
-            print("🏠 [DB] Chambre trouvée - mise à jour...")
-            # Mettre à jour l'enregistrement existant
-            chambre.image_path = file_path
-            chambre.objets_reference = objets_json
-        else:
-            print("🏠 [DB] Création nouvelle chambre...")
-            # Créer un nouvel enregistrement
-            chambre = db_models.Chambre(
-                user_id=DEFAULT_USER_ID,
-                image_path=file_path,
-                objets_reference=objets_json,
-                completed_tasks=[]
-            )
-            db.add(chambre)
-        
-        print("💾 [DB] Commit des changements...")
-        db.commit()
-        db.refresh(chambre)
+        # Créer ou mettre à jour la chambre de l'utilisateur par défaut
+        print("🏠 [DB] Enregistrement de la chambre...")
+        await save_chambre_reference(db, DEFAULT_USER_ID, file_path, objets_json, stored.digest)
         print("✅ [DB] Chambre sauvegardée avec succès")
+        task_counters.forget(DEFAULT_USER_ID)
+        # Reconstruire l'entrée de l'index à partir des objets déjà en mémoire (pas de relecture en base)
+        reference_index.put(
+            DEFAULT_USER_ID,
+            ReferenceRoom(objets_reference, file_path, (img_width, img_height), get_position_description)
+        )
 
         return {
             "status": "success",
@@ -1152,80 +1457,84 @@ async def upload_reference_image(
             "file_path": file_path
         }
 
+    except upload_store.UploadTooLarge:
+        return JSONResponse(
+            status_code=413,
+            content={"status": "error", "message": f"Fichier trop volumineux (maximum {MAX_UPLOAD_BYTES} octets)"}
+        )
     except Exception as e:
         print(f"❌ [ERROR] Erreur dans upload_reference_image: {str(e)}")
         print(f"❌ [ERROR] Type d'erreur: {type(e).__name__}")
         import traceback
         print(f"❌ [ERROR] Traceback: {traceback.format_exc()}")
-        db.rollback()
+        await db.rollback()
+        # Image non enregistrée comme référence : la supprimer, sauf si une autre chambre pointe vers ce même contenu
+        if stored is not None:
+            try:
+                referenced = await content_referenced(db, db_models.Chambre, stored.digest)
+            except Exception:
+                referenced = True  # Base injoignable : dans le doute, garder le fichier
+            await run_in_threadpool(upload_store.discard, stored, referenced)
+            stored = None
         return JSONResponse(
             status_code=500,
             content={"status": "error", "message": f"Erreur serveur: {str(e)}"}
         )
+    finally:
+        # Fin du traitement : le fichier enregistré n'est plus réservé par cette requête
+        await run_in_threadpool(upload_store.release, stored)
 
 @app.post("/complete_task/")
-async def complete_task(db: Session = Depends(get_db)):
+async def complete_task():
     """
     Incrémente le compteur de tâches complétées pour l'utilisateur par défaut.
     À appeler chaque fois qu'un enfant termine une tâche de rangement.
+    L'incrément est cumulé en mémoire puis écrit atomiquement en base (voir task_counters.py).
     """
     try:
-        chambre_ref = db.query(db_models.Chambre).filter(db_models.Chambre.user_id == DEFAULT_USER_ID).first()
-        if not chambre_ref:
-            raise HTTPException(status_code=404, detail="Aucune chambre de référence trouvée pour cet utilisateur.")
-        
-        # Incrémenter le compteur de tâches complétées
-        if chambre_ref.completed_tasks is None:
-            chambre_ref.completed_tasks = 1
-        else:
-            chambre_ref.completed_tasks += 1
-        
-        db.commit()
+        completed_tasks = await task_counters.increment(DEFAULT_USER_ID)
         
         # Générer un message d'encouragement
-        progress_message = get_progress_feedback(chambre_ref.completed_tasks, chambre_ref.completed_tasks + 1)
+        progress_message = get_progress_feedback(completed_tasks, completed_tasks + 1)
         
         return {
-            "completed_tasks": chambre_ref.completed_tasks,
+            "completed_tasks": completed_tasks,
             "progress_message": progress_message
         }
+    except ChambreNotFound:
+        raise HTTPException(status_code=404, detail="Aucune chambre de référence trouvée pour cet utilisateur.")
     except Exception as e:
-        db.rollback()
         print(f"Erreur lors de l'incrémentation des tâches complétées: {e}")
         raise HTTPException(status_code=500, detail=f"Une erreur s'est produite: {str(e)}")
 
 @app.post("/reset_tasks/")
-async def reset_tasks(db: Session = Depends(get_db)):
+async def reset_tasks():
     """
     Réinitialise le compteur de tâches complétées pour l'utilisateur par défaut.
     À utiliser lorsqu'on commence une nouvelle session de rangement.
     """
     try:
-        chambre_ref = db.query(db_models.Chambre).filter(db_models.Chambre.user_id == DEFAULT_USER_ID).first()
-        if not chambre_ref:
-            raise HTTPException(status_code=404, detail="Aucune chambre de référence trouvée pour cet utilisateur.")
-        
-        # Réinitialiser le compteur
-        chambre_ref.completed_tasks = 0
-        db.commit()
+        await task_counters.reset(DEFAULT_USER_ID)
         
         return {
             "message": "Compteur de tâches réinitialisé avec succès.",
             "completed_tasks": 0
         }
+    except ChambreNotFound:
+        raise HTTPException(status_code=404, detail="Aucune chambre de référence trouvée pour cet utilisateur.")
     except Exception as e:
-        db.rollback()
         print(f"Erreur lors de la réinitialisation des tâches: {e}")
         raise HTTPException(status_code=500, detail=f"Une erreur s'est produite: {str(e)}")
 
 @app.get("/chambre/get_reference/")
-async def get_reference_image(db: Session = Depends(get_db)):
+async def get_reference_image(db: AsyncSession = Depends(get_db)):
     """
     Récupère l'image de référence de la chambre rangée pour l'utilisateur par défaut.
     Utilisé par l'interface enfant pour afficher l'état idéal de la chambre.
     """
     try:
-        chambre = db.query(db_models.Chambre).filter(db_models.Chambre.user_id == DEFAULT_USER_ID).first()
+        result = await db.execute(select(db_models.Chambre).where(db_models.Chambre.user_id == DEFAULT_USER_ID))
+        chambre = result.scalars().first()
         
         if not chambre:
             return JSONResponse(
@@ -1246,8 +1555,10 @@ async def get_reference_image(db: Session = Depends(get_db)):
         return {
             "status": "success",
             "image_path": chambre.image_path,
+            "image_url": upload_url(chambre.image_path),
             "objects": objets_reference,
-            "completed_tasks": chambre.completed_tasks if hasattr(chambre, 'completed_tasks') else 0
+            "miniatures": miniature_urls("/chambre/reference/miniature"),
+            "completed_tasks": await task_counters.value(DEFAULT_USER_ID)
         }
     except Exception as e:
         print(f"Erreur lors de la récupération de l'image de référence: {e}")
@@ -1256,6 +1567,99 @@ async def get_reference_image(db: Session = Depends(get_db)):
             content={"status": "error", "message": str(e)}
         )
 
+@app.get("/chambre/reference/miniature")
+async def get_reference_miniature(request: Request, taille: int = DERIVATIVE_SIZES[-1]):
+    """Miniature WebP de l'image de référence de l'utilisateur par défaut."""
+    room = await reference_index.get(DEFAULT_USER_ID)
+    if room is None or not room.image_path:
+        return JSONResponse(
+            status_code=404,
+            content={"status": "error", "message": "Aucune image de référence trouvée pour cet utilisateur"}
+        )
+    return await derivative_response(request, room.image_path, taille)
+
+# Dossiers d'uploads servis directement par /uploads/{dossier}/{nom}
+UPLOAD_FOLDERS = {"drawings": DRAWINGS_DIR, "rooms": ROOMS_DIR, "memory": MEMORY_DIR}
+
+@app.api_route("/uploads/{dossier}/{filename}", methods=["GET", "HEAD"])
+async def get_upload_file(request: Request, dossier: str, filename: str):
+    """
+    Fichier d'upload (dessin, photo de chambre ou miniature) envoyé tel quel :
+    ETag fort, 304 si le client l'a déjà, requêtes Range, cache long pour les fichiers adressés par leur contenu.
+    """
+    directory = UPLOAD_FOLDERS.get(dossier)
+    file_path = safe_path(directory, filename) if directory else None
+    # Le nom dans l'URL est l'empreinte du contenu : l'URL change avec le fichier
+    response = await serve_file(request, file_path, UPLOADS_MAX_AGE, immutable=True) if file_path else None
+    if response is None:
+        return JSONResponse(status_code=404, content={"status": "error", "message": "Fichier introuvable"})
+    return response
+
+def memory_image_url(image_path):
+    """URL d'une image de carte : fichier de uploads/memory servi par /uploads, sinon valeur enregistrée (URL, emoji)."""
+    if image_path and os.path.dirname(os.path.normpath(image_path)) == os.path.normpath(MEMORY_DIR):
+        return upload_url(image_path)
+    return image_path
+
+async def load_memory_levels():
+    async with AsyncSessionLocal() as db:
+        return await load_levels(db)
+
+async def load_memory_level(level_id):
+    async with AsyncSessionLocal() as db:
+        return await load_level(db, level_id, memory_image_url)
+
+# Niveaux du memory : une requête par niveau toutes les MEMORY_LEVEL_TTL secondes au plus, paquets pré-mélangés
+memory_decks = MemoryDecks(load_memory_levels, load_memory_level, ttl=MEMORY_LEVEL_TTL, pool_size=MEMORY_DECK_POOL_SIZE)
+
+def cached_json_response(request: Request, body, etag):
+    """JSON déjà sérialisé avec son ETag ; 304 sans corps si le client a déjà cette version."""
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@app.get("/memory/niveaux")
+async def get_memory_niveaux(request: Request):
+    """Niveaux du jeu de memory (niveau, difficulté, nombre de paires)."""
+    try:
+        body, etag = await memory_decks.listing()
+    except Exception as e:
+        print(f"Erreur lors de la lecture des niveaux de memory: {e}")
+        return JSONResponse(status_code=500, content={"status": "error", "message": str(e)})
+    return cached_json_response(request, body, etag)
+
+@app.get("/memory/niveaux/{level_id}")
+async def get_memory_niveau(request: Request, level_id: int):
+    """Niveau du memory avec toutes ses cartes (id, paire_id, image_url, description) ; 304 si déjà à jour chez le client."""
+    try:
+        level = await memory_decks.level(level_id)
+    except Exception as e:
+        print(f"Erreur lors de la lecture du niveau de memory {level_id}: {e}")
+        return JSONResponse(status_code=500, content={"status": "error", "message": str(e)})
+    if level is None:
+        return JSONResponse(status_code=404, content={"status": "error", "message": "Niveau introuvable"})
+    return cached_json_response(request, level.body, level.etag)
+
+@app.get("/memory/niveaux/{level_id}/paquet")
+async def get_memory_paquet(level_id: int):
+    """
+    Paquet mélangé pour une nouvelle partie : identifiants des cartes du niveau dans l'ordre de pose.
+    `version` est l'ETag du niveau : le client ne recharge /memory/niveaux/{id} que s'il a changé.
+    """
+    try:
+        dealt = await memory_decks.deal(level_id)
+    except Exception as e:
+        print(f"Erreur lors de la distribution d'un paquet de memory {level_id}: {e}")
+        return JSONResponse(status_code=500, content={"status": "error", "message": str(e)})
+    if dealt is None:
+        return JSONResponse(status_code=404, content={"status": "error", "message": "Niveau introuvable"})
+    level, deck = dealt
+    return JSONResponse(
+        content={"niveau_id": level_id, "version": level.etag.strip('"'), "cartes": deck},
+        headers={"Cache-Control": "no-store"}
+    )
+
 @app.post("/chat_with_assistant/")
 async def chat_with_assistant(request: ChatRequest):
     """
@@ -1344,92 +1748,166 @@ async def chat_with_assistant(request: ChatRequest):
             "error": str(e)
         }
 
+async def describe_image(entry, image_bytes):
+    """
+    Description de l'objet le plus visible d'une image (nom, couleur, taille),
+    partagée par /describe_object/ et le mode caméra en direct (/ws/describe_object).
+    """
+    # Décoder l'image (taille de travail bornée)
+    decoded, digest = await postprocess_pool.run(prepare_image, image_bytes)
+    img = decoded.image
+    # Taille relative de l'objet : le rapport des surfaces ne dépend pas de l'échelle de travail
+    img_width, img_height = img.size
+    
+    # Détecter les objets
+    detections = (await detect_image(entry, img, digest)).sorted_by_score()
+    
+    if len(detections) == 0:
+        return {
+            "description": "Je ne vois pas d'objet clair dans tes mains ! Peux-tu le montrer un peu plus près de la caméra ?",
+            "object_found": False
+        }
+    
+    # Prendre l'objet le plus confiant (le premier)
+    object_name, confidence, box = next(iter(detections))
+    
+    # Extraire la couleur dominante dans le pool de post-traitement
+    [(dominant_color_rgb, color_name)] = await postprocess_pool.run(extract_object_colors, img, [box])
+    
+    # Estimer la taille
+    size_name = get_object_size(box, img_width, img_height)
+    
+    # Créer une description naturelle pour l'enfant
+    articles = {
+        'livre': 'un', 'ballon': 'un', 'crayon': 'un', 'jouet': 'un',
+        'peluche': 'une', 'poupée': 'une', 'voiture': 'une'
+    }
+    
+    article = articles.get(object_name, 'un')
+    
+    # Messages adaptatifs selon la taille
+    size_descriptions = {
+        'petit': 'tout petit et mignon',
+        'moyen': 'de taille parfaite pour jouer',
+        'grand': 'assez grand et impressionnant'
+    }
+    
+    size_desc = size_descriptions.get(size_name, 'de belle taille')
+    
+    description = f"Je vois que tu tiens {article} {object_name} {color_name} ! Il est {size_desc}. "
+    
+    # Ajouter des informations éducatives
+    educational_facts = {
+        'livre': 'Les livres nous aident à apprendre et à rêver !',
+        'ballon': 'Les ballons rebondissent et roulent ! Tu peux jouer avec !',
+        'crayon': 'Avec les crayons, tu peux dessiner de belles choses !',
+        'voiture': 'Les voitures nous emmènent partout ! Vroum vroum !',
+        'peluche': 'Les peluches sont douces et parfaites pour les câlins !',
+        'poupée': 'Les poupées peuvent être tes amies pour jouer !',
+    }
+    
+    fact = educational_facts.get(object_name, 'C\'est un objet très intéressant !')
+    description += fact
+    
+    return {
+        "description": description,
+        "object_found": True,
+        "object_name": object_name,
+        "color": color_name,
+        "size": size_name,
+        "confidence": float(confidence)
+    }
+
+DESCRIBE_ERROR = {
+    "description": "Oups ! J'ai eu un problème pour voir ton objet ! Peux-tu essayer encore ?",
+    "object_found": False
+}
+
 @app.post("/describe_object/")
-async def describe_object_in_hand(file: UploadFile = File(...)):
+async def describe_object_in_hand(file: UploadFile = File(...), model: Optional[str] = None):
     """
     Décrit l'objet que l'enfant tient dans sa main (nom, couleur, taille)
     """
     try:
-        if not object_model:
-            raise HTTPException(status_code=500, detail="Model is not loaded.")
+        entry = require_model(model)
         
         # Lire l'image
         image_bytes = await file.read()
-        img = Image.open(io.BytesIO(image_bytes))
-        img_width, img_height = img.size
-        
-        # Détecter les objets
-        results = object_model(img)
-        detections = results.pandas().xyxy[0]
-        
-        if len(detections) == 0:
-            return {
-                "description": "Je ne vois pas d'objet clair dans tes mains ! Peux-tu le montrer un peu plus près de la caméra ?",
-                "object_found": False
-            }
-        
-        # Prendre l'objet le plus confiant (le premier)
-        main_detection = detections.iloc[0]
-        object_name = main_detection['name']
-        confidence = main_detection['confidence']
-        box = [int(b) for b in [main_detection['xmin'], main_detection['ymin'], main_detection['xmax'], main_detection['ymax']]]
-        
-        # Extraire la couleur dominante
-        cropped_img = img.crop(box)
-        dominant_color_rgb = get_dominant_color(cropped_img)
-        color_name = get_color_name(dominant_color_rgb)
-        
-        # Estimer la taille
-        size_name = get_object_size(box, img_width, img_height)
-        
-        # Créer une description naturelle pour l'enfant
-        articles = {
-            'livre': 'un', 'ballon': 'un', 'crayon': 'un', 'jouet': 'un',
-            'peluche': 'une', 'poupée': 'une', 'voiture': 'une'
-        }
-        
-        article = articles.get(object_name, 'un')
-        
-        # Messages adaptatifs selon la taille
-        size_descriptions = {
-            'petit': 'tout petit et mignon',
-            'moyen': 'de taille parfaite pour jouer',
-            'grand': 'assez grand et impressionnant'
-        }
-        
-        size_desc = size_descriptions.get(size_name, 'de belle taille')
-        
-        description = f"Je vois que tu tiens {article} {object_name} {color_name} ! Il est {size_desc}. "
-        
-        # Ajouter des informations éducatives
-        educational_facts = {
-            'livre': 'Les livres nous aident à apprendre et à rêver !',
-            'ballon': 'Les ballons rebondissent et roulent ! Tu peux jouer avec !',
-            'crayon': 'Avec les crayons, tu peux dessiner de belles choses !',
-            'voiture': 'Les voitures nous emmènent partout ! Vroum vroum !',
-            'peluche': 'Les peluches sont douces et parfaites pour les câlins !',
-            'poupée': 'Les poupées peuvent être tes amies pour jouer !',
-        }
-        
-        fact = educational_facts.get(object_name, 'C\'est un objet très intéressant !')
-        description += fact
-        
-        return {
-            "description": description,
-            "object_found": True,
-            "object_name": object_name,
-            "color": color_name,
-            "size": size_name,
-            "confidence": float(confidence)
-        }
+        return await describe_image(entry, image_bytes)
         
     except Exception as e:
         print(f"Erreur lors de la description d'objet: {e}")
-        return {
-            "description": "Oups ! J'ai eu un problème pour voir ton objet ! Peux-tu essayer encore ?",
-            "object_found": False,
-            "error": str(e)
-        }
+        return {**DESCRIBE_ERROR, "error": str(e)}
+
+@app.websocket("/ws/describe_object")
+async def describe_object_live(websocket: WebSocket, model: Optional[str] = None):
+    """
+    Mode caméra en direct pour « montre-moi ton jouet ».
+    Le client envoie des images compressées (JPEG en binaire, ou data URL base64 en texte).
+    Seule l'image la plus récente est analysée : celles arrivées pendant une détection sont
+    abandonnées. Une description n'est renvoyée que lorsqu'elle change (objet, couleur, taille).
+    """
+    await websocket.accept()
+    latest = {"frame": None, "seq": 0, "dropped": 0}
+    new_frame = asyncio.Event()
+
+    async def analyse_frames():
+        last_sent = None
+        while True:
+            await new_frame.wait()
+            new_frame.clear()
+            frame, seq = latest["frame"], latest["seq"]
+            latest["frame"] = None
+            try:
+                result = await describe_image(require_model(model), frame)
+            except Exception as e:
+                print(f"Erreur lors de la description d'objet (direct): {e}")
+                result = {**DESCRIBE_ERROR, "error": str(e)}
+            state = (result.get("object_found"), result.get("object_name"), result.get("color"), result.get("size"))
+            if state != last_sent:
+                last_sent = state
+                await websocket.send_json({"type": "description", "frame": seq, "dropped": latest["dropped"], **result})
+
+    worker = asyncio.create_task(analyse_frames())
+    try:
+        while not worker.done():
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            frame = message.get("bytes")
+            if frame is None and message.get("text"):
+                data = message["text"]
+                try:
+                    frame = base64.b64decode(data.split(',')[1] if ',' in data else data, validate=True)
+                except ValueError as e:
+                    # Une image illisible n'interrompt pas la session
+                    await websocket.send_json({"type": "error", "message": f"Image base64 invalide ({e})"})
+                    continue
+            if not frame or len(frame) > LIVE_MAX_FRAME_BYTES:
+                await websocket.send_json({"type": "error", "message": "Image vide ou trop grande"})
+                continue
+            if latest["frame"] is not None:
+                latest["dropped"] += 1  # L'image précédente n'a jamais été analysée
+            latest["frame"] = frame
+            latest["seq"] += 1
+            new_frame.set()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        worker.cancel()
+        try:
+            await worker
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            # Ex: envoi d'une description à un client déjà parti
+            print(f"Mode caméra en direct: analyse interrompue ({e})")
+        if websocket.client_state != WebSocketState.DISCONNECTED:
+            try:
+                await websocket.close()
+            except RuntimeError:
+                pass  # Fermeture déjà envoyée ou connexion perdue
+    print(f"📷 Session caméra terminée: {latest['seq']} image(s) reçue(s), {latest['dropped']} abandonnée(s)")
 
 # Gestionnaire d'événement de démarrage pour charger le modèle YOLOv5
 @app.on_event("startup")
@@ -1439,14 +1917,55 @@ async def startup_event():
     """
     print("🤖 Initialisation du modèle YOLOv5...")
     if not TEST_MODE:
-        load_model()
-        if object_model:
-            print("✅ Modèle YOLOv5 chargé avec succès au démarrage !")
+        await run_in_threadpool(load_model)
+        if model_status["ready"]:
+            print(f"✅ Modèle YOLOv5 '{model_registry.active_name}' actif au démarrage !")
         else:
-            print("❌ Échec du chargement du modèle YOLOv5 au démarrage")
+            print(f"❌ Échec du chargement du modèle YOLOv5 au démarrage: {model_status['error']}")
     else:
         print("⚠️ Mode test activé - Modèle YOLOv5 non chargé")
 
+    # Base SQLite locale : création ou mise à jour du schéma par les migrations (MySQL : voir create_db.py et migration.py)
+    if engine.dialect.name == "sqlite":
+        await upgrade_database(engine)
+
+    # Palette de couleurs : ajout des couleurs définies dans la table objects
+    try:
+        added = await load_color_palette()
+        print(f"🎨 Palette de couleurs prête ({added} couleur(s) ajoutée(s) depuis la base)")
+    except Exception as e:
+        print(f"⚠️ Palette de couleurs par défaut utilisée: {e}")
+
+    # Écriture périodique des compteurs de tâches
+    task_counters.start()
+
+    # Écriture par lots du journal d'activité
+    activity_ingestor.start()
+
+    # File d'analyse des dessins (reprend les travaux restés en attente)
+    try:
+        await analysis_queue.start()
+    except Exception as e:
+        print(f"⚠️ File d'analyse des dessins non démarrée: {e}")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """
+    Événement d'arrêt : libère les requêtes encore en attente d'inférence
+    """
+    for entry in model_registry.entries():
+        stats = entry.engine.stats
+        print(f"📊 Inférence '{entry.name}': {stats['images']} image(s) en {stats['batches']} lot(s)")
+    await analysis_queue.stop()
+    await model_registry.stop_all()
+    # Derniers clics de tâches et événements d'activité encore en mémoire, miniatures en cours de génération
+    await task_counters.stop()
+    await activity_ingestor.stop()
+    await derivatives.drain()
+    inference_pool.shutdown()
+    postprocess_pool.shutdown()
+    await engine.dispose()
+
 # Démarrage du serveur FastAPI avec Uvicorn
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,75 @@
+"""
+Appariement optimal des objets détectés avec les objets de la photo de référence.
+
+Pour chaque classe, une matrice de coût (détections x références) est calculée en
+une seule opération NumPy à partir de boîtes normalisées par la taille de leur image :
+    coût = (1 - IoU) + CENTER_WEIGHT * distance entre les centres
+puis l'affectation de coût total minimal est résolue (algorithme hongrois,
+scipy.optimize.linear_sum_assignment). Dans une chambre avec plusieurs jouets
+identiques, chaque jouet reçoit ainsi la place de référence la plus proche
+sans que deux jouets visent la même place.
+"""
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+# Poids de la distance entre centres (dans un carré unité, divisée par sa diagonale)
+CENTER_WEIGHT = 1.0
+
+
+def normalize_boxes(boxes, image_size):
+    """Boîtes [x1, y1, x2, y2] en pixels -> coordonnées relatives à l'image (0-1)."""
+    width, height = image_size
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+    return boxes / np.array([width, height, width, height], dtype=np.float32)
+
+
+def pair_costs(boxes_a, boxes_b, center_weight=CENTER_WEIGHT):
+    """Matrice (len(a), len(b)) des coûts IoU + distance des centres entre boîtes normalisées."""
+    a = boxes_a[:, None, :]
+    b = boxes_b[None, :, :]
+    inter_w = np.clip(np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0, None)
+    inter_h = np.clip(np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0, None)
+    inter = inter_w * inter_h
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    iou = inter / np.maximum(area_a + area_b - inter, 1e-9)
+
+    center_a = (a[..., :2] + a[..., 2:]) / 2
+    center_b = (b[..., :2] + b[..., 2:]) / 2
+    distance = np.linalg.norm(center_a - center_b, axis=-1) / np.sqrt(2)
+    return (1.0 - iou) + center_weight * distance
+
+
+def class_buckets(labels):
+    """Indices des objets regroupés par nom de classe."""
+    buckets = {}
+    for index, label in enumerate(labels):
+        buckets.setdefault(label, []).append(index)
+    return {label: np.array(indices, dtype=np.int64) for label, indices in buckets.items()}
+
+
+def assign_by_class(detected_labels, detected, reference, reference_buckets):
+    """
+    Affectation optimale, classe par classe, de boîtes normalisées aux boîtes de référence.
+    :return: tableau d'indices de référence (un par détection, -1 si aucune référence disponible)
+    """
+    targets = np.full(len(detected_labels), -1, dtype=np.int64)
+    detected_labels = np.asarray(detected_labels, dtype=object)
+    for label in set(detected_labels.tolist()):
+        ref_idx = reference_buckets.get(label)
+        if ref_idx is None:
+            continue
+        det_idx = np.flatnonzero(detected_labels == label)
+        rows, cols = linear_sum_assignment(pair_costs(detected[det_idx], reference[ref_idx]))
+        targets[det_idx[rows]] = ref_idx[cols]
+    return targets
+
+
+def match_objects(detected_labels, detected_boxes, detected_size, reference_labels, reference_boxes, reference_size):
+    """Appariement des détections aux objets de référence (boîtes en pixels de leurs images respectives)."""
+    return assign_by_class(
+        detected_labels,
+        normalize_boxes(detected_boxes, detected_size),
+        normalize_boxes(reference_boxes, reference_size),
+        class_buckets(reference_labels)
+    )
@@ -0,0 +1,191 @@
+"""
+Niveaux du jeu de memory (MemoryLevel / MemoryCard) servis depuis la mémoire.
+
+Un niveau est lu en une seule requête (le niveau et ses cartes par jointure,
+dans l'ordre de l'index (level_id, paire_id)), sérialisé une fois en JSON avec
+son ETag (SHA-256 du contenu), puis gardé en mémoire `ttl` secondes :
+- le JSON préparé est renvoyé tel quel, ou un 304 si le client a déjà cette version ;
+- chaque partie reçoit un paquet déjà mélangé, pris dans une réserve de
+  `pool_size` mélanges préparés avec le niveau et renouvelée quand elle est vide.
+Une partie ne coûte donc ni requête ni sérialisation. À l'expiration le niveau
+est relu ; si son contenu n'a pas changé, son ETag reste le même.
+"""
+import asyncio
+import hashlib
+import json
+import random
+import time
+from collections import deque
+
+from sqlalchemy import distinct, func, select
+
+import database_models as db_models
+
+
+def encode_payload(payload):
+    """(corps JSON, ETag fort) d'une réponse préparée."""
+    body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return body, f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+
+# --- Lecture en base ---
+
+async def load_levels(db):
+    """Liste des niveaux avec leur nombre de paires, du plus facile au plus difficile."""
+    level, card = db_models.MemoryLevel, db_models.MemoryCard
+    result = await db.execute(
+        select(level.id, level.niveau, level.difficulte, func.count(distinct(card.paire_id)))
+        .outerjoin(card, card.level_id == level.id)
+        .group_by(level.id, level.niveau, level.difficulte)
+        .order_by(level.niveau, level.id)
+    )
+    return {"niveaux": [
+        {"id": level_id, "niveau": niveau, "difficulte": difficulte, "paires": pairs}
+        for level_id, niveau, difficulte, pairs in result.all()
+    ]}
+
+
+async def load_level(db, level_id, image_url=None):
+    """
+    Niveau et toutes ses cartes en une requête ; None si le niveau n'existe pas.
+    :param image_url: fonction(image_path) -> URL publique de l'image d'une carte
+    """
+    level, card = db_models.MemoryLevel, db_models.MemoryCard
+    result = await db.execute(
+        select(level.id, level.niveau, level.difficulte, card.id, card.paire_id, card.image_path, card.description)
+        .outerjoin(card, card.level_id == level.id)
+        .where(level.id == level_id)
+        .order_by(card.paire_id, card.id)
+    )
+    rows = result.all()
+    if not rows:
+        return None
+    _, niveau, difficulte = rows[0][:3]
+    cards = [
+        {"id": card_id, "paire_id": paire_id,
+         "image_url": image_url(image_path) if image_url else image_path, "description": description}
+        for _, _, _, card_id, paire_id, image_path, description in rows if card_id is not None
+    ]
+    return {
+        "id": level_id,
+        "niveau": niveau,
+        "difficulte": difficulte,
+        "paires": len({c["paire_id"] for c in cards}),
+        "cartes": cards,
+    }
+
+
+def deck_cards(cards):
+    """Identifiants des cartes à poser : une paire décrite par une seule carte est posée deux fois."""
+    by_pair = {}
+    for c in cards:
+        by_pair.setdefault(c["paire_id"], []).append(c["id"])
+    return [card_id for ids in by_pair.values() for card_id in (ids * 2 if len(ids) == 1 else ids)]
+
+
+# --- Cache ---
+
+class CachedLevel:
+    """Niveau sérialisé + réserve de paquets mélangés."""
+
+    __slots__ = ("level_id", "body", "etag", "card_ids", "expires_at", "decks", "dealt")
+
+    def __init__(self, level_id, payload, ttl):
+        self.level_id = level_id
+        self.body, self.etag = encode_payload(payload)
+        self.card_ids = deck_cards(payload["cartes"])
+        self.expires_at = time.monotonic() + ttl
+        self.decks = deque()
+        self.dealt = 0
+
+
+class MemoryDecks:
+    """Cache des niveaux de memory et distribution de paquets, utilisé depuis la boucle asyncio."""
+
+    def __init__(self, levels_loader, level_loader, ttl=300, pool_size=32, rng=None):
+        """
+        :param levels_loader: coroutine() -> liste des niveaux (voir load_levels)
+        :param level_loader: coroutine(level_id) -> niveau avec ses cartes, ou None (voir load_level)
+        :param ttl: durée (s) avant relecture d'un niveau en base
+        :param pool_size: paquets mélangés préparés à l'avance par niveau
+        """
+        self.levels_loader = levels_loader
+        self.level_loader = level_loader
+        self.ttl = ttl
+        self.pool_size = pool_size
+        self.rng = rng or random.Random()
+        self._levels = {}
+        self._listing = None
+        # Chargements en cours : les requêtes simultanées sur un niveau absent attendent la même lecture
+        self._loading = {}
+        self.stats = {"hits": 0, "loads": 0, "decks": 0, "shuffles": 0}
+
+    async def _load_once(self, key, load):
+        task = self._loading.get(key)
+        if task is None:
+            task = asyncio.ensure_future(load())
+            self._loading[key] = task
+            task.add_done_callback(lambda _: self._loading.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def listing(self):
+        """(corps JSON, ETag) de la liste des niveaux."""
+        if self._listing is not None and self._listing[2] > time.monotonic():
+            self.stats["hits"] += 1
+            return self._listing[:2]
+
+        async def load():
+            payload = await self.levels_loader()
+            self.stats["loads"] += 1
+            self._listing = (*encode_payload(payload), time.monotonic() + self.ttl)
+            return self._listing
+
+        return (await self._load_once(None, load))[:2]
+
+    async def level(self, level_id):
+        """Niveau préparé (CachedLevel), ou None s'il n'existe pas ; lu en base au premier accès ou après expiration."""
+        cached = self._levels.get(level_id)
+        if cached is not None and cached.expires_at > time.monotonic():
+            self.stats["hits"] += 1
+            return cached
+
+        async def load():
+            payload = await self.level_loader(level_id)
+            self.stats["loads"] += 1
+            if payload is None:
+                self._levels.pop(level_id, None)
+                return None
+            entry = CachedLevel(level_id, payload, self.ttl)
+            self._levels[level_id] = entry
+            return entry
+
+        return await self._load_once(level_id, load)
+
+    def _refill(self, entry):
+        for _ in range(self.pool_size):
+            order = list(entry.card_ids)
+            self.rng.shuffle(order)
+            entry.decks.append(order)
+        self.stats["shuffles"] += self.pool_size
+
+    async def deal(self, level_id):
+        """(niveau, paquet) : paquet = identifiants de cartes dans l'ordre de pose ; None si le niveau n'existe pas."""
+        entry = await self.level(level_id)
+        if entry is None:
+            return None
+        if not entry.decks:
+            self._refill(entry)
+        entry.dealt += 1
+        self.stats["decks"] += 1
+        return entry, entry.decks.popleft()
+
+    def invalidate(self, level_id=None):
+        """Oublie un niveau (ou tous) et la liste des niveaux : relus à la prochaine demande."""
+        self._listing = None
+        if level_id is None:
+            self._levels.clear()
+        else:
+            self._levels.pop(level_id, None)
+
+    def status(self):
+        return {"levels": len(self._levels), **self.stats}
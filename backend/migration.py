@@ -1,45 +1,102 @@
 # migration.py
-from sqlalchemy import create_engine, text
-from models import Base
+"""
+Migrations du schéma de la base (Alembic, voir migrations/versions/).
+
+Utilisation:
+python migration.py                  # met la base à jour (dernière révision)
+python migration.py 0002             # monte jusqu'à une révision donnée
+python migration.py --downgrade -1   # annule la dernière migration
+python migration.py --status         # révision actuelle de la base
+
+Une base créée sans Alembic (ancien create_db.py, create_all(), pas de table alembic_version)
+est d'abord marquée à la révision initiale 0001, puis mise à jour normalement.
+"""
+import argparse
+import os
+
+from alembic import command
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from sqlalchemy import create_engine, inspect
 
 # Définir les paramètres de connexion comme dans create_db.py
 DB_USER = "root"
 DB_PASSWORD = ""
-DB_HOST = "localhost" 
+DB_HOST = "localhost"
 DB_NAME = "toy_helper_db"
 
 # Créer la chaîne de connexion
 DATABASE_URL = f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}/{DB_NAME}"
 
-def apply_migration():
-    # Connexion à la base de données
-    engine = create_engine(DATABASE_URL)
-    conn = engine.connect()
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+# Révision correspondant aux tables de l'ancien create_db.py
+BASELINE_REVISION = "0001"
 
-    try:
-        # Vérifier si la colonne existe déjà
-        check_column = text(
-            "SELECT COUNT(*) FROM INFORMATION_SCHEMA.COLUMNS "
-            "WHERE TABLE_NAME = 'chambres' AND COLUMN_NAME = 'completed_tasks'"
-        )
-        result = conn.execute(check_column)
-        column_exists = result.scalar() > 0
-
-        # Si la colonne n'existe pas, l'ajouter
-        if not column_exists:
-            print("Ajout de la colonne 'completed_tasks'...")
-            add_column = text(
-                "ALTER TABLE chambres ADD COLUMN completed_tasks INTEGER DEFAULT 0"
-            )
-            conn.execute(add_column)
-            print("Migration réussie: colonne 'completed_tasks' ajoutée!")
-        else:
-            print("La colonne 'completed_tasks' existe déjà.")
 
+def alembic_config(connection=None):
+    """Configuration Alembic de backend/alembic.ini ; `connection` : connexion SQLAlchemy à utiliser telle quelle."""
+    config = Config(os.path.join(BACKEND_DIR, "alembic.ini"))
+    config.attributes["configure_logger"] = False
+    if connection is not None:
+        config.attributes["connection"] = connection
+    return config
+
+
+def current_revision(connection):
+    return MigrationContext.configure(connection).get_current_revision()
+
+
+def is_unversioned(connection):
+    """Tables présentes mais aucune révision enregistrée : base créée par create_all()."""
+    return current_revision(connection) is None and inspect(connection).has_table("utilisateurs")
+
+
+def migrate(connection, revision="head", downgrade=False):
+    """Amène la base à `revision` (montée, ou descente si `downgrade`)."""
+    config = alembic_config(connection)
+    if is_unversioned(connection):
+        print(f"Base existante sans version : marquée à la révision {BASELINE_REVISION}")
+        command.stamp(config, BASELINE_REVISION)
+    before = current_revision(connection)
+    if downgrade:
+        command.downgrade(config, revision)
+    else:
+        command.upgrade(config, revision)
+    after = current_revision(connection)
+    if after == before:
+        print(f"Schéma déjà à jour (révision {after}).")
+    else:
+        print(f"Migration réussie: révision {before or 'vide'} -> {after or 'vide'}")
+    return after
+
+
+def database_url(url=None):
+    return url or os.environ.get("DATABASE_URL") or DATABASE_URL
+
+
+def apply_migration(url=None, revision="head", downgrade=False):
+    engine = create_engine(database_url(url))
+    try:
+        with engine.begin() as conn:
+            return migrate(conn, revision, downgrade)
     except Exception as e:
         print(f"Erreur lors de la migration: {e}")
+        raise
     finally:
-        conn.close()
+        engine.dispose()
+
 
 if __name__ == "__main__":
-    apply_migration()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Migrations du schéma de la base (Alembic)")
+    parser.add_argument("revision", nargs="?", default="head", help="révision cible (défaut: head)")
+    parser.add_argument("--url", type=str, default=None, help="URL SQLAlchemy (défaut: DATABASE_URL puis MySQL local)")
+    parser.add_argument("--downgrade", action="store_true", help="redescend jusqu'à la révision donnée (ex: 0002, -1)")
+    parser.add_argument("--status", action="store_true", help="affiche la révision actuelle sans migrer")
+    args = parser.parse_args()
+
+    if args.status:
+        engine = create_engine(database_url(args.url))
+        with engine.connect() as conn:
+            print(f"Révision actuelle: {current_revision(conn) or 'aucune'}")
+    else:
+        apply_migration(args.url, args.revision, args.downgrade)
@@ -0,0 +1,75 @@
+"""
+Environnement Alembic : schéma cible = database_models.Base.metadata.
+
+Les migrations utilisent un pilote synchrone (pymysql, sqlite) : les URL
+asynchrones du serveur (mysql+aiomysql, sqlite+aiosqlite) sont converties.
+"""
+import os
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import engine_from_config, pool
+from sqlalchemy.engine import make_url
+
+import database_models as db_models
+
+# Pilote asynchrone -> pilote synchrone
+SYNC_DRIVERS = {
+    "mysql+aiomysql": "mysql+pymysql",
+    "sqlite+aiosqlite": "sqlite",
+}
+
+config = context.config
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name)
+
+target_metadata = db_models.Base.metadata
+
+
+def database_url():
+    url = make_url(os.environ.get("DATABASE_URL") or config.get_main_option("sqlalchemy.url"))
+    return url.set(drivername=SYNC_DRIVERS.get(url.drivername, url.drivername))
+
+
+def run_migrations_offline():
+    """Génère le SQL sans connexion (alembic upgrade head --sql)."""
+    url = database_url()
+    context.configure(
+        url=url,
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+        render_as_batch=url.get_backend_name() == "sqlite",
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        # Connexion fournie par l'appelant (migration.py, benchmark_indexes.py)
+        _run(connection)
+        return
+    section = config.get_section(config.config_ini_section, {})
+    section["sqlalchemy.url"] = database_url().render_as_string(hide_password=False)
+    connectable = engine_from_config(section, prefix="sqlalchemy.", poolclass=pool.NullPool)
+    with connectable.connect() as connection:
+        _run(connection)
+
+
+def _run(connection):
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        # SQLite ne sait pas modifier une table en place : Alembic la recopie
+        render_as_batch=connection.dialect.name == "sqlite",
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,143 @@
+"""Schéma initial (tables créées par l'ancien create_db.py)
+
+Une base créée avant Alembic est marquée à cette révision par migration.py
+au lieu d'être recréée.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "utilisateurs",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("nom", sa.String(100), nullable=False),
+        sa.Column("prenom", sa.String(100), nullable=True),
+        sa.Column("email", sa.String(100), nullable=True),
+        sa.Column("mot_de_passe", sa.String(255), nullable=True),
+        sa.Column("age", sa.Integer(), nullable=True),
+        sa.Column("avatar", sa.String(255), nullable=True),
+        sa.Column("date_inscription", sa.DateTime(), nullable=True),
+        sa.Column("derniere_connexion", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_utilisateurs_id", "utilisateurs", ["id"])
+    op.create_index("ix_utilisateurs_email", "utilisateurs", ["email"], unique=True)
+
+    op.create_table(
+        "dessins",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("image_path", sa.String(255), nullable=False),
+        sa.Column("date_creation", sa.DateTime(), nullable=True),
+        sa.Column("description", sa.Text(), nullable=True),
+        sa.Column("objet_detecte", sa.String(100), nullable=True),
+        sa.ForeignKeyConstraint(["user_id"], ["utilisateurs.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_dessins_id", "dessins", ["id"])
+
+    op.create_table(
+        "chambres",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("image_path", sa.String(255), nullable=False),
+        sa.Column("objets_reference", sa.Text(), nullable=True),
+        sa.Column("date_creation", sa.DateTime(), nullable=True),
+        sa.Column("completed_tasks", sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(["user_id"], ["utilisateurs.id"]),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("user_id"),
+    )
+    op.create_index("ix_chambres_id", "chambres", ["id"])
+
+    op.create_table(
+        "lego_stages",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("niveau", sa.Integer(), nullable=False),
+        sa.Column("description", sa.Text(), nullable=True),
+        sa.Column("image_path", sa.String(255), nullable=True),
+        sa.Column("difficulte", sa.Integer(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_lego_stages_id", "lego_stages", ["id"])
+
+    op.create_table(
+        "progressions",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("stage_id", sa.Integer(), nullable=False),
+        sa.Column("completed", sa.Boolean(), nullable=True),
+        sa.Column("score", sa.Integer(), nullable=True),
+        sa.Column("date_completed", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["stage_id"], ["lego_stages.id"]),
+        sa.ForeignKeyConstraint(["user_id"], ["utilisateurs.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_progressions_id", "progressions", ["id"])
+
+    op.create_table(
+        "memory_levels",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("niveau", sa.Integer(), nullable=False),
+        sa.Column("difficulte", sa.Integer(), nullable=True),
+        sa.Column("date_creation", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_memory_levels_id", "memory_levels", ["id"])
+
+    op.create_table(
+        "memory_cards",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("level_id", sa.Integer(), nullable=False),
+        sa.Column("image_path", sa.String(255), nullable=False),
+        sa.Column("paire_id", sa.Integer(), nullable=False),
+        sa.Column("description", sa.Text(), nullable=True),
+        sa.ForeignKeyConstraint(["level_id"], ["memory_levels.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_memory_cards_id", "memory_cards", ["id"])
+
+    op.create_table(
+        "objects",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("name_en", sa.String(100), nullable=False, comment="Nom anglais (pour matching YOLOv5)"),
+        sa.Column("name_fr", sa.String(100), nullable=False, comment="Nom français (pour l'enfant)"),
+        sa.Column("category_fr", sa.String(50), nullable=True, comment="Catégorie en français"),
+        sa.Column("synonyms", sa.Text(), nullable=True, comment="Synonymes séparés par des virgules"),
+        sa.Column("default_colors", sa.Text(), nullable=True, comment="Couleurs typiques séparées par des virgules"),
+        sa.Column("typical_sizes", sa.String(50), nullable=True, comment="Tailles typiques: petit,moyen,grand"),
+        sa.Column("child_description", sa.Text(), nullable=True, comment="Description adaptée aux enfants"),
+        sa.Column("educational_fact", sa.Text(), nullable=True, comment="Fait éducatif sur l'objet"),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_objects_id", "objects", ["id"])
+
+    op.create_table(
+        "activity_logs",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=True),
+        sa.Column("action", sa.String(100), nullable=False),
+        sa.Column("page", sa.String(100), nullable=False),
+        sa.Column("timestamp", sa.DateTime(), nullable=True),
+        sa.Column("details", sa.Text(), nullable=True),
+        sa.ForeignKeyConstraint(["user_id"], ["utilisateurs.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_activity_logs_id", "activity_logs", ["id"])
+
+
+def downgrade():
+    for table in ("activity_logs", "objects", "memory_cards", "memory_levels", "progressions",
+                  "lego_stages", "chambres", "dessins", "utilisateurs"):
+        op.drop_table(table)
@@ -0,0 +1,89 @@
+"""Empreintes des uploads, file d'analyse et agrégats d'activité
+
+Ajoute dessins.content_hash / chambres.content_hash (upload_store.py), la table
+analysis_jobs (job_queue.py) et la table activity_rollups (activity_rollups.py).
+Les colonnes, tables et index déjà présents (ancien migration.py, base créée par
+create_all() puis marquée 0001 par migration.py) sont laissés tels quels.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def _has_column(table, column):
+    return column in {c["name"] for c in sa.inspect(op.get_bind()).get_columns(table)}
+
+
+def _has_table(table):
+    return sa.inspect(op.get_bind()).has_table(table)
+
+
+def _has_index(table, index):
+    return index in {i["name"] for i in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def upgrade():
+    for table in ("dessins", "chambres"):
+        if not _has_column(table, "content_hash"):
+            with op.batch_alter_table(table) as batch_op:
+                batch_op.add_column(sa.Column("content_hash", sa.String(64), nullable=True))
+    if not _has_index("dessins", "ix_dessins_content_hash"):
+        op.create_index("ix_dessins_content_hash", "dessins", ["content_hash"])
+
+    if not _has_table("analysis_jobs"):
+        _create_analysis_jobs()
+    if not _has_table("activity_rollups"):
+        _create_activity_rollups()
+
+
+def _create_analysis_jobs():
+    op.create_table(
+        "analysis_jobs",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("kind", sa.String(50), nullable=False),
+        sa.Column("target_id", sa.Integer(), nullable=False),
+        sa.Column("status", sa.String(20), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("last_error", sa.Text(), nullable=True),
+        sa.Column("available_at", sa.DateTime(), nullable=False),
+        sa.Column("date_creation", sa.DateTime(), nullable=True),
+        sa.Column("date_maj", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_analysis_jobs_id", "analysis_jobs", ["id"])
+    op.create_index("ix_analysis_jobs_status_available", "analysis_jobs", ["status", "available_at"])
+    op.create_index("ix_analysis_jobs_kind_target", "analysis_jobs", ["kind", "target_id"])
+
+
+def _create_activity_rollups():
+    op.create_table(
+        "activity_rollups",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("granularity", sa.String(10), nullable=False),
+        sa.Column("bucket_start", sa.DateTime(), nullable=False),
+        sa.Column("page", sa.String(100), nullable=False),
+        sa.Column("event_count", sa.Integer(), nullable=False),
+        sa.Column("total_duration", sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["utilisateurs.id"]),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("user_id", "granularity", "bucket_start", "page", name="uq_activity_rollups_bucket"),
+    )
+    op.create_index("ix_activity_rollups_id", "activity_rollups", ["id"])
+
+
+def downgrade():
+    op.drop_table("activity_rollups")
+    op.drop_table("analysis_jobs")
+    op.drop_index("ix_dessins_content_hash", table_name="dessins")
+    for table in ("chambres", "dessins"):
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column("content_hash")
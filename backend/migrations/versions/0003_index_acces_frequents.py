@@ -0,0 +1,43 @@
+"""Index composites des accès fréquents
+
+- dessins (user_id, date_creation) : galerie paginée d'un utilisateur (gallery.py)
+- progressions (user_id, stage_id) : progression LEGO d'un utilisateur
+- activity_logs (user_id, timestamp) : historique d'un utilisateur sur une période
+- memory_cards (level_id, paire_id) : cartes d'un niveau de memory, par paire
+Sous MySQL, chaque index remplace aussi, pour les lectures, l'index simple de la
+clé étrangère (même première colonne). Voir benchmark_indexes.py.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ("ix_dessins_user_date", "dessins", ["user_id", "date_creation"]),
+    ("ix_progressions_user_stage", "progressions", ["user_id", "stage_id"]),
+    ("ix_activity_logs_user_timestamp", "activity_logs", ["user_id", "timestamp"]),
+    ("ix_memory_cards_level_paire", "memory_cards", ["level_id", "paire_id"]),
+]
+
+
+def _has_index(table, index):
+    return index in {i["name"] for i in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def upgrade():
+    for name, table, columns in INDEXES:
+        # Déjà présent dans une base créée par create_all() avec les modèles actuels
+        if not _has_index(table, name):
+            op.create_index(name, table, columns)
+
+
+def downgrade():
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,158 @@
+"""
+Chargement hors ligne des modèles YOLOv5 depuis un cache local versionné.
+
+Structure du cache (sous MODELS_DIR) :
+    models/yolov5/<version>/hubconf.py     code YOLOv5 (clone du dépôt à ce tag)
+    models/yolov5/<version>/yolov5s.pt     poids pré-entraînés de cette version
+    models/custom_yolov5_toys.pt           modèle personnalisé (optionnel)
+    <poids>.torchscript / <poids>.onnx     exports CPU optionnels (voir export_models.py)
+    <poids>-int8.onnx                      export ONNX quantifié INT8 (voir quantize_model.py)
+
+Au démarrage du serveur, aucun accès réseau n'est fait : si le cache est
+incomplet, le chargement échoue immédiatement avec un message explicite.
+Pour préparer le cache (une seule fois, avec accès réseau) :
+python model_loader.py --version v7.0
+"""
+
+import argparse
+import os
+import subprocess
+import time
+
+YOLOV5_REPO_URL = "https://github.com/ultralytics/yolov5"
+DEFAULT_WEIGHTS = "yolov5s.pt"
+# Moteur d'inférence -> suffixe du fichier de poids correspondant (exports produits par export_models.py)
+INFERENCE_BACKENDS = {"pytorch": ".pt", "torchscript": ".torchscript", "onnx": ".onnx", "onnx-int8": "-int8.onnx"}
+
+
+class ModelLoadError(Exception):
+    """Le modèle ne peut pas être chargé depuis le cache local."""
+
+
+def yolov5_code_dir(models_dir, version):
+    return os.path.join(models_dir, "yolov5", version)
+
+
+def resolve_weights(models_dir, version, weights=DEFAULT_WEIGHTS):
+    """Chemin local des poids : chemin explicite existant, ou fichier du cache versionné."""
+    if os.path.exists(weights):
+        return os.path.abspath(weights)
+    cached = os.path.join(yolov5_code_dir(models_dir, version), os.path.basename(weights))
+    if os.path.exists(cached):
+        return os.path.abspath(cached)
+    raise ModelLoadError(
+        f"Poids '{weights}' introuvables (ni en chemin direct, ni dans {cached}). "
+        f"Préparez le cache avec: python model_loader.py --version {version}"
+    )
+
+
+def exported_weights(weights_path, backend):
+    """
+    Export `backend` des poids .pt (même nom, autre suffixe), ou None s'il n'existe pas
+    ou s'il est plus ancien que le .pt (modèle ré-entraîné ou re-téléchargé depuis l'export).
+    """
+    if backend not in INFERENCE_BACKENDS:
+        raise ModelLoadError(f"Moteur d'inférence inconnu '{backend}' (choix: {', '.join(INFERENCE_BACKENDS)})")
+    if backend == "pytorch":
+        return weights_path
+    path = os.path.splitext(weights_path)[0] + INFERENCE_BACKENDS[backend]
+    if os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(weights_path):
+        return path
+    return None
+
+
+def loaded_backend(model_path):
+    """Moteur correspondant au fichier effectivement chargé (load_yolov5 revient à PyTorch si l'export manque)."""
+    for backend, suffix in sorted(INFERENCE_BACKENDS.items(), key=lambda item: -len(item[1])):
+        if model_path.endswith(suffix):
+            return backend
+    return "pytorch"
+
+
+def tune_cpu_threads(model, model_path, backend, threads):
+    """
+    Fixe le nombre de threads intra-op : PyTorch (pytorch, torchscript, pré/post-traitement)
+    et, pour ONNX Runtime, recrée la session avec des options adaptées au CPU.
+    """
+    import torch
+
+    if threads:
+        torch.set_num_threads(threads)
+    if INFERENCE_BACKENDS[backend].endswith(".onnx"):
+        import onnxruntime
+
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = threads or 0  # 0 = choix d'ONNX Runtime
+        options.inter_op_num_threads = 1  # Graphe YOLOv5 séquentiel : un seul thread inter-op suffit
+        options.execution_mode = onnxruntime.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        # model.model : DetectMultiBackend enveloppé par AutoShape
+        model.model.session = onnxruntime.InferenceSession(model_path, options, providers=['CPUExecutionProvider'])
+
+
+def load_yolov5(models_dir, version, weights=DEFAULT_WEIGHTS, conf=0.4, iou=0.45, backend="pytorch", threads=None):
+    """
+    Charge un modèle YOLOv5 (AutoShape) uniquement à partir du cache local.
+    Avec backend="torchscript", "onnx" ou "onnx-int8", charge l'export correspondant des poids s'il est
+    à jour, sinon revient aux poids PyTorch (les détections sont au même format dans tous les cas).
+    :return: (modèle, durée de chargement en secondes, chemin des poids effectivement chargés)
+    :raises ModelLoadError: si le code ou les poids ne sont pas dans le cache
+    """
+    import torch
+
+    code_dir = yolov5_code_dir(models_dir, version)
+    if not os.path.exists(os.path.join(code_dir, "hubconf.py")):
+        raise ModelLoadError(
+            f"Code YOLOv5 {version} absent de {code_dir}. "
+            f"Préparez le cache avec: python model_loader.py --version {version}"
+        )
+    weights_path = resolve_weights(models_dir, version, weights)
+    model_path = exported_weights(weights_path, backend)
+    if model_path is None:
+        script = "quantize_model.py" if backend == "onnx-int8" else "export_models.py"
+        print(f"⚠️ Pas d'export {backend} à jour pour {weights_path}, utilisation de PyTorch "
+              f"(générez-le avec: python {script} --weights {weights})")
+        backend, model_path = "pytorch", weights_path
+
+    start = time.perf_counter()
+    try:
+        model = torch.hub.load(code_dir, 'custom', path=model_path, source='local', _verbose=False)
+        tune_cpu_threads(model, model_path, backend, threads)
+    except Exception as e:
+        raise ModelLoadError(f"Échec du chargement de {model_path}: {e}") from e
+    model.conf = conf  # Seuil de confiance
+    model.iou = iou  # Seuil IoU pour NMS
+    return model, time.perf_counter() - start, model_path
+
+
+def prepare_cache(models_dir, version, weights=DEFAULT_WEIGHTS):
+    """Télécharge le code YOLOv5 et les poids d'une version dans le cache (nécessite le réseau)."""
+    import torch
+
+    code_dir = yolov5_code_dir(models_dir, version)
+    if not os.path.exists(os.path.join(code_dir, "hubconf.py")):
+        os.makedirs(os.path.dirname(code_dir), exist_ok=True)
+        print(f"Clonage de YOLOv5 {version} dans {code_dir}")
+        subprocess.run(
+            ["git", "clone", "--depth", "1", "--branch", version, YOLOV5_REPO_URL, code_dir],
+            check=True
+        )
+
+    weights_path = os.path.join(code_dir, weights)
+    if not os.path.exists(weights_path):
+        url = f"{YOLOV5_REPO_URL}/releases/download/{version}/{weights}"
+        print(f"Téléchargement des poids {url}")
+        torch.hub.download_url_to_file(url, weights_path)
+
+    print(f"Cache prêt: {code_dir}")
+    return code_dir
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Préparer le cache local des modèles YOLOv5')
+    parser.add_argument('--models_dir', type=str, default='models', help='dossier des modèles')
+    parser.add_argument('--version', type=str, default='v7.0', help='tag YOLOv5 à mettre en cache')
+    parser.add_argument('--weights', type=str, default=DEFAULT_WEIGHTS, help='poids pré-entraînés à télécharger')
+
+    args = parser.parse_args()
+    prepare_cache(args.models_dir, args.version, args.weights)
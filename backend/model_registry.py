@@ -0,0 +1,123 @@
+"""
+Registre de modèles YOLOv5 chargés et « chauds », avec bascule atomique.
+
+Chaque modèle enregistré (ex: "default", "custom") est chargé une fois,
+préchauffé par une passe à vide, et possède son propre moteur d'inférence.
+Basculer le modèle actif revient à changer un nom : les requêtes en cours
+gardent l'entrée qu'elles ont obtenue au début et terminent sur l'ancien modèle.
+"""
+import itertools
+import os
+import time
+
+from PIL import Image
+
+
+def weights_fingerprint(weights_path):
+    """Chemin, taille et date de modification du fichier de poids (None s'il est illisible)."""
+    try:
+        stat = os.stat(weights_path)
+    except OSError:
+        return None
+    return f"{weights_path}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+class ModelEntry:
+    """Un modèle chargé avec son moteur d'inférence et ses métadonnées."""
+
+    def __init__(self, name, model, engine, weights_path, load_time, warm_time, version):
+        self.name = name
+        self.model = model
+        self.engine = engine
+        self.weights_path = weights_path
+        self.load_time = load_time
+        self.warm_time = warm_time
+        # Incrémenté à chaque (re)chargement : identifie le modèle pour les caches
+        self.version = version
+        # Identité des poids, stable entre redémarrages (cache de détection sur disque)
+        self.fingerprint = weights_fingerprint(weights_path) or self.key
+
+    @property
+    def key(self):
+        return f"{self.name}:{self.version}"
+
+    def describe(self):
+        return {
+            "weights": self.weights_path,
+            "classes": len(self.model.names),
+            "load_time": round(self.load_time, 2),
+            "warm_time": round(self.warm_time, 3),
+            "version": self.version
+        }
+
+
+class ModelRegistry:
+    """Modèles chargés par nom + nom du modèle actif."""
+
+    def __init__(self, loader, engine_factory, warmup_size=640):
+        """
+        :param loader: fonction(nom, weights) -> (modèle, durée de chargement, chemin des poids)
+        :param engine_factory: fonction(modèle) -> InferenceEngine
+        """
+        self.loader = loader
+        self.engine_factory = engine_factory
+        self.warmup_size = warmup_size
+        self._entries = {}
+        self._active = None
+        self._versions = itertools.count(1)
+
+    def load(self, name, weights):
+        """
+        Charge et préchauffe un modèle SANS l'installer (appel bloquant, à lancer hors boucle asyncio).
+        """
+        model, load_time, weights_path = self.loader(name, weights)
+        start = time.perf_counter()
+        # Passe à vide : initialise les poids en mémoire et les noyaux PyTorch
+        model([Image.new('RGB', (self.warmup_size, self.warmup_size))])
+        warm_time = time.perf_counter() - start
+        return ModelEntry(name, model, self.engine_factory(model), weights_path, load_time, warm_time, next(self._versions))
+
+    def install(self, entry):
+        """Installe (ou remplace) une entrée chargée. Renvoie l'entrée remplacée éventuelle."""
+        entries = dict(self._entries)
+        previous = entries.get(entry.name)
+        entries[entry.name] = entry
+        self._entries = entries
+        if self._active is None:
+            self._active = entry.name
+        return previous
+
+    def activate(self, name):
+        """Bascule atomique du modèle actif (le modèle doit déjà être chargé)."""
+        if name not in self._entries:
+            raise KeyError(name)
+        self._active = name
+        return self._entries[name]
+
+    def get(self, name=None):
+        """Entrée du modèle demandé, ou du modèle actif. KeyError si absent."""
+        return self._entries[name or self._active]
+
+    def entries(self):
+        return list(self._entries.values())
+
+    def __contains__(self, name):
+        return name in self._entries
+
+    @property
+    def active_name(self):
+        return self._active
+
+    @property
+    def ready(self):
+        return self._active is not None
+
+    def status(self):
+        return {
+            "active": self._active,
+            "models": {name: entry.describe() for name, entry in self._entries.items()}
+        }
+
+    async def stop_all(self):
+        for entry in self.entries():
+            await entry.engine.stop()
@@ -0,0 +1,204 @@
+"""
+Script pour quantifier un modèle YOLOv5 en INT8 (quantification statique post-entraînement
+avec ONNX Runtime), calibrée sur les images de validation décrites dans data.yaml.
+
+Seules les convolutions sont quantifiées : la tête de détection (décodage des boîtes)
+reste en FP32 pour garder des coordonnées précises. Le résultat est écrit à côté des
+poids (<poids>-int8.onnx) et est chargé par le serveur pour les modèles listés dans
+QUANTIZED_MODELS (main.py).
+
+Le script produit aussi un rapport de comparaison INT8 / FP32 : latence, mémoire
+et concordance des détections sur un jeu d'images local.
+
+Utilisation:
+python export_models.py --weights models/custom_yolov5_toys.pt --include onnx   # export FP32 d'abord
+python quantize_model.py --weights models/custom_yolov5_toys.pt --data data.yaml
+python quantize_model.py --weights models/custom_yolov5_toys.pt --report_only --report rapport_int8.md
+
+Dépendances:
+pip install onnx onnxruntime
+"""
+
+import argparse
+import glob
+import multiprocessing
+import os
+import resource
+import time
+
+import numpy as np
+import yaml
+from PIL import Image
+
+from detections import DetectionResult
+from export_models import detection_dicts, same_detections
+from model_loader import INFERENCE_BACKENDS, exported_weights, load_yolov5, loaded_backend, resolve_weights
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+# Écart maximal (px) entre une boîte INT8 et la boîte FP32 correspondante pour la compter comme retrouvée
+BOX_TOLERANCE = 8
+
+
+def dataset_images(data_yaml_path, split="val", limit=None):
+    """Images d'un split de data.yaml (chemins relatifs au dossier de data.yaml)."""
+    with open(data_yaml_path, 'r') as f:
+        data = yaml.safe_load(f)
+    folder = data.get(split) or ""
+    if not os.path.isabs(folder):
+        folder = os.path.join(os.path.dirname(os.path.abspath(data_yaml_path)), folder)
+    paths = sorted(p for p in glob.glob(os.path.join(folder, "*")) if p.lower().endswith(IMAGE_EXTENSIONS))
+    return paths[:limit] if limit else paths
+
+
+def letterbox(img, size=640, fill=114):
+    """Redimensionne en gardant les proportions puis complète en carré (comme AutoShape pour ONNX)."""
+    img = img.convert('RGB')
+    ratio = size / max(img.size)
+    resized = img.resize((max(1, round(img.width * ratio)), max(1, round(img.height * ratio))), Image.BILINEAR)
+    canvas = Image.new('RGB', (size, size), (fill, fill, fill))
+    canvas.paste(resized, ((size - resized.width) // 2, (size - resized.height) // 2))
+    return canvas
+
+
+class CalibrationImages:
+    """Lecteur de calibration ONNX Runtime : une image prétraitée (1, 3, H, W) à la fois."""
+
+    def __init__(self, paths, input_name, size=640):
+        self.paths = list(paths)
+        self.input_name = input_name
+        self.size = size
+
+    def get_next(self):
+        if not self.paths:
+            return None
+        img = letterbox(Image.open(self.paths.pop(0)), self.size)
+        array = np.asarray(img, dtype=np.float32).transpose(2, 0, 1)[None] / 255.0
+        return {self.input_name: np.ascontiguousarray(array)}
+
+
+def quantize_model(onnx_path, output_path, calibration_paths, img_size=640):
+    """Quantification statique INT8 (format QDQ) des convolutions d'un export ONNX."""
+    import onnxruntime
+    from onnxruntime.quantization import CalibrationMethod, QuantFormat, QuantType, quantize_static
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    if not calibration_paths:
+        raise ValueError("Aucune image de calibration : vérifiez le split 'val' de data.yaml")
+
+    prepared_path = output_path.replace(".onnx", "-prep.onnx")
+    quant_pre_process(onnx_path, prepared_path, skip_symbolic_shape=True)
+    input_name = onnxruntime.InferenceSession(prepared_path, providers=['CPUExecutionProvider']).get_inputs()[0].name
+
+    print(f"Calibration sur {len(calibration_paths)} images")
+    quantize_static(
+        prepared_path,
+        output_path,
+        CalibrationImages(calibration_paths, input_name, img_size),
+        quant_format=QuantFormat.QDQ,
+        op_types_to_quantize=["Conv"],
+        per_channel=True,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        calibrate_method=CalibrationMethod.MinMax
+    )
+    os.remove(prepared_path)
+    print(f"Modèle INT8 écrit dans {output_path}")
+    return output_path
+
+
+def measure_backend(args):
+    """Exécuté dans un processus séparé pour que le pic mémoire ne mesure que ce modèle."""
+    models_dir, version, weights, backend, image_paths, threads, runs = args
+    model, load_time, model_path = load_yolov5(models_dir, version, weights, backend=backend, threads=threads)
+    images = [Image.open(path).convert('RGB') for path in image_paths]
+    model(images[:1])  # Préchauffage
+
+    latencies = []
+    detections = []
+    for img in images:
+        start = time.perf_counter()
+        for _ in range(runs):
+            results = model([img])
+        latencies.append((time.perf_counter() - start) / runs)
+        detections.append(detection_dicts(DetectionResult.from_tensor(results.xyxy[0], results.names)))
+
+    return {
+        "requested": backend,
+        # Format réellement mesuré : PyTorch FP32 si l'export demandé est absent ou périmé
+        "backend": loaded_backend(model_path),
+        "model_path": model_path,
+        "file_mb": os.path.getsize(model_path) / 1e6,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "latency_ms": 1000 * float(np.median(latencies)),
+        "detections": detections
+    }
+
+
+def comparison_report(weights, models_dir, version, image_paths, threads=None, runs=3):
+    """Compare FP32 (PyTorch et ONNX) et INT8 ; renvoie le rapport au format Markdown."""
+    backends = ["pytorch", "onnx", "onnx-int8"]
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(1, maxtasksperchild=1) as pool:
+        results = pool.map(measure_backend, [
+            (models_dir, version, weights, backend, image_paths, threads, runs) for backend in backends
+        ])
+
+    reference = results[0]
+    lines = [
+        f"# Quantification INT8 - {os.path.basename(reference['model_path'])}",
+        "",
+        f"{len(image_paths)} images, latence médiane sur {runs} passes par image, "
+        f"threads intra-op: {threads or 'défaut'}, détection retrouvée = même classe et boîte à {BOX_TOLERANCE} px près.",
+        "",
+        "| moteur | fichier | taille (Mo) | pic RSS (Mo) | latence (ms/image) | accélération | détections FP32 retrouvées | détections |",
+        "|---|---|---|---|---|---|---|---|",
+    ]
+    total_reference = sum(len(d) for d in reference["detections"])
+    for result in results:
+        agreement = np.mean([same_detections(ref, d, BOX_TOLERANCE)
+                             for ref, d in zip(reference["detections"], result["detections"])])
+        backend = result["backend"]
+        if backend != result["requested"]:
+            backend += f" ({result['requested']} indisponible)"
+        lines.append(
+            f"| {backend} | {os.path.basename(result['model_path'])} | {result['file_mb']:.1f} | "
+            f"{result['peak_rss_mb']:.0f} | {result['latency_ms']:.1f} | "
+            f"x{reference['latency_ms'] / max(result['latency_ms'], 1e-9):.2f} | {100 * agreement:.1f}% | "
+            f"{sum(len(d) for d in result['detections'])} / {total_reference} |"
+        )
+    return "\n".join(lines) + "\n"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Quantifier un modèle YOLOv5 en INT8 et comparer au FP32')
+    parser.add_argument('--models_dir', type=str, default='models', help='dossier des modèles')
+    parser.add_argument('--version', type=str, default='v7.0', help='tag YOLOv5 du cache local')
+    parser.add_argument('--weights', type=str, default='models/custom_yolov5_toys.pt', help='poids .pt (déjà exportés en ONNX)')
+    parser.add_argument('--data', type=str, default='data.yaml', help='chemin vers le fichier data.yaml (images de calibration)')
+    parser.add_argument('--calibration_images', type=int, default=200, help='nombre maximal d\'images de calibration')
+    parser.add_argument('--img_size', type=int, default=640, help='taille des images')
+    parser.add_argument('--images', type=str, default=None, help='motif glob des images du rapport (défaut: split val de data.yaml)')
+    parser.add_argument('--threads', type=int, default=None, help='threads intra-op pour le rapport')
+    parser.add_argument('--runs', type=int, default=3, help='passes par image pour mesurer la latence')
+    parser.add_argument('--report', type=str, default=None, help='fichier Markdown où écrire le rapport')
+    parser.add_argument('--report_only', action='store_true', help='ne pas re-quantifier, seulement comparer')
+
+    args = parser.parse_args()
+    weights_path = resolve_weights(args.models_dir, args.version, args.weights)
+    onnx_path = exported_weights(weights_path, "onnx")
+    if onnx_path is None:
+        raise SystemExit(f"Export ONNX absent ou périmé : python export_models.py --weights {args.weights} --include onnx")
+
+    if not args.report_only:
+        calibration = dataset_images(args.data, "val", args.calibration_images)
+        quantize_model(onnx_path, os.path.splitext(weights_path)[0] + INFERENCE_BACKENDS["onnx-int8"], calibration, args.img_size)
+
+    image_paths = sorted(glob.glob(args.images)) if args.images else dataset_images(args.data, "val", 50)
+    if not image_paths:
+        raise SystemExit("Aucune image pour le rapport (--images ou split val de data.yaml)")
+    report = comparison_report(args.weights, args.models_dir, args.version, image_paths, args.threads, args.runs)
+    print(report)
+    if args.report:
+        with open(args.report, "w") as f:
+            f.write(report)
+        print(f"Rapport écrit dans {args.report}")
@@ -0,0 +1,105 @@
+"""
+Index en mémoire des chambres de référence, par utilisateur.
+
+Chaque /detect_objects/ avait besoin de la ligne Chambre, du json.loads de
+`objets_reference` et du recalcul des positions. L'index garde la version
+préparée (boîtes en tableaux, boîtes normalisées, positions décrites, indices
+par classe) et n'est reconstruit que lorsqu'une nouvelle référence est écrite
+par /chambre/upload_reference/. L'appariement est alors servi sans accès à la base.
+"""
+import json
+
+import numpy as np
+from PIL import Image
+
+from matching import assign_by_class, class_buckets, normalize_boxes
+
+
+class ReferenceRoom:
+    """Objets de référence d'une chambre, prêts pour l'appariement."""
+
+    __slots__ = ("image_path", "image_size", "objects", "labels", "boxes", "normalized", "positions", "buckets")
+
+    def __init__(self, objects, image_path, image_size, describe_position):
+        """
+        :param objects: liste des objets de référence (dicts avec au moins 'name' et 'box')
+        :param image_size: (largeur, hauteur) de l'image de référence, ou None si inconnue
+        :param describe_position: fonction(box, largeur, hauteur) -> description de la position
+        """
+        self.image_path = image_path
+        self.image_size = tuple(image_size) if image_size else None
+        self.objects = objects
+        self.labels = [obj['name'] for obj in objects]
+        self.boxes = np.asarray([obj['box'] for obj in objects], dtype=np.float32).reshape(-1, 4)
+        # Sans taille connue, normalisation et positions sont calculées à la demande avec la taille de l'image courante
+        self.normalized = normalize_boxes(self.boxes, self.image_size) if self.image_size else None
+        self.positions = [describe_position(box, *self.image_size) for box in self.boxes.tolist()] if self.image_size else None
+        self.buckets = class_buckets(self.labels)
+
+    def __len__(self):
+        return len(self.labels)
+
+    def match(self, detected_labels, detected_boxes, detected_size):
+        """Indice de l'objet de référence attribué à chaque détection (-1 si aucun), voir matching.py."""
+        reference = self.normalized if self.normalized is not None else normalize_boxes(self.boxes, detected_size)
+        return assign_by_class(detected_labels, normalize_boxes(detected_boxes, detected_size), reference, self.buckets)
+
+    def target(self, index, detected_size, describe_position):
+        """(boîte, position décrite) de l'objet de référence `index`."""
+        box = self.objects[index]['box']
+        if self.positions is not None:
+            return box, self.positions[index]
+        return box, describe_position(box, *detected_size)
+
+    @classmethod
+    def from_chambre(cls, chambre, describe_position):
+        """Construit l'entrée à partir d'une ligne Chambre (None si pas d'objets de référence)."""
+        if not chambre or not chambre.objets_reference:
+            return None
+        objects = json.loads(chambre.objets_reference)
+        return cls(objects, chambre.image_path, reference_image_size(objects, chambre.image_path), describe_position)
+
+
+def reference_image_size(objects, image_path):
+    """Taille enregistrée avec les objets, sinon lue dans l'en-tête de l'image de référence (anciennes références)."""
+    for obj in objects:
+        if obj.get('image_size'):
+            return tuple(obj['image_size'])
+    try:
+        with Image.open(image_path) as img:
+            return img.size
+    except (OSError, TypeError, ValueError):
+        return None
+
+
+class ReferenceIndex:
+    """Cache user_id -> ReferenceRoom (ou None si l'utilisateur n'a pas de référence), utilisé depuis la boucle asyncio."""
+
+    def __init__(self, loader):
+        """:param loader: coroutine(user_id) -> ReferenceRoom ou None (lecture en base)"""
+        self.loader = loader
+        self._rooms = {}
+        self.stats = {"hits": 0, "loads": 0}
+
+    async def get(self, user_id):
+        """Référence préparée de l'utilisateur ; chargée depuis la base au premier accès seulement."""
+        if user_id in self._rooms:
+            self.stats["hits"] += 1
+            return self._rooms[user_id]
+        room = await self.loader(user_id)
+        self.stats["loads"] += 1
+        # Une référence écrite pendant le chargement est prioritaire
+        return self._rooms.setdefault(user_id, room)
+
+    def put(self, user_id, room):
+        """Remplace la référence d'un utilisateur (après l'écriture d'une nouvelle référence)."""
+        self._rooms[user_id] = room
+
+    def invalidate(self, user_id=None):
+        if user_id is None:
+            self._rooms.clear()
+        else:
+            self._rooms.pop(user_id, None)
+
+    def status(self):
+        return {"users": len(self._rooms), **self.stats}
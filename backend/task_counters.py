@@ -0,0 +1,173 @@
+"""
+Compteurs de tâches complétées (Chambre.completed_tasks) à écriture différée.
+
+/complete_task/ faisait un SELECT puis un UPDATE par clic, avec une lecture-
+modification-écriture qui perd des incréments quand plusieurs appareils tapent
+en même temps. Ici :
+- la base n'est modifiée que par des UPDATE atomiques
+  (completed_tasks = COALESCE(completed_tasks, 0) + n) ou des remises à zéro ;
+- en mode coalescé, les clics s'accumulent en mémoire et sont écrits en une
+  seule requête par utilisateur toutes les `flush_interval` secondes ;
+- un écrit qui échoue est remis dans les compteurs en attente : aucun clic perdu.
+"""
+import asyncio
+
+from sqlalchemy import func, select, update
+
+import database_models as db_models
+
+
+class ChambreNotFound(Exception):
+    """L'utilisateur n'a pas de chambre de référence."""
+
+
+class TaskCounters:
+    """
+    Compteurs par utilisateur : valeur connue en base + changements en attente d'écriture.
+    Utilisé uniquement depuis la boucle asyncio : les sections sans await sont atomiques.
+    """
+
+    def __init__(self, session_factory, flush_interval=2.0, coalesce=True):
+        """:param session_factory: fabrique de sessions AsyncSession (voir database.py)"""
+        self.session_factory = session_factory
+        self.flush_interval = flush_interval
+        self.coalesce = coalesce
+        # user_id -> dernière valeur lue en base
+        self._persisted = {}
+        # user_id -> [remise à zéro en attente, incréments en attente]
+        self._pending = {}
+        # Changements en cours d'écriture (encore comptés par value() jusqu'à la relecture)
+        self._inflight = {}
+        # Positionné quand aucune écriture n'est en cours
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._wakeup = asyncio.Event()
+        self._flusher = None
+        self._stopping = False
+
+    # --- Lecture ---
+
+    async def value(self, user_id):
+        """Compteur courant (base + changements pas encore écrits). ChambreNotFound si pas de chambre."""
+        value = await self._base(user_id)
+        value = self._persisted.get(user_id, value)
+        for changes in (self._inflight, self._pending):
+            reset, delta = changes.get(user_id, (False, 0))
+            value = delta if reset else value + delta
+        return value
+
+    async def _base(self, user_id):
+        if user_id in self._persisted:
+            return self._persisted[user_id]
+        chambre = db_models.Chambre
+        async with self.session_factory() as db:
+            result = await db.execute(
+                select(func.count(chambre.id), func.max(chambre.completed_tasks)).where(chambre.user_id == user_id)
+            )
+            exists, completed = result.one()
+        if not exists:
+            raise ChambreNotFound(user_id)
+        return self._persisted.setdefault(user_id, completed or 0)
+
+    def forget(self, user_id):
+        """Oublie la valeur lue en base (ex: chambre créée ou remplacée par une autre voie)."""
+        self._persisted.pop(user_id, None)
+
+    # --- Écriture ---
+
+    async def increment(self, user_id, amount=1):
+        """Ajoute `amount` tâches complétées et renvoie la nouvelle valeur."""
+        await self._base(user_id)
+        pending = self._pending.setdefault(user_id, [False, 0])
+        pending[1] += amount
+        if not self.coalesce:
+            await self.flush()
+        return await self.value(user_id)
+
+    async def reset(self, user_id):
+        """Remet le compteur à zéro (les clics déjà en attente sont annulés)."""
+        await self._base(user_id)
+        self._pending[user_id] = [True, 0]
+        if not self.coalesce:
+            await self.flush()
+
+    async def flush(self):
+        """Écrit tous les changements en attente (une transaction)."""
+        if self._inflight:
+            return 0  # Une écriture est déjà en cours ; ces changements partiront à la suivante
+        pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        self._inflight = pending
+        self._idle.clear()
+
+        chambre = db_models.Chambre
+        try:
+            async with self.session_factory() as db:
+                for user_id, (reset, delta) in pending.items():
+                    new_value = delta if reset else func.coalesce(chambre.completed_tasks, 0) + delta
+                    await db.execute(update(chambre).where(chambre.user_id == user_id).values(completed_tasks=new_value))
+                await db.commit()
+                # Relire les valeurs écrites (inclut les clics d'autres processus)
+                result = await db.execute(
+                    select(chambre.user_id, chambre.completed_tasks).where(chambre.user_id.in_(list(pending)))
+                )
+                persisted = dict(result.all())
+        except asyncio.CancelledError:
+            # Écriture interrompue : ses changements repartiront à la prochaine écriture
+            self._inflight = {}
+            self._restore(pending)
+            self._idle.set()
+            raise
+        except Exception as e:
+            self._inflight = {}
+            self._restore(pending)
+            self._idle.set()
+            print(f"⚠️ Compteurs de tâches: écriture reportée ({e})")
+            return 0
+
+        for user_id, completed in persisted.items():
+            self._persisted[user_id] = completed or 0
+        self._inflight = {}
+        self._idle.set()
+        return len(pending)
+
+    def _restore(self, pending):
+        """Remet des changements non écrits devant ceux arrivés entre-temps."""
+        for user_id, (reset, delta) in pending.items():
+            newer = self._pending.get(user_id)
+            if newer is None:
+                self._pending[user_id] = [reset, delta]
+            elif not newer[0]:
+                # Une remise à zéro plus récente l'emporte ; sinon les incréments s'additionnent
+                self._pending[user_id] = [reset, delta + newer[1]]
+
+    # --- Écriture périodique ---
+
+    def start(self):
+        # Aussi en mode non coalescé : reprend les écritures reportées après une erreur
+        if self._flusher is None:
+            self._stopping = False
+            self._flusher = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def stop(self):
+        """Arrête l'écriture périodique (sans interrompre une écriture en cours) et écrit les derniers changements."""
+        if self._flusher is not None:
+            self._stopping = True
+            self._wakeup.set()
+            await self._flusher
+            self._flusher = None
+        # Écriture lancée par un endpoint (mode non coalescé) : attendre sa fin avant la dernière
+        await self._idle.wait()
+        await self.flush()
+        if self._pending:
+            print(f"⚠️ Compteurs de tâches non écrits à l'arrêt: {self._pending}")
@@ -0,0 +1,60 @@
+"""
+Test des compteurs de tâches (task_counters.py) sur une base SQLite temporaire.
+
+Utilisation:
+python -m pytest test_task_counters.py
+"""
+import asyncio
+import contextlib
+import os
+import tempfile
+
+from sqlalchemy import select
+
+import database_models as db_models
+from database import create_database, create_tables
+from task_counters import TaskCounters
+
+
+def slow_sessions(session_factory, delay):
+    """Fabrique de sessions dont chaque requête attend `delay` secondes (écriture lente)."""
+    @contextlib.asynccontextmanager
+    async def session():
+        async with session_factory() as db:
+            execute = db.execute
+
+            async def slow_execute(*args, **kwargs):
+                await asyncio.sleep(delay)
+                return await execute(*args, **kwargs)
+
+            db.execute = slow_execute
+            yield db
+    return session
+
+
+async def stop_during_slow_flush(url):
+    engine, session_factory = create_database(url)
+    await create_tables(engine, db_models.Base.metadata)
+    async with session_factory() as db:
+        db.add(db_models.Utilisateur(id=1, nom="enfant"))
+        db.add(db_models.Chambre(user_id=1, image_path="chambre.png", completed_tasks=0))
+        await db.commit()
+
+    counters = TaskCounters(slow_sessions(session_factory, 0.2), flush_interval=0.01)
+    counters.start()
+    for _ in range(3):
+        await counters.increment(1)
+    # L'écriture périodique est en cours (UPDATE lent) au moment de l'arrêt
+    await asyncio.sleep(0.1)
+    await counters.stop()
+
+    async with session_factory() as db:
+        completed = (await db.execute(select(db_models.Chambre.completed_tasks))).scalar()
+    await engine.dispose()
+    return completed
+
+
+def test_stop_during_slow_flush_keeps_clicks():
+    with tempfile.TemporaryDirectory() as tmp:
+        completed = asyncio.run(stop_during_slow_flush(f"sqlite:///{os.path.join(tmp, 'test.db')}"))
+    assert completed == 3
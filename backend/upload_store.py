@@ -0,0 +1,145 @@
+"""
+Stockage des fichiers uploadés, adressé par leur contenu.
+
+Les endpoints lisaient l'upload entier en mémoire (`await file.read()`) puis
+l'écrivaient sous un nom horodaté à la seconde près : deux uploads dans la même
+seconde s'écrasaient. Ici l'upload est recopié par blocs dans un fichier
+temporaire du dossier cible tout en calculant son SHA-256, puis renommé
+atomiquement en <sha256><extension>. Une image identique déjà présente n'est
+pas réécrite (déduplication) : le fichier temporaire est simplement supprimé.
+
+Un même fichier peut donc servir à plusieurs requêtes simultanées : chaque
+requête le réserve jusqu'à la fin de son traitement (release / discard), et
+discard ne le supprime que s'il n'est ni réservé par une autre requête ni
+référencé en base.
+"""
+import glob
+import hashlib
+import os
+import tempfile
+import threading
+
+from fastapi.concurrency import run_in_threadpool
+
+CHUNK_SIZE = 1024 * 1024
+DEFAULT_EXTENSION = ".png"
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".webp", ".gif", ".bmp"}
+
+# chemin -> nombre de requêtes en cours qui utilisent ce fichier
+_claims = {}
+# Protège _claims, la déduplication et la suppression (exécutées dans le pool de threads)
+_lock = threading.Lock()
+
+
+class UploadTooLarge(Exception):
+    """L'upload dépasse la taille maximale autorisée."""
+
+
+class StoredFile:
+    """Fichier enregistré : chemin final, empreinte SHA-256, taille, déjà présent ou non."""
+
+    __slots__ = ("path", "digest", "size", "deduplicated")
+
+    def __init__(self, path, digest, size, deduplicated):
+        self.path = path
+        self.digest = digest
+        self.size = size
+        self.deduplicated = deduplicated
+
+
+def upload_extension(filename, default=DEFAULT_EXTENSION):
+    """Extension d'image (en minuscules) du nom envoyé par le client, ou `default` si absente ou inconnue."""
+    extension = os.path.splitext(filename or "")[1].lower()
+    return extension if extension in IMAGE_EXTENSIONS else default
+
+
+def existing_path(directory, digest):
+    """Fichier déjà enregistré pour cette empreinte (quelle que soit son extension), ou None."""
+    for path in glob.glob(os.path.join(directory, f"{digest}.*")):
+        # Les dérivés (<empreinte>.128.webp) ne sont pas des originaux
+        if path.count(".") == os.path.join(directory, digest).count(".") + 1:
+            return path
+    return None
+
+
+def _write_chunk(f, hasher, chunk):
+    hasher.update(chunk)
+    f.write(chunk)
+
+
+def _commit(tmp_path, directory, digest, extension):
+    """
+    Renomme le fichier temporaire vers son chemin final, ou le supprime si le contenu existe déjà ;
+    dans les deux cas le fichier final est réservé pour l'appelant.
+    """
+    with _lock:
+        path = existing_path(directory, digest)
+        deduplicated = path is not None
+        if deduplicated:
+            os.remove(tmp_path)
+        else:
+            path = os.path.join(directory, f"{digest}{extension}")
+            os.replace(tmp_path, path)
+        _claims[path] = _claims.get(path, 0) + 1
+    return path, deduplicated
+
+
+async def store_upload(upload, directory, max_bytes=None, chunk_size=CHUNK_SIZE):
+    """
+    Enregistre un UploadFile dans `directory` sans le charger entièrement en mémoire.
+    Le fichier reste réservé jusqu'à release() ou discard().
+    :raises UploadTooLarge: si l'upload dépasse `max_bytes`
+    :return: StoredFile
+    """
+    extension = upload_extension(upload.filename)
+    # Fichier temporaire dans le dossier cible : le renommage final reste atomique (même système de fichiers)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".upload-", suffix=".tmp")
+    hasher = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as f:
+            while chunk := await upload.read(chunk_size):
+                size += len(chunk)
+                if max_bytes and size > max_bytes:
+                    raise UploadTooLarge(max_bytes)
+                await run_in_threadpool(_write_chunk, f, hasher, chunk)
+        digest = hasher.hexdigest()
+        path, deduplicated = await run_in_threadpool(_commit, tmp_path, directory, digest, extension)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return StoredFile(path, digest, size, deduplicated)
+
+
+def _release(stored, remove):
+    with _lock:
+        count = _claims.get(stored.path, 0) - 1
+        if count > 0:
+            _claims[stored.path] = count
+            return False
+        _claims.pop(stored.path, None)
+        if not remove:
+            return False
+        try:
+            os.remove(stored.path)
+        except OSError:
+            return False
+        return True
+
+
+def release(stored):
+    """Fin du traitement de la requête : le fichier n'est plus réservé par elle."""
+    if stored is not None:
+        _release(stored, remove=False)
+
+
+def discard(stored, referenced=False):
+    """
+    Libère un fichier dont l'enregistrement a échoué et le supprime si plus personne ne l'utilise.
+    :param referenced: une ligne en base pointe déjà vers ce contenu (ex: upload identique d'une autre requête)
+    :return: True si le fichier a été supprimé
+    """
+    if stored is None:
+        return False
+    return _release(stored, remove=not referenced)
@@ -0,0 +1,41 @@
+"""
+Pools de workers dédiés pour sortir le travail lourd de la boucle asyncio.
+
+main.py en crée deux :
+- un pool d'inférence pour les passes YOLOv5 (un seul thread suffit, PyTorch
+  parallélise déjà chaque passe sur plusieurs cœurs)
+- un pool de post-traitement pour le travail d'image (couleurs, découpes)
+
+Chaque pool limite aussi le nombre de tâches en attente : au-delà, les
+appelants attendent leur tour au lieu d'empiler du travail sans fin.
+"""
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+
+class WorkerPool:
+    """ThreadPoolExecutor borné en nombre de threads ET en tâches en attente."""
+
+    def __init__(self, name, max_workers, max_pending=None):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_pending = max_pending or max_workers * 4
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._semaphore = None
+
+    def _get_semaphore(self):
+        # Le sémaphore doit être créé dans la boucle asyncio qui l'utilise
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_pending)
+        return self._semaphore
+
+    async def run(self, func, *args, **kwargs):
+        """Exécute `func(*args, **kwargs)` dans le pool et attend son résultat."""
+        loop = asyncio.get_running_loop()
+        async with self._get_semaphore():
+            return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
@@ -87,9 +87,9 @@ const RoomOrganizer = () => {
         const response = await fetch("http://127.0.0.1:8000/chambre/get_reference/");
         if (response.ok) {
           const data = await response.json();
-          if (data && data.image_path) {
-            // Récupérer l'image depuis le chemin retourné par l'API
-            setReferenceImage(`http://127.0.0.1:8000/uploads/${data.image_path.split('/').pop()}`);
+          if (data && data.image_url) {
+            // Récupérer l'image depuis l'URL retournée par l'API
+            setReferenceImage(`http://127.0.0.1:8000${data.image_url}`);
           }
         } else {
           console.error("Erreur lors du chargement de l'image de référence");